@@ -0,0 +1,136 @@
+"""Local HTTP API over the service layer, so bulk jobs need no Streamlit session.
+
+    python api_server.py [--host 127.0.0.1] [--port 8502]
+
+The port defaults to CRM_API_PORT, or 8502; workers.py keeps its app workers off it.
+
+Endpoints (JSON in and out unless noted):
+
+    GET  /stages                          {"counts": {stage: n}}
+    GET  /stages/<stage>/leads?offset=0&limit=100&Industry=retail,automotive
+                                          {"total": n, "leads": [{"Lead ID": ..., ...}]}
+    GET  /stages/<stage>/export           the whole stage as CSV
+    GET  /reports/weekly                  {"rows": [{"stage", "AppSetter", "week", "Count"}]}
+    POST /moves    {"moves": [...], "dry_run": false}   {"moved": [n per move]}
+    POST /updates  {"updates": [...]}                   {"written": cells, "missing": [IDs]}
+    POST /import   {"path": "/path/to/export.csv"}      {"imported": n, "rejected": n}
+
+See service.bulk_move and service.bulk_update for the shape of moves and updates. If
+CRM_API_TOKEN is set, every request must send "Authorization: Bearer <token>".
+"""
+import io
+import os
+import json
+import hmac
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import service
+from lead_store import ID_COLUMN
+
+API_TOKEN = os.environ.get("CRM_API_TOKEN")
+API_PORT = int(os.environ.get("CRM_API_PORT", 8502))
+
+# Largest request body accepted
+MAX_BODY = 64 * 2**20
+
+# Largest window /stages/<stage>/leads returns
+MAX_LIMIT = 10_000
+
+def _records(data):
+    """JSON-ready rows of a frame, its index included as the lead ID."""
+    data = data.reset_index(names=ID_COLUMN) if data.index.name is None else data.reset_index()
+    data = data.astype(object).where(data.notna(), None)
+    return [{column: value.item() if hasattr(value, "item") else value for column, value in row.items()}
+            for row in data.to_dict("records")]
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "crm-api/1"
+
+    def _send(self, status, body, content_type="application/json"):
+        payload = body.encode() if isinstance(body, str) else json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _authorized(self):
+        if not API_TOKEN:
+            return True
+        return hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {API_TOKEN}")
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise ValueError(f"request body over {MAX_BODY} bytes")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"invalid JSON: {exc}")
+        if not isinstance(body, dict):
+            raise ValueError(f"request body must be a JSON object, not {type(body).__name__}")
+        return body
+
+    def _dispatch(self, method):
+        if not self._authorized():
+            return self._send(401, {"error": "missing or wrong API token"})
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            if method == "GET" and parts == ["stages"]:
+                return self._send(200, {"counts": service.stage_counts()})
+            if method == "GET" and len(parts) == 3 and parts[0] == "stages" and parts[2] == "leads":
+                query = parse_qs(url.query)
+                offset = int(query.pop("offset", ["0"])[0])
+                limit = min(int(query.pop("limit", ["100"])[0]), MAX_LIMIT)
+                filters = {column: ",".join(values).split(",") for column, values in query.items()}
+                total, window = service.list_leads(parts[1], filters, offset, limit)
+                return self._send(200, {"total": total, "leads": _records(window)})
+            if method == "GET" and len(parts) == 3 and parts[0] == "stages" and parts[2] == "export":
+                out = io.StringIO()
+                service.export_stage(parts[1], out)
+                return self._send(200, out.getvalue(), "text/csv")
+            if method == "GET" and parts == ["reports", "weekly"]:
+                report = service.weekly_report()
+                report["week"] = report["week"].dt.strftime("%Y-%m-%d")
+                return self._send(200, {"rows": report.to_dict("records")})
+            if method == "POST" and parts == ["moves"]:
+                body = self._body()
+                return self._send(200, {"moved": service.bulk_move(body.get("moves", []), bool(body.get("dry_run")))})
+            if method == "POST" and parts == ["updates"]:
+                return self._send(200, service.bulk_update(self._body().get("updates", [])))
+            if method == "POST" and parts == ["import"]:
+                return self._send(200, service.import_leads(self._body()["path"]))
+        except (ValueError, KeyError, TypeError) as exc:
+            return self._send(400, {"error": str(exc)})
+        except Exception as exc:
+            return self._send(500, {"error": repr(exc)})
+        return self._send(404, {"error": f"no endpoint {method} {url.path}"})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+def make_server(host="127.0.0.1", port=API_PORT):
+    """An API server bound to host:port; call serve_forever() on it."""
+    return ThreadingHTTPServer((host, port), ApiHandler)
+
+def serve(host="127.0.0.1", port=API_PORT):
+    server = make_server(host, port)
+    print(f"CRM API on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -0,0 +1,243 @@
+"""Headless benchmark of every page's render, edit and move paths on synthetic data.
+
+    python benchmark.py --sizes 10000 100000 1000000 --output results.json [--baseline old.json]
+
+Each dataset size is generated with synthetic_leads into a scratch directory and measured
+in its own process (CRM_DATA_DIR points the app at it). Pages are driven through
+Streamlit's AppTest, and every operation reports latency, peak Python memory and the
+bytes written to disk.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+from page_registry import PAGES
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (page, editor name, stage) saved with EDIT_ROWS edited comments
+EDITS = [
+    ("Raw Data", "raw_data_table_1_100_[]", "raw_data"),  # first page, default page size, no filters
+    ("Not Picked", "not_picked_table", "not_picked"),
+    ("Callback", "callback_table", "callback"),
+    ("Meeting Booked", "meeting_booked_table", "meeting_booked"),
+    ("Qualified/Disqualified", "qualified_table", "qualified"),
+    ("Deals Page", "active_deals_table", "deals_active"),
+]
+EDIT_ROWS = 10
+
+# (page, move button) clicked with the first MOVE_ROWS leads selected
+MOVES = [
+    ("Raw Data", "Move to notpicked"),
+    ("Not Picked", "Move to Meeting Booked"),
+    ("Callback", "Move to Meeting Booked"),
+    ("Meeting Booked", "Move to Qualified"),
+    ("Deals Page", "Move Deal"),
+]
+MOVE_ROWS = 5
+
+def _driver():
+    """AppTest script: render one page, then optionally save seeded editor edits through it."""
+    import importlib
+    import streamlit as st
+
+    module, function = st.session_state["bench_page"]
+    getattr(importlib.import_module(module), function)()
+
+    # AppTest cannot type into st.data_editor, so hand the page's save path a pending delta
+    edit = st.session_state.get("bench_edit")
+    if edit:
+        import lead_store
+        from raw_data import editor_key, save_editor_changes
+        name, file_path, rows = edit
+        base = lead_store.edit_base(st.session_state[f"{editor_key(name)}_shown"].iloc[:rows])
+        patch = {row: {"comment": f"benchmark edit {i}"} for i, row in enumerate(base.index)}
+        st.session_state[f"{editor_key(name)}_pending"] = (patch, base)
+        save_editor_changes(file_path, None, name)
+
+def _bytes_written():
+    """Bytes this process has passed to write() so far, or None off Linux."""
+    try:
+        with open("/proc/self/io") as f:
+            return int(next(line for line in f if line.startswith("wchar:")).split()[1])
+    except (OSError, StopIteration):
+        return None
+
+def _app(page, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_function(_driver, default_timeout=timeout)
+    at.session_state["bench_page"] = PAGES[page]
+    return at
+
+def _measure(operation, prepare, act, repeat):
+    """Time act() repeat times, then once more under tracemalloc for its peak memory.
+
+    Saves and moves return once queued, so the time until the write-behind queue has
+    written them is reported separately as flush_ms.
+    """
+    import write_queue
+
+    latencies, flushes, written, errors = [], [], [], []
+    for run in range(repeat + 1):
+        at = prepare()
+        traced = run == repeat
+        if traced:
+            tracemalloc.start()
+        start_bytes = _bytes_written()
+        start = time.perf_counter()
+        at = act(at)
+        elapsed = time.perf_counter() - start
+        write_queue.wait()
+        flushed = time.perf_counter() - start
+        end_bytes = _bytes_written()
+        if traced:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            latencies.append(elapsed)
+            flushes.append(flushed)
+            if start_bytes is not None:
+                written.append(end_bytes - start_bytes)
+        errors += [str(exception.value) for exception in at.exception]
+    return {
+        "operation": operation,
+        "latency_ms": round(statistics.median(latencies) * 1000, 2),
+        "latency_runs_ms": [round(latency * 1000, 2) for latency in latencies],
+        "flush_ms": round(statistics.median(flushes) * 1000, 2),
+        "peak_memory_mb": round(peak / 2**20, 2),
+        "bytes_written": int(statistics.median(written)) if written else None,
+        "errors": sorted(set(errors)),
+    }
+
+def run_operations(repeat, timeout):
+    """Measure every operation against the dataset in CRM_DATA_DIR; return the result rows."""
+    sys.path.insert(0, APP_DIR)
+    import lead_store
+
+    if lead_store.BACKEND == "sqlite":
+        import sqlite_store
+        sqlite_store.migrate_csvs()
+    elif lead_store.BACKEND == "parquet":
+        import parquet_store
+        parquet_store.migrate_csvs()
+
+    # Import every page once so the first measurement does not pay for module loading
+    _app("Bin", timeout).run()
+
+    results = []
+    for page in PAGES:
+        results.append(_measure(f"render:{page}", lambda: _app(page, timeout), lambda at: at.run(), repeat))
+
+    for page, name, stage in EDITS:
+        def prepare():
+            at = _app(page, timeout)
+            at.run()
+            return at
+
+        def act(at):
+            at.session_state["bench_edit"] = (name, lead_store.STAGE_PATHS[stage], EDIT_ROWS)
+            return at.run()
+
+        results.append(_measure(f"edit:{page}", prepare, act, repeat))
+
+    for page, button in MOVES:
+        def prepare():
+            at = _app(page, timeout)
+            at.run()
+            if page == "Raw Data":
+                # Raw Data selects through the editor's checkbox column, kept in session state
+                window = lead_store.load_page(lead_store.STAGE_PATHS["raw_data"], None, 0, MOVE_ROWS)
+                at.session_state["raw_data_selected"] = set(window.index)
+            else:
+                at.multiselect[0].set_value(at.multiselect[0].options[:MOVE_ROWS])
+            return at
+
+        def act(at):
+            return next(b for b in at.button if b.label == button).click().run()
+
+        results.append(_measure(f"move:{page}", prepare, act, repeat))
+    return results
+
+def _worker_main(args):
+    print(json.dumps(run_operations(args.repeat, args.timeout)))
+
+def _compare(results, baseline_path, threshold):
+    """Print operations that got slower than the baseline by more than threshold (a ratio)."""
+    with open(baseline_path) as f:
+        baseline = {(row["rows"], row["operation"]): row for row in json.load(f)["results"]}
+    regressions = 0
+    for row in results:
+        old = baseline.get((row["rows"], row["operation"]))
+        if old and old["latency_ms"] and row["latency_ms"] > old["latency_ms"] * (1 + threshold):
+            regressions += 1
+            print(f"REGRESSION {row['rows']:>9} {row['operation']:<32} "
+                  f"{old['latency_ms']:.1f} ms -> {row['latency_ms']:.1f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backend", choices=["csv", "parquet", "sqlite"], default="csv")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per operation")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per AppTest run")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to flag regressions against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown ratio reported as a regression")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return _worker_main(args)
+
+    from synthetic_leads import write_dataset
+
+    results = []
+    for rows in args.sizes:
+        scratch = tempfile.mkdtemp(prefix=f"crm_bench_{rows}_")
+        try:
+            write_dataset(scratch, rows)
+            env = dict(os.environ, CRM_DATA_DIR=scratch, CRM_STORAGE_BACKEND=args.backend)
+            worker = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker",
+                 "--repeat", str(args.repeat), "--timeout", str(args.timeout)],
+                env=env, cwd=APP_DIR, capture_output=True, text=True,
+            )
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        if worker.returncode != 0:
+            sys.exit(f"benchmark at {rows} rows failed:\n{worker.stderr}")
+        for row in json.loads(worker.stdout.strip().splitlines()[-1]):
+            results.append(dict(row, rows=rows))
+            print(f"{rows:>9} {row['operation']:<32} {row['latency_ms']:>10.1f} ms "
+                  f"{row['peak_memory_mb']:>9.1f} MB {row['bytes_written'] or 0:>12} B")
+
+    import pandas as pd
+    import streamlit as st
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "backend": args.backend,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "streamlit": st.__version__,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline and _compare(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
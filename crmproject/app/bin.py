@@ -1,22 +1,74 @@
 import streamlit as st
-import pandas as pd
 import os
+import lead_store
+import bin_archive
+from lead_store import DATA_DIR, STAGE_PATHS
 
-BIN_PATH = "/crmproject/data/bin.csv"
+BIN_PATH = os.path.join(DATA_DIR, "bin.csv")
 
-def load_bin_data():
-    if os.path.exists(BIN_PATH):
-        return pd.read_csv(BIN_PATH)
-    else:
-        return pd.DataFrame()
+PAGE_SIZE = 100
+
+# Stages a binned lead can be restored to
+RESTORE_STAGES = [stage for stage in STAGE_PATHS if stage != "bin"]
+
+def restore_controls(lead_ids, key):
+    """Restore the chosen leads of lead_ids to a stage."""
+    if not len(lead_ids):
+        return
+    chosen = st.multiselect("Leads to restore", list(lead_ids), key=f"{key}_restore_ids")
+    stage = st.selectbox("Restore to", RESTORE_STAGES, key=f"{key}_restore_stage")
+    if st.button("Restore", key=f"{key}_restore", disabled=not chosen):
+        restored = bin_archive.restore(chosen, stage)
+        st.success(f"{restored} leads restored to {stage}.")
+        st.rerun()
 
 def bin_page():
     st.title("Bin Page")
-    if os.path.exists(BIN_PATH):
-        data = pd.read_csv(BIN_PATH)
-        if not data.empty:
-            st.dataframe(data)
-        else:
-            st.info("No data in Bin.")
+    # Every move into the Bin seals last month's leads first; this covers a month nobody has
+    # binned anything in yet, so the page never shows last month's leads as this month's
+    bin_archive.rotate()
+
+    # This month's Bin, one page at a time
+    st.subheader(f"Binned This Month ({bin_archive.month_of()})")
+    total = lead_store.count_rows(BIN_PATH) if os.path.exists(lead_store.storage_path(BIN_PATH)) else 0
+    if total:
+        page_count = max(1, -(-total // PAGE_SIZE))
+        page = st.number_input(f"Page (of {page_count}, {total} rows)", min_value=1, max_value=page_count, value=1, key="bin_page")
+        window = lead_store.load_page(BIN_PATH, None, (page - 1) * PAGE_SIZE, PAGE_SIZE, pending=True)
+        st.dataframe(window)
+        restore_controls(window.index, "bin")
     else:
-        st.info("Bin file does not exist yet.")
+        st.info("No data in Bin.")
+
+    # Older months are only read when asked for
+    st.subheader("Archive")
+    months = bin_archive.partitions()
+    if not months:
+        st.info("No archived months yet.")
+        return
+    text = st.text_input("Search the archive", placeholder="Name, company, email or title")
+    if text:
+        found = bin_archive.search(text)
+        if found.empty:
+            st.info("No archived leads match.")
+        else:
+            st.dataframe(found)
+            restore_controls(found.index, "bin_search")
+        return
+    month = st.selectbox("Month", ["-"] + list(months))
+    if month != "-":
+        total, _ = bin_archive.load_month(month, 0, 0)
+        page_count = max(1, -(-total // PAGE_SIZE))
+        page = st.number_input(f"Page (of {page_count}, {total} rows)", min_value=1, max_value=page_count, value=1, key="bin_archive_page")
+        _, window = bin_archive.load_month(month, (page - 1) * PAGE_SIZE, PAGE_SIZE)
+        st.dataframe(window)
+        restore_controls(window.index, "bin_archive")
+
+    with st.expander("Retention"):
+        compress_after = st.number_input("Compress months older than", min_value=0, value=bin_archive.COMPRESS_AFTER_MONTHS)
+        purge = st.checkbox("Delete old months")
+        purge_after = st.number_input("Delete months older than", min_value=1, value=24, disabled=not purge)
+        if st.button("Compact Archive"):
+            result = bin_archive.compact(compress_after, purge_after if purge else None)
+            st.success(f"{len(result['compressed'])} months compressed, {len(result['purged'])} deleted.")
+            st.rerun()
@@ -0,0 +1,241 @@
+"""Month-partitioned archive of the Bin, so the Bin stage only holds this month's leads.
+
+The Bin stage (bin.csv, or the bin rows of leads.db) collects the leads binned in the
+current month. rotate() runs when the month changes: it seals those leads into
+bin_archive/<YYYY-MM>.csv and empties the stage, so the Bin page and every Move to Bin stay
+as cheap as one month of binned leads. Older months are read one partition at a time, only
+when someone asks for them, and searched without loading the stage.
+
+compact() is the retention job: it gzips partitions older than COMPRESS_AFTER_MONTHS and,
+if a purge age is given, deletes partitions older than that. restore() sends leads back to
+a stage under the lead IDs they had, from the Bin stage or from any partition.
+
+    python bin_archive.py rotate
+    python bin_archive.py compact [--compress-after 3] [--purge-after 24]
+    python bin_archive.py search "acme"
+    python bin_archive.py restore callback 101 102
+"""
+import os
+import sys
+import glob
+import argparse
+import threading
+from datetime import date
+import pandas as pd
+import lead_store
+import pipeline
+from lead_store import DATA_DIR, STAGE_PATHS, ID_COLUMN
+
+BIN_PATH = STAGE_PATHS["bin"]
+ARCHIVE_DIR = os.path.join(DATA_DIR, "bin_archive")
+
+# Month the leads now in the Bin stage were binned in, as YYYY-MM
+MONTH_PATH = os.path.join(ARCHIVE_DIR, "current_month")
+
+# Partitions older than this many months are stored gzipped
+COMPRESS_AFTER_MONTHS = 3
+
+# Columns search() looks in
+SEARCH_COLUMNS = ["First Name", "Last Name", "Company", "Email", "Title"]
+
+_cache = {}  # {partition path: ((mtime_ns, size), frame)}
+_lock = threading.Lock()
+
+def month_of(day=None):
+    """YYYY-MM of day (default: today)."""
+    return (day or date.today()).strftime("%Y-%m")
+
+def _months_between(older, newer):
+    return (int(newer[:4]) - int(older[:4])) * 12 + int(newer[5:]) - int(older[5:])
+
+def partitions():
+    """{month: partition path}, newest month first."""
+    found = {}
+    for path in glob.glob(os.path.join(ARCHIVE_DIR, "*.csv*")):
+        if path.endswith(".tmp"):
+            continue
+        month = os.path.basename(path).split(".")[0]
+        # A month caught between compression steps has both files; they hold the same rows
+        if month not in found or path.endswith(".csv"):
+            found[month] = path
+    return dict(sorted(found.items(), reverse=True))
+
+def _read_partition(path):
+    """The leads of one partition indexed by lead ID, cached until the file changes."""
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        entry = _cache.get(path)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    data = pd.read_csv(path, index_col=ID_COLUMN)
+    # A rotation interrupted after writing the partition may have sealed some leads twice
+    data = data[~data.index.duplicated(keep="last")]
+    with _lock:
+        _cache[path] = (key, data)
+    return data
+
+def _write_partition(path, data):
+    """Write a partition atomically; a .gz path is written gzipped."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    data.to_csv(tmp_path, index_label=ID_COLUMN, compression="gzip" if path.endswith(".gz") else None)
+    os.replace(tmp_path, path)
+
+def load_month(month, offset=0, limit=100):
+    """(leads archived in month, one window of them indexed by lead ID)."""
+    path = partitions().get(month)
+    if path is None:
+        return 0, pd.DataFrame()
+    data = _read_partition(path)
+    return len(data), data.iloc[offset:offset + limit]
+
+def search(text, months=None, limit=200):
+    """Archived leads whose name, company, email or title contains text, newest month first.
+
+    months limits the search to those partitions. The result has a Month column.
+    """
+    found = []
+    for month, path in partitions().items():
+        if months is not None and month not in months:
+            continue
+        data = _read_partition(path)
+        columns = [column for column in SEARCH_COLUMNS if column in data.columns]
+        mask = pd.Series(False, index=data.index)
+        for column in columns:
+            mask |= data[column].astype(str).str.contains(text, case=False, regex=False, na=False)
+        if mask.any():
+            found.append(data[mask].assign(Month=month))
+            if sum(len(frame) for frame in found) >= limit:
+                break
+    if not found:
+        return pd.DataFrame()
+    return pd.concat(found).iloc[:limit]
+
+def _current_month():
+    try:
+        with open(MONTH_PATH) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _set_current_month(month):
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    with open(MONTH_PATH + ".tmp", "w") as f:
+        f.write(month)
+    os.replace(MONTH_PATH + ".tmp", MONTH_PATH)
+
+def rotate(today=None):
+    """Seal the Bin stage into its month's partition once that month is over; returns leads sealed.
+
+    Cheap when nothing is due, so pages can call it on every render. The first rotation on a
+    Bin from before partitioning files each lead under the month of its Date (at the latest
+    this month), or under last month when it has none.
+    """
+    month = month_of(today)
+    if _current_month() == month:
+        return 0
+    with lead_store.store_lock():
+        sealed_month = _current_month()
+        if sealed_month == month:
+            return 0
+        data = lead_store.load_data(BIN_PATH) if os.path.exists(lead_store.storage_path(BIN_PATH)) else pd.DataFrame()
+        if not data.empty:
+            if sealed_month is not None:
+                months = pd.Series(sealed_month, index=data.index)
+            else:
+                first = (today or date.today()).replace(day=1)
+                last_month = month_of(first - pd.Timedelta(days=1))
+                dates = pd.to_datetime(data["Date"], errors="coerce") if "Date" in data.columns else pd.Series(pd.NaT, index=data.index)
+                months = dates.dt.strftime("%Y-%m").fillna(last_month)
+                # A callback Date can lie ahead, but no lead was binned after this month
+                months = months.where(months <= month, month)
+            existing = partitions()
+            for key, rows in data.groupby(months.values):
+                path = existing.get(key, os.path.join(ARCHIVE_DIR, f"{key}.csv"))
+                if os.path.exists(path):
+                    rows = pd.concat([_read_partition(path), rows])
+                _write_partition(path, rows)
+            # Emptied through the store, so the event log and other stores see the leads leave
+            lead_store.save_data(data.iloc[0:0], BIN_PATH)
+        _set_current_month(month)
+    return len(data)
+
+def compact(compress_after=COMPRESS_AFTER_MONTHS, purge_after=None, today=None):
+    """Retention job: gzip partitions older than compress_after months, delete those older than purge_after.
+
+    Returns {"compressed": [months], "purged": [months]}. Nothing is purged unless
+    purge_after is given.
+    """
+    month = month_of(today)
+    result = {"compressed": [], "purged": []}
+    with lead_store.store_lock():
+        for key, path in partitions().items():
+            age = _months_between(key, month)
+            if purge_after is not None and age > purge_after:
+                for stale in glob.glob(os.path.join(ARCHIVE_DIR, f"{key}.csv*")):
+                    os.remove(stale)
+                result["purged"].append(key)
+            elif age > compress_after and not path.endswith(".gz"):
+                _write_partition(path + ".gz", _read_partition(path))
+                os.remove(path)
+                result["compressed"].append(key)
+    with _lock:
+        _cache.clear()
+    return result
+
+def restore(lead_ids, stage):
+    """Move binned or archived leads back to stage under their own lead IDs; returns leads restored."""
+    if stage not in STAGE_PATHS or stage == "bin":
+        raise ValueError(f"cannot restore to {stage!r}")
+    target = STAGE_PATHS[stage]
+    wanted = {int(lead_id) for lead_id in lead_ids}
+    restored = 0
+    with lead_store.store_lock():
+        in_bin = [lead_id for lead_id, (found, _) in lead_store.locate(list(wanted)).items() if found == "bin"]
+        if in_bin:
+            restored += pipeline.move_leads(None, in_bin, BIN_PATH, [target])
+            wanted.difference_update(in_bin)
+        for path in partitions().values():
+            if not wanted:
+                break
+            data = _read_partition(path)
+            found = data.index.isin(list(wanted))
+            if not found.any():
+                continue
+            # Into the stage first: a crash in between leaves a copy in the archive, never a lost lead
+            lead_store.save_data(data[found], target, append=True, keep_ids=True)
+            _write_partition(path, data[~found])
+            wanted.difference_update(data.index[found])
+            restored += int(found.sum())
+    return restored
+
+def _main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rotate", help="seal last month's Bin into its partition")
+    compact_cmd = commands.add_parser("compact", help="gzip or purge old partitions")
+    compact_cmd.add_argument("--compress-after", type=int, default=COMPRESS_AFTER_MONTHS, help="months")
+    compact_cmd.add_argument("--purge-after", type=int, default=None, help="months (default: keep)")
+    search_cmd = commands.add_parser("search", help="find archived leads by name, company or email")
+    search_cmd.add_argument("text")
+    restore_cmd = commands.add_parser("restore", help="move binned or archived leads back to a stage")
+    restore_cmd.add_argument("stage")
+    restore_cmd.add_argument("ids", type=int, nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "rotate":
+        print(f"{rotate()} leads sealed")
+    elif args.command == "compact":
+        result = compact(args.compress_after, args.purge_after)
+        print(f"compressed: {', '.join(result['compressed']) or '-'}; purged: {', '.join(result['purged']) or '-'}")
+    elif args.command == "search":
+        print(search(args.text).to_csv(index_label=ID_COLUMN), end="")
+    elif args.command == "restore":
+        print(f"{restore(args.ids, args.stage)} leads restored")
+
+if __name__ == "__main__":
+    try:
+        _main(sys.argv[1:])
+    except ValueError as exc:
+        sys.exit(f"error: {exc}")
@@ -0,0 +1,94 @@
+"""Tells every worker process when any process writes a stage file.
+
+A daemon thread per process watches DATA_DIR with inotify (through libc, so no extra
+package) and, where inotify is not available, by polling the stage files' stat. When a
+stage file changes it drops this process's cached frame (lead_store.invalidate keeps one
+that can be brought up to date from the appended rows). Reads stay correct without it,
+since every cache lookup checks the file; the watcher frees stale frames as soon as
+another worker writes instead of on the next read. The caches kept outside lead_store
+(search_index, weekly_cube, reference_data) need no events: they stamp what they hold
+with the file versions and check them on every read.
+"""
+import os
+import struct
+import ctypes
+import ctypes.util
+import threading
+import time
+import lead_store
+from lead_store import DATA_DIR, STAGE_PATHS
+
+# Seconds between stat checks when inotify is not available
+POLL_SECONDS = 1.0
+
+# inotify event masks from <sys/inotify.h>: a file closed after writing, or renamed in
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+_EVENT = struct.Struct("iIII")
+
+_state = {"thread": None}
+_lock = threading.Lock()
+
+def _stage_files():
+    """{storage file name in DATA_DIR: stage file path} under the current backend."""
+    if lead_store.BACKEND == "sqlite":
+        # Every stage lives in leads.db; a write to it may have touched any of them
+        return {"leads.db": None, "leads.db-wal": None}
+    return {os.path.basename(lead_store.storage_path(file_path)): file_path for file_path in STAGE_PATHS.values()}
+
+def _inotify():
+    """An inotify file descriptor watching DATA_DIR, or None where inotify is not available."""
+    libc_name = ctypes.util.find_library("c")
+    if libc_name is None:
+        return None
+    libc = ctypes.CDLL(libc_name, use_errno=True)
+    if not hasattr(libc, "inotify_init"):
+        return None
+    fd = libc.inotify_init()
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(DATA_DIR), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+def _watch_inotify(fd, files):
+    while True:
+        buffer = os.read(fd, 64 * 1024)
+        names, offset = set(), 0
+        while offset < len(buffer):
+            _, _, _, length = _EVENT.unpack_from(buffer, offset)
+            offset += _EVENT.size
+            names.add(buffer[offset:offset + length].rstrip(b"\0").decode(errors="replace"))
+            offset += length
+        for name in names & set(files):
+            lead_store.invalidate(files[name])
+
+def _watch_polling(files):
+    def keys():
+        found = {}
+        for name in files:
+            try:
+                found[name] = lead_store._file_key(os.path.join(DATA_DIR, name))
+            except FileNotFoundError:
+                found[name] = None
+        return found
+    last = keys()
+    while True:
+        time.sleep(POLL_SECONDS)
+        current = keys()
+        for name in files:
+            if current[name] != last[name]:
+                lead_store.invalidate(files[name])
+        last = current
+
+def start():
+    """Start this process's watcher thread, once."""
+    with _lock:
+        if _state["thread"] is not None or not os.path.isdir(DATA_DIR):
+            return
+        files = _stage_files()
+        fd = _inotify()
+        target, args = (_watch_inotify, (fd, files)) if fd is not None else (_watch_polling, (files,))
+        _state["thread"] = threading.Thread(target=target, args=args, name="change-watch", daemon=True)
+        _state["thread"].start()
@@ -0,0 +1,139 @@
+"""Hammer the lead store with concurrent edits and moves, then check nothing was lost.
+
+Runs against a scratch copy of the data directory, so it is safe to point at live data:
+
+    python concurrency_stress.py --workers 8 --ops 200 --mode processes --backend sqlite
+
+Every edit must come back either written or reported as a conflict, no lead may be
+lost or duplicated by the moves, and every lead must end up holding either its original
+comment or one of the comments written to it.
+"""
+import os
+import sys
+import random
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Stage pairs the workers move leads between; all single-target so lead counts are conserved
+MOVES = [
+    ("raw_data", "not_picked"), ("not_picked", "callback"), ("callback", "raw_data"),
+    ("raw_data", "callback"), ("callback", "not_picked"), ("not_picked", "raw_data"),
+]
+
+def _worker(seed, ops):
+    """Do ops random edits and moves; return (edits, written, conflicts)."""
+    import lead_store
+    import pipeline
+
+    rng = random.Random(seed)
+    stages = sorted({stage for pair in MOVES for stage in pair})
+    edits, written, conflicts = [], 0, 0
+    for op in range(ops):
+        if rng.random() < 0.7:
+            file_path = lead_store.STAGE_PATHS[rng.choice(stages)]
+            data = lead_store.load_data(file_path)
+            if data.empty:
+                continue
+            row = rng.choice(list(data.index))
+            comment = f"worker{seed}-op{op}"
+            result = lead_store.apply_patch(
+                file_path, {row: {"comment": comment}}, base=lead_store.edit_base(data.loc[[row]]),
+            )
+            identity = int(lead_store.identity_stamps(data.loc[[row]]).iloc[0])
+            edits.append((identity, comment, bool(result.written)))
+            written += result.written
+            conflicts += len(result.conflicts)
+        else:
+            source, target = rng.choice(MOVES)
+            data = lead_store.load_data(lead_store.STAGE_PATHS[source])
+            if data.empty:
+                continue
+            rows = rng.sample(list(data.index), min(3, len(data)))
+            pipeline.move_leads(data, rows, lead_store.STAGE_PATHS[source], [lead_store.STAGE_PATHS[target]])
+    return edits, written, conflicts
+
+def _snapshot():
+    """Every lead in every stage as {identity stamp: [comments]}, plus the total count."""
+    import pandas as pd
+    import lead_store
+
+    comments, total = {}, 0
+    for file_path in lead_store.STAGE_PATHS.values():
+        data = lead_store.load_data(file_path)
+        if data.empty:
+            continue
+        total += len(data)
+        for identity, comment in zip(lead_store.identity_stamps(data), data["comment"]):
+            comments.setdefault(int(identity), []).append("" if pd.isna(comment) else str(comment))
+    return comments, total
+
+def run(workers, ops, mode):
+    import lead_store
+
+    if lead_store.BACKEND == "sqlite":
+        import sqlite_store
+        sqlite_store.migrate_csvs()
+    elif lead_store.BACKEND == "parquet":
+        import parquet_store
+        parquet_store.migrate_csvs()
+
+    before, total_before = _snapshot()
+    pool = ProcessPoolExecutor if mode == "processes" else ThreadPoolExecutor
+    with pool(max_workers=workers) as executor:
+        results = list(executor.map(_worker, range(workers), [ops] * workers))
+    lead_store.invalidate()
+    after, total_after = _snapshot()
+
+    edits = [edit for worker_edits, _, _ in results for edit in worker_edits]
+    written = sum(result[1] for result in results)
+    conflicts = sum(result[2] for result in results)
+    failures = []
+
+    if total_after != total_before:
+        failures.append(f"lead count changed from {total_before} to {total_after}")
+    if written + conflicts != len(edits):
+        failures.append(f"{len(edits)} edits but {written} written and {conflicts} conflicts")
+
+    applied = {}
+    for identity, comment, was_written in edits:
+        if was_written:
+            applied.setdefault(identity, set()).add(comment)
+    for identity, comments in after.items():
+        allowed = applied.get(identity, set()) | set(before.get(identity, []))
+        stray = [comment for comment in comments if comment not in allowed]
+        if stray:
+            failures.append(f"lead {identity} holds comments nobody wrote: {stray}")
+
+    print(f"{len(edits)} edits: {written} written, {conflicts} conflicts; "
+          f"{total_before} leads before, {total_after} after")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="operations per worker")
+    parser.add_argument("--mode", choices=["threads", "processes"], default="processes")
+    parser.add_argument("--backend", choices=["csv", "parquet", "sqlite"], default="csv")
+    parser.add_argument("--data-dir", default=os.environ.get("CRM_DATA_DIR", "/crmproject/data"))
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="crm_stress_")
+    try:
+        for name in os.listdir(args.data_dir):
+            if name.endswith(".csv"):
+                shutil.copy(os.path.join(args.data_dir, name), scratch)
+        # Set before lead_store is imported, here and in the worker processes
+        os.environ["CRM_DATA_DIR"] = scratch
+        os.environ["CRM_STORAGE_BACKEND"] = args.backend
+        failures = run(args.workers, args.ops, args.mode)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""Exact and fuzzy duplicate detection across the stage files, with a store of duplicate groups.
+
+    python dedup.py [--incremental] [--workers N]
+
+Leads are only compared inside blocks that share a blocking key (email, LinkedIn URL,
+email domain, phone digits, or normalized company plus the start of the last name), and
+a block bigger than MAX_BLOCK is sorted by name and compared within a sliding WINDOW.
+Exact rules are settled with vectorized comparisons; the pairs left for fuzzy name and
+company scoring are split into chunks and scored on a process pool.
+
+Matching leads are joined into groups in duplicate_groups.csv. A group stays "open" until
+it is merged (one lead kept, the rest moved to the Bin) or dismissed as not a duplicate.
+An incremental run checks only leads added since the last run, using the fact that lead
+IDs only ever grow.
+"""
+import os
+import argparse
+import difflib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import lead_store
+import pipeline
+from lead_store import DATA_DIR, STAGE_PATHS, LEAD_COLUMNS
+from lead_import import normalize_email, normalize_linkedin
+
+GROUPS_PATH = os.path.join(DATA_DIR, "duplicate_groups.csv")
+
+# Highest lead ID an earlier run has already checked
+STATE_PATH = os.path.join(DATA_DIR, "dedup.state")
+
+# The Bin holds discarded leads, and Qualified keeps a copy of every lead that moved on to
+# Deals (Active), so neither is a duplicate of anything
+DEDUP_STAGES = [stage for stage in STAGE_PATHS if stage not in ("bin", "qualified")]
+
+MATCH_COLUMNS = ["First Name", "Last Name", "Company", "Email", "Phone Number", "Person Linkedin Url"]
+GROUP_COLUMNS = ["Group", lead_store.ID_COLUMN, "Stage", "First Name", "Last Name", "Company", "Email",
+                 "Score", "Match", "Status", "Found"]
+
+# Blocks up to this size compare every pair; larger ones only compare names WINDOW apart
+MAX_BLOCK = 50
+WINDOW = 10
+
+# A pair is a duplicate when its first and last names are at least this similar (one typo
+# in a five-letter first name still passes) and its weighted score (names 0.6, company
+# similarity or a shared phone/domain 0.4) reaches MATCH_THRESHOLD; less similar
+# companies count as no support
+THRESHOLDS = {"first": 0.75, "last": 0.85, "company": 0.85}
+MATCH_THRESHOLD = 0.9
+
+# Pairs per process-pool task, and fewer candidate pairs than this are scored inline
+CHUNK_PAIRS = 50_000
+
+# Shared mailbox providers say nothing about where someone works
+FREE_MAIL_DOMAINS = {
+    "gmail.com", "googlemail.com", "yahoo.com", "hotmail.com", "outlook.com", "live.com", "aol.com",
+    "icloud.com", "me.com", "msn.com", "protonmail.com", "gmx.com", "mail.com", "yandex.com",
+}
+
+COMPANY_SUFFIXES = r"\b(inc|llc|ltd|limited|corp|corporation|co|company|plc|gmbh|group|holdings)\b"
+
+REASONS = ["", "same email", "same linkedin url", "same name and company", "same name and phone",
+           "similar name and company"]
+
+def _squash(values):
+    return values.str.replace(r"[^a-z0-9 ]+", " ", regex=True).str.replace(r"\s+", " ", regex=True).str.strip()
+
+def normalize(data):
+    """The normalized fields leads are blocked and compared on, one row per lead of data."""
+    text = {column: data[column].astype(object).where(data[column].notna(), "").astype(str).str.lower()
+            if column in data.columns else pd.Series("", index=data.index) for column in MATCH_COLUMNS}
+    emails = normalize_email(text["Email"])
+    domains = emails.str.extract(r"@(.+)$", expand=False).fillna("")
+    digits = text["Phone Number"].str.replace(r"\D", "", regex=True).str[-10:]
+    return pd.DataFrame({
+        "name": _squash(text["First Name"] + " " + text["Last Name"]),
+        "first": _squash(text["First Name"]),
+        "last": _squash(text["Last Name"]),
+        "company": _squash(_squash(text["Company"]).str.replace(COMPANY_SUFFIXES, "", regex=True)),
+        "email": emails,
+        "domain": domains.where(~domains.isin(FREE_MAIL_DOMAINS), ""),
+        "profile": normalize_linkedin(text["Person Linkedin Url"]),
+        "phone": digits.where(digits.str.len() >= 7, ""),
+    }, index=data.index)
+
+def _codes(values):
+    """Integer code per value, equal values sharing one; empty values get -1 and never match."""
+    codes = pd.factorize(values)[0]
+    codes[(values == "").to_numpy()] = -1
+    return codes
+
+def _blocking_keys(fields):
+    """(key code, position) of every blocking key of every lead."""
+    keys, positions = [], []
+    for prefix, column in (("e:", "email"), ("l:", "profile"), ("d:", "domain"), ("p:", "phone"), ("c:", "company")):
+        present = (fields[column] != "").to_numpy()
+        key = prefix + fields[column][present]
+        if column == "company":
+            # Whole companies are big blocks; the start of the last name splits them up
+            key = key + "|" + fields["last"][present].str[:2]
+        keys.append(key)
+        positions.append(np.flatnonzero(present))
+    return pd.factorize(pd.concat(keys, ignore_index=True))[0], np.concatenate(positions)
+
+def candidate_pairs(fields, new=None):
+    """Unique (a, b) position pairs that share a block, a < b; only pairs touching new if given."""
+    block, position = _blocking_keys(fields)
+    # Sort by block, then by name, so near-identical names sit next to each other
+    names = pd.factorize(fields["name"], sort=True)[0]
+    order = np.lexsort((names[position], block))
+    block, position = block[order], position[order]
+    sizes = np.bincount(block)
+    reach = np.where(sizes[block] <= MAX_BLOCK, MAX_BLOCK - 1, WINDOW)
+
+    firsts, seconds = [], []
+    for offset in range(1, MAX_BLOCK):
+        same = (block[:-offset] == block[offset:]) & (offset <= reach[:-offset])
+        if not same.any():
+            break
+        firsts.append(position[:-offset][same])
+        seconds.append(position[offset:][same])
+    if not firsts:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    a, b = np.concatenate(firsts), np.concatenate(seconds)
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    keep = a != b
+    if new is not None:
+        keep &= new[a] | new[b]
+    pairs = np.unique(a[keep].astype(np.int64) * len(fields) + b[keep])
+    return pairs // len(fields), pairs % len(fields)
+
+_worker_fields = {}
+
+def _init_worker(firsts, lasts, companies):
+    _worker_fields.update(first=firsts, last=lasts, company=companies)
+
+def _ratio(x, y, threshold):
+    """Similarity of x and y, or 0 when it is below threshold."""
+    if x == y:
+        return 1.0
+    if not x or not y:
+        return 0.0
+    matcher = difflib.SequenceMatcher(None, x, y)
+    # quick_ratio is an upper bound of ratio, so most non-matches stop here
+    if matcher.quick_ratio() < threshold:
+        return 0.0
+    ratio = matcher.ratio()
+    return ratio if ratio >= threshold else 0.0
+
+def _score_chunk(a, b, evidence):
+    """Fuzzy scores of pairs (a, b); evidence is 1 where they already share a phone or domain."""
+    firsts, lasts, companies = _worker_fields["first"], _worker_fields["last"], _worker_fields["company"]
+    scores = np.zeros(len(a))
+    for i, (x, y) in enumerate(zip(a, b)):
+        last = _ratio(lasts[x], lasts[y], THRESHOLDS["last"])
+        if not last:
+            continue
+        first = _ratio(firsts[x], firsts[y], THRESHOLDS["first"])
+        if not first:
+            continue
+        support = evidence[i] or _ratio(companies[x], companies[y], THRESHOLDS["company"])
+        scores[i] = 0.3 * first + 0.3 * last + 0.4 * support
+    return scores
+
+def _length_bound(lengths, a, b):
+    """Upper bound of the similarity ratio of each pair, from string lengths alone."""
+    return 2 * np.minimum(lengths[a], lengths[b]) / np.maximum(lengths[a] + lengths[b], 1)
+
+def score_pairs(fields, a, b, workers=None):
+    """(score, reason index into REASONS) of every candidate pair; score 0 means no match."""
+    codes = {column: _codes(fields[column]) for column in ("name", "company", "email", "profile", "phone", "domain")}
+    same = {column: (values[a] == values[b]) & (values[a] >= 0) for column, values in codes.items()}
+    scores, reasons = np.zeros(len(a)), np.zeros(len(a), dtype=np.int8)
+
+    # Exact rules, settled with array comparisons
+    for column, reason in (("phone", 4), ("company", 3), ("profile", 2), ("email", 1)):
+        hit = same[column] & (same["name"] if column in ("phone", "company") else True)
+        scores[hit], reasons[hit] = 1.0, reason
+
+    # Everything else needs fuzzy name and company comparisons, unless the lengths alone
+    # already rule the names out or there is nothing to back the names up
+    evidence = same["phone"] | same["domain"]
+    has_company = (codes["company"][a] >= 0) & (codes["company"][b] >= 0)
+    candidate = (scores == 0) & (evidence | has_company)
+    for column in ("first", "last"):
+        candidate &= _length_bound(fields[column].str.len().to_numpy(), a, b) >= THRESHOLDS[column]
+    fuzzy = np.flatnonzero(candidate)
+    evidence = evidence[fuzzy].astype(float)
+
+    columns = [fields[column].tolist() for column in ("first", "last", "company")]
+    chunks = [slice(start, start + CHUNK_PAIRS) for start in range(0, len(fuzzy), CHUNK_PAIRS)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=columns) as pool:
+            parts = list(pool.map(_score_chunk, *zip(*[(a[fuzzy[c]], b[fuzzy[c]], evidence[c]) for c in chunks])))
+    else:
+        _init_worker(*columns)
+        parts = [_score_chunk(a[fuzzy[c]], b[fuzzy[c]], evidence[c]) for c in chunks]
+    if parts:
+        fuzzy_scores = np.concatenate(parts)
+        matched = fuzzy_scores >= MATCH_THRESHOLD
+        scores[fuzzy[matched]], reasons[fuzzy[matched]] = fuzzy_scores[matched], 5
+    return scores, reasons
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+def _clusters(pairs):
+    """Connected components of pairs of lead IDs, as {lead ID: representative lead ID}."""
+    parent = {}
+    for x, y in pairs:
+        parent.setdefault(x, x)
+        parent.setdefault(y, y)
+        root_x, root_y = _find(parent, x), _find(parent, y)
+        if root_x != root_y:
+            parent[max(root_x, root_y)] = min(root_x, root_y)
+    return {x: _find(parent, x) for x in parent}
+
+def load_groups(status=None):
+    """The duplicates store, optionally only the groups with status ("open", "merged", "dismissed")."""
+    if not os.path.exists(GROUPS_PATH):
+        return pd.DataFrame(columns=GROUP_COLUMNS)
+    groups = pd.read_csv(GROUPS_PATH, keep_default_na=False)
+    return groups if status is None else groups[groups["Status"] == status]
+
+def _write_groups(groups):
+    with lead_store.store_lock():
+        groups[GROUP_COLUMNS].to_csv(f"{GROUPS_PATH}.tmp", index=False)
+        os.replace(f"{GROUPS_PATH}.tmp", GROUPS_PATH)
+
+def _load_leads():
+    frames = []
+    for stage in DEDUP_STAGES:
+        data = lead_store.load_data(STAGE_PATHS[stage], MATCH_COLUMNS)
+        if not data.empty:
+            frames.append(data.assign(Stage=stage))
+    return pd.concat(frames) if frames else pd.DataFrame(columns=MATCH_COLUMNS + ["Stage"])
+
+def find_duplicates(incremental=False, workers=None):
+    """Detect duplicate leads across the stages and record them as open groups.
+
+    A full run rebuilds every open group; an incremental one only compares leads added
+    since the last run (against everyone) and grows the open groups it touches. Pairs
+    inside a dismissed group are never reported again. Returns counts of the run.
+    """
+    leads = _load_leads()
+    ids = leads.index.to_numpy()
+    fields = normalize(leads)
+
+    new = None
+    if incremental and os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as f:
+            new = ids > int(f.read())
+    a, b = candidate_pairs(fields, new)
+    scores, reasons = score_pairs(fields, a, b, workers)
+    matched = scores > 0
+    a, b, scores, reasons = a[matched], b[matched], scores[matched], reasons[matched]
+
+    # Pairs inside a dismissed group were judged not to be duplicates
+    stored = load_groups()
+    dismissed = stored[stored["Status"] == "dismissed"].drop_duplicates(lead_store.ID_COLUMN)
+    dismissed_group = pd.Series(dismissed["Group"].to_numpy(), index=dismissed[lead_store.ID_COLUMN], dtype=float)
+    group_a, group_b = dismissed_group.reindex(ids[a]).to_numpy(), dismissed_group.reindex(ids[b]).to_numpy()
+    allowed = ~(group_a == group_b)
+    a, b, scores, reasons = a[allowed], b[allowed], scores[allowed], reasons[allowed]
+    pairs = list(zip(ids[a].tolist(), ids[b].tolist()))
+    matches = len(pairs)
+
+    # Best score, and its reason, each lead was matched with
+    best = pd.DataFrame({"Score": np.tile(scores, 2).round(3), "Match": np.asarray(REASONS)[np.tile(reasons, 2)]},
+                        index=np.concatenate([ids[a], ids[b]]))
+    best = best.sort_values("Score")
+    best = best[~best.index.duplicated(keep="last")]
+
+    kept = stored[stored["Status"] != "open"]
+    previous = stored[stored["Status"] == "open"] if incremental else stored.iloc[0:0]
+    # Open groups an incremental run extends are chained together so they stay one group:
+    # every member is paired with the one before it in its group
+    prior = previous.groupby("Group")[lead_store.ID_COLUMN].shift()
+    chained = prior.notna()
+    pairs += list(zip(prior[chained].astype("int64").tolist(), previous.loc[chained, lead_store.ID_COLUMN].tolist()))
+    best = pd.concat([best, previous.set_index(lead_store.ID_COLUMN)[["Score", "Match"]]])
+    best = best[~best.index.duplicated()]
+
+    roots = pd.Series(_clusters(pairs), dtype="int64").sort_index()
+    roots = roots[roots.index.isin(leads.index)]
+    found = leads.loc[roots.index, ["Stage", "First Name", "Last Name", "Company", "Email"]]
+    first_group = int(stored["Group"].max()) + 1 if len(stored) else 1
+    found.insert(0, "Group", first_group + pd.factorize(roots.to_numpy())[0])
+    found = found.join(best).assign(Status="open", Found=datetime.now().isoformat(timespec="seconds"))
+    found = found.rename_axis(lead_store.ID_COLUMN).reset_index()
+    # A group needs at least two leads still in the stages
+    found = found[found.groupby("Group")["Group"].transform("size") > 1].sort_values(["Group", lead_store.ID_COLUMN])
+    _write_groups(pd.concat([kept, found], ignore_index=True))
+
+    with open(f"{STATE_PATH}.tmp", "w") as f:
+        f.write(str(int(ids.max()) if len(ids) else 0))
+    os.replace(f"{STATE_PATH}.tmp", STATE_PATH)
+    return {"leads": len(ids), "compared": len(matched), "matched": matches, "groups": found["Group"].nunique()}
+
+def _set_status(group, status):
+    with lead_store.store_lock():
+        groups = load_groups()
+        groups.loc[(groups["Group"] == group) & (groups["Status"] == "open"), "Status"] = status
+        _write_groups(groups)
+
+def dismiss_group(group):
+    """Mark a group as not duplicates; its leads are not reported together again."""
+    _set_status(group, "dismissed")
+
+def merge_group(group, keep_id):
+    """Keep lead keep_id of group, fill its empty fields from the others, and move the others to the Bin.
+
+    Returns the number of leads moved to the Bin.
+    """
+    groups = load_groups("open")
+    members = groups.loc[groups["Group"] == group, lead_store.ID_COLUMN].astype(int).tolist()
+    if keep_id not in members:
+        raise ValueError(f"lead {keep_id} is not in open duplicate group {group}")
+    with lead_store.store_lock():
+        # Leads may have moved since the group was found, so look them up again
+        where = lead_store.locate(members)
+        if keep_id not in where:
+            raise ValueError(f"lead {keep_id} is no longer in any stage")
+        frames = {stage: lead_store.load_data(STAGE_PATHS[stage]) for stage in {stage for stage, _ in where.values()}}
+        keep_stage = where[keep_id][0]
+        kept = frames[keep_stage].loc[keep_id]
+        fills = {}
+        for lead_id in members:
+            if lead_id == keep_id or lead_id not in where:
+                continue
+            other = frames[where[lead_id][0]].loc[lead_id]
+            for column in LEAD_COLUMNS:
+                if column in fills or column not in other.index:
+                    continue
+                if (pd.isna(kept.get(column)) or str(kept.get(column)) == "") and pd.notna(other[column]) and str(other[column]) != "":
+                    fills[column] = other[column]
+        if fills:
+            lead_store.apply_patch(STAGE_PATHS[keep_stage], {keep_id: fills})
+
+        batch = pipeline.TransitionBatch()
+        by_stage = {}
+        for lead_id in members:
+            if lead_id != keep_id and lead_id in where:
+                by_stage.setdefault(where[lead_id][0], []).append(lead_id)
+        for stage, lead_ids in by_stage.items():
+            batch.move(None, lead_ids, STAGE_PATHS[stage], [STAGE_PATHS["bin"]])
+        moved = batch.commit()
+        _set_status(group, "merged")
+    return moved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--incremental", action="store_true", help="only check leads added since the last run")
+    parser.add_argument("--workers", type=int, default=None, help="scoring processes (default: one per CPU)")
+    args = parser.parse_args()
+    started = datetime.now()
+    result = find_duplicates(args.incremental, args.workers)
+    print(f"{result['leads']} leads, {result['compared']} pairs compared, {result['matched']} matches, "
+          f"{result['groups']} open groups in {(datetime.now() - started).total_seconds():.1f}s")
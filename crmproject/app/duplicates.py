@@ -0,0 +1,51 @@
+import streamlit as st
+import dedup
+
+# Open groups listed at once
+MAX_GROUPS_SHOWN = 200
+
+def duplicates_page():
+    st.title("Duplicates")
+
+    columns = st.columns(2)
+    if columns[0].button("Find Duplicates", help="Compare every lead in every stage."):
+        with st.spinner("Comparing leads..."):
+            result = dedup.find_duplicates()
+        st.success(f"{result['matched']} matches in {result['groups']} groups among {result['leads']} leads.")
+    if columns[1].button("Check New Leads", help="Compare only the leads added since the last run."):
+        with st.spinner("Comparing new leads..."):
+            result = dedup.find_duplicates(incremental=True)
+        st.success(f"{result['matched']} new matches; {result['groups']} open groups.")
+
+    groups = dedup.load_groups("open")
+    if groups.empty:
+        st.info("No open duplicate groups.")
+        return
+
+    numbers = sorted(groups["Group"].unique())
+    st.write(f"{len(numbers)} open groups.")
+    shown = groups[groups["Group"].isin(numbers[:MAX_GROUPS_SHOWN])]
+    st.dataframe(shown.drop(columns=["Status"]), hide_index=True, use_container_width=True)
+
+    # Resolve one group: keep one lead and bin the rest, or mark it as not duplicates
+    st.subheader("Resolve a Group")
+    group = st.selectbox("Group", numbers)
+    members = groups[groups["Group"] == group]
+    labels = {
+        row["Lead ID"]: f"{row['Lead ID']}: {row['First Name']} {row['Last Name']}, {row['Company']} ({row['Stage']})"
+        for _, row in members.iterrows()
+    }
+    keep = st.selectbox("Lead to keep", list(labels), format_func=labels.get)
+    columns = st.columns(2)
+    if columns[0].button("Merge"):
+        try:
+            moved = dedup.merge_group(group, keep)
+        except ValueError as exc:
+            st.error(str(exc))
+        else:
+            st.success(f"Kept lead {keep}; {moved} duplicates moved to Bin.")
+            st.rerun()
+    if columns[1].button("Not Duplicates"):
+        dedup.dismiss_group(group)
+        st.success(f"Group {group} dismissed.")
+        st.rerun()
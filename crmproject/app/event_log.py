@@ -0,0 +1,392 @@
+"""Append-only log of every lead's stage transitions and edits, replayable into stage snapshots.
+
+    python event_log.py checkpoint | verify | history LEAD | replay OUTPUT_DIR
+
+lead_store and pipeline record every change through this module while they hold the store
+lock, so the log is in the same order as the stage files changed. One JSON event per line:
+timestamp, type (create, move, edit or replace), lead ID, from stage, to stages, AppSetter and,
+for edits, the field diffs {column: [old, new]}. A save logs one event for all its rows: a
+create or replace with the lead IDs under "leads", the column names under "columns" and
+one list of values per lead under "rows".
+
+Events are flushed to the OS on every write but fsynced in batches (FSYNC_BATCH events or
+FSYNC_INTERVAL seconds, whichever comes first). Once the active segment passes
+CHECKPOINT_BYTES a background thread seals it and snapshots every stage; replay starts from
+the newest checkpoint, so it only reads the events written since. Sealed segments are
+gzipped and kept as the lead history.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import atexit
+import pickle
+import threading
+from collections import Counter
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import lead_store
+from lead_store import DATA_DIR, STAGE_PATHS, LEAD_COLUMNS
+
+EVENTS_DIR = os.path.join(DATA_DIR, "events")
+LOG_PATH = os.path.join(EVENTS_DIR, "events.log")  # the active segment
+
+FSYNC_BATCH = 256      # events written before the log is fsynced
+FSYNC_INTERVAL = 1.0   # seconds an event may wait for its fsync
+CHECKPOINT_BYTES = 32 * 2**20  # size of the active segment that triggers a checkpoint
+KEEP_CHECKPOINTS = 2
+
+_lock = threading.Lock()
+_state = {"file": None, "unsynced": 0, "synced_at": 0.0, "timer": None, "checkpoint": None}
+
+def _segment_path(number):
+    return os.path.join(EVENTS_DIR, f"segment-{number:06d}.log")
+
+def _checkpoint_path(number):
+    return os.path.join(EVENTS_DIR, f"checkpoint-{number:06d}.pkl")
+
+def _numbers(prefix):
+    """Numbers of the sealed segments or checkpoints on disk, oldest first."""
+    if not os.path.isdir(EVENTS_DIR):
+        return []
+    return sorted(int(name[len(prefix) + 1:].split(".")[0])
+                  for name in os.listdir(EVENTS_DIR)
+                  if name.startswith(prefix + "-") and not name.endswith(".tmp"))
+
+def _open():
+    """The active segment, reopened if another process sealed it since this one opened it."""
+    f = _state["file"]
+    if f is not None:
+        try:
+            if os.fstat(f.fileno()).st_ino == os.stat(LOG_PATH).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        _sync()
+        f.close()
+    os.makedirs(EVENTS_DIR, exist_ok=True)
+    _state["file"] = open(LOG_PATH, "a", encoding="utf-8")
+    return _state["file"]
+
+def _sync():
+    if _state["file"] is not None and _state["unsynced"]:
+        os.fsync(_state["file"].fileno())
+    _state["unsynced"] = 0
+    _state["synced_at"] = time.monotonic()
+
+def flush():
+    """fsync every event written so far."""
+    with _lock:
+        _state["timer"] = None
+        _sync()
+
+def _schedule_flush():
+    if _state["timer"] is None:
+        timer = threading.Timer(FSYNC_INTERVAL, flush)
+        timer.daemon = True
+        _state["timer"] = timer
+        timer.start()
+
+def _append(events):
+    """Write events to the active segment."""
+    if events:
+        _write_lines([json.dumps(event, default=str) for event in events])
+
+def _write_lines(lines):
+    """Write JSON event lines to the active segment; checkpoint when it has grown past CHECKPOINT_BYTES."""
+    with _lock:
+        f = _open()
+        # One write per batch, under the store lock, so lines of different processes never interleave
+        f.write("".join(line + "\n" for line in lines))
+        f.flush()
+        _state["unsynced"] += len(lines)
+        if _state["unsynced"] >= FSYNC_BATCH or time.monotonic() - _state["synced_at"] >= FSYNC_INTERVAL:
+            _sync()
+        else:
+            _schedule_flush()
+        size = f.tell()
+    # The first checkpoint is the baseline every later replay starts from
+    if size >= CHECKPOINT_BYTES or not _numbers("checkpoint"):
+        _checkpoint_in_background()
+
+def _checkpoint_in_background():
+    """Start a checkpoint thread unless one is running; it seals once the caller releases the store lock."""
+    with _lock:
+        running = _state["checkpoint"]
+        if running is not None and running.is_alive():
+            return
+        # Not a daemon, so a short-lived process still finishes the checkpoint it started
+        _state["checkpoint"] = threading.Thread(target=checkpoint, name="event-checkpoint")
+        _state["checkpoint"].start()
+
+def _now():
+    return datetime.now().isoformat(timespec="milliseconds")
+
+def _leads(rows):
+    return [int(lead_id) for lead_id in rows.index]
+
+def _value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+def _setters(rows):
+    if "AppSetter" not in rows.columns:
+        return [None] * len(rows)
+    return [_value(setter) for setter in rows["AppSetter"]]
+
+def record_moves(moved, source_path, target_paths, copies=()):
+    """Log moved leads leaving source_path for every target path.
+
+    copies holds the moved rows again under the new lead IDs they got in each extra target.
+    """
+    source = lead_store.stage_for_path(source_path)
+    targets = [lead_store.stage_for_path(target_path) for target_path in target_paths]
+    if moved.empty or source is None or None in targets:
+        return
+    timestamp = _now()
+    copy_ids = list(zip(*[_leads(copy) for copy in copies])) or [()] * len(moved)
+    _append([
+        dict({"ts": timestamp, "type": "move", "lead": lead, "from": source, "to": targets, "appsetter": setter},
+             **({"copies": list(ids)} if ids else {}))
+        for lead, setter, ids in zip(_leads(moved), _setters(moved), copy_ids)
+    ])
+
+def record_save(file_path, rows, append):
+    """Log rows appended to a stage, or a stage replaced wholesale by rows, as a single event."""
+    stage = lead_store.stage_for_path(file_path)
+    if stage is None or (append and rows.empty):
+        return
+    event = {"ts": _now(), "type": "create" if append else "replace", "lead": None, "leads": _leads(rows),
+             "from": None, "to": [stage], "appsetter": None, "columns": LEAD_COLUMNS}
+    # The rows go in as one JSON array written by pandas, not a dict per lead
+    data = rows.reindex(columns=LEAD_COLUMNS).to_json(orient="values", date_format="iso")
+    _write_lines([json.dumps(event)[:-1] + ', "rows": ' + data + "}"])
+
+def record_patch(file_path, rows, old_values, patch):
+    """Log the cells apply_patch changed; rows holds the patched leads, old_values {(row, column): old}."""
+    stage = lead_store.stage_for_path(file_path)
+    if stage is None or not old_values:
+        return
+    diffs = {}
+    for (row, column), old in old_values.items():
+        diffs.setdefault(row, {})[column] = [_value(old), _value(patch[row][column])]
+    rows = rows.loc[[row for row in diffs if row in rows.index]]
+    timestamp = _now()
+    _append([
+        {"ts": timestamp, "type": "edit", "lead": lead, "from": stage, "to": [stage],
+         "appsetter": diffs[row]["AppSetter"][1] if "AppSetter" in diffs[row] else setter, "diff": diffs[row]}
+        for row, lead, setter in zip(rows.index, _leads(rows), _setters(rows))
+    ])
+
+def checkpoint():
+    """Seal the active segment and snapshot every stage as of its last event.
+
+    Only sealing and taking the stage frames hold the store lock; the frames are the shared
+    cached ones, which nobody modifies, so pickling and compacting run after it is released.
+    """
+    with lead_store.store_lock():
+        with _lock:
+            number = max(_numbers("segment") + _numbers("checkpoint") + [0]) + 1
+            os.makedirs(EVENTS_DIR, exist_ok=True)
+            stages = {stage: lead_store.load_data(file_path) for stage, file_path in STAGE_PATHS.items()}
+            # Sealed before the snapshot lands: a crash in between leaves the segment to replay
+            if os.path.exists(LOG_PATH):
+                # fsync covers what every process wrote to the segment, not just this one
+                with open(LOG_PATH, "rb") as f:
+                    os.fsync(f.fileno())
+                os.replace(LOG_PATH, _segment_path(number))
+    tmp_path = f"{_checkpoint_path(number)}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(stages, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, _checkpoint_path(number))
+    compact()
+
+def compact():
+    """Gzip sealed segments a checkpoint covers and drop all but the newest checkpoints.
+
+    Safe to run in several processes at once; whoever gets to a file first handles it.
+    """
+    checkpoints = _numbers("checkpoint")
+    if not checkpoints:
+        return
+    for number in _numbers("segment"):
+        path = _segment_path(number)
+        if number <= checkpoints[-1] and os.path.exists(path):
+            tmp_path = f"{path}.gz.{os.getpid()}.tmp"
+            try:
+                with open(path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+                    dst.write(src.read())
+                os.replace(tmp_path, f"{path}.gz")
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    for number in checkpoints[:-KEEP_CHECKPOINTS]:
+        try:
+            os.remove(_checkpoint_path(number))
+        except FileNotFoundError:
+            pass
+
+def _read_events(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            # A torn last line from a crash mid-write is not an event
+            if line.endswith("\n"):
+                yield json.loads(line)
+
+def _segments(after=0):
+    """Every segment file holding events after checkpoint `after`, oldest first, active last."""
+    paths = []
+    for number in _numbers("segment"):
+        if number > after:
+            path = _segment_path(number)
+            paths.append(path if os.path.exists(path) else f"{path}.gz")
+    if os.path.exists(LOG_PATH):
+        paths.append(LOG_PATH)
+    return paths
+
+def _event_rows(event):
+    """(lead, row dict) of every lead a create or replace event added."""
+    if "leads" not in event:
+        # A create from before saves were logged as one event
+        return [(event["lead"], {column: new for column, (_, new) in event["diff"].items()})]
+    return [(lead, dict(zip(event["columns"], values))) for lead, values in zip(event["leads"], event["rows"])]
+
+class _Stage:
+    """One stage during replay: the checkpoint frame plus the rows changed since."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.changed = {}  # {lead: row dict} for leads added or edited since the checkpoint
+        self.removed = set()
+
+    def holds(self, lead):
+        return lead in self.changed or (lead in self.frame.index and lead not in self.removed)
+
+    def take(self, lead):
+        """Remove and return the row of lead, or None if the stage does not hold it."""
+        if not self.holds(lead):
+            return None
+        row = self.changed.pop(lead, None) or self.frame.loc[lead].to_dict()
+        self.removed.add(lead)
+        return row
+
+    def add(self, lead, row):
+        self.changed[lead] = dict(row)
+
+    def edit(self, lead, diff):
+        if not self.holds(lead):
+            return False
+        if lead not in self.changed:
+            self.changed[lead] = self.frame.loc[lead].to_dict()
+        for column, (_, new) in diff.items():
+            self.changed[lead][column] = new
+        return True
+
+    def to_frame(self):
+        # Leads edited in place keep their row; leads moved in are appended in event order
+        kept = self.frame[~self.frame.index.isin(self.removed | set(self.changed))].astype(object)
+        changed = pd.DataFrame.from_dict(self.changed, orient="index").reindex(columns=self.frame.columns)
+        data = pd.concat([kept, changed])
+        position = self.frame.index.get_indexer(data.index)
+        position = np.where(position >= 0, position, len(self.frame) + np.arange(len(data)))
+        return lead_store.compact(data.iloc[np.argsort(position, kind="stable")])
+
+def replay():
+    """Rebuild {stage: DataFrame} from the newest checkpoint and the events written since.
+
+    Also returns the number of events that named a lead the rebuilt stage did not hold.
+    """
+    checkpoints = _numbers("checkpoint")
+    if not checkpoints:
+        raise FileNotFoundError(f"no event log checkpoint in {EVENTS_DIR}")
+    with open(_checkpoint_path(checkpoints[-1]), "rb") as f:
+        frames = pickle.load(f)
+    stages = {stage: _Stage(frame) for stage, frame in frames.items()}
+
+    unmatched = 0
+    for path in _segments(after=checkpoints[-1]):
+        for event in _read_events(path):
+            if event["type"] == "create":
+                for lead, row in _event_rows(event):
+                    stages[event["to"][0]].add(lead, row)
+            elif event["type"] == "replace" and "rows" in event:
+                stage = stages[event["to"][0]]
+                stages[event["to"][0]] = replaced = _Stage(stage.frame.iloc[0:0])
+                for lead, row in _event_rows(event):
+                    replaced.add(lead, row)
+            elif event["type"] == "move":
+                row = stages[event["from"]].take(event["lead"])
+                if row is None:
+                    unmatched += 1
+                    continue
+                for target, lead in zip(event["to"], [event["lead"]] + event.get("copies", [])):
+                    stages[target].add(lead, row)
+            elif event["type"] == "edit":
+                if not stages[event["from"]].edit(event["lead"], event["diff"]):
+                    unmatched += 1
+            # A replace without rows is from before replaces logged them; a checkpoint followed it
+    return {stage: state.to_frame() for stage, state in stages.items()}, unmatched
+
+def history(lead):
+    """Every event of lead, oldest first; a save of many leads shows as that lead's own event."""
+    found = []
+    for path in _segments():
+        for event in _read_events(path):
+            if event["lead"] == lead:
+                found.append(event)
+            elif lead in event.get("leads", ()):
+                row = dict(_event_rows(event))[lead]
+                found.append({"ts": event["ts"], "type": event["type"], "lead": lead, "from": None, "to": event["to"],
+                              "appsetter": row.get("AppSetter"),
+                              "diff": {column: [None, value] for column, value in row.items() if value is not None}})
+    return found
+
+def verify():
+    """Compare a replay with the stage data; return {stage: leads that differ} for stages that differ."""
+    rebuilt, _ = replay()
+    differences = {}
+    for stage, file_path in STAGE_PATHS.items():
+        data = lead_store.load_data(file_path)
+        expected = Counter(zip(_leads(data), lead_store.version_stamps(data).tolist()))
+        actual = Counter(zip(_leads(rebuilt[stage]), lead_store.version_stamps(rebuilt[stage]).tolist()))
+        difference = sum(((expected - actual) + (actual - expected)).values())
+        if difference:
+            differences[stage] = difference
+    return differences
+
+atexit.register(flush)
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "checkpoint":
+        checkpoint()
+        print(f"checkpoint {_numbers('checkpoint')[-1]} written")
+    elif command == "verify":
+        differences = verify()
+        for stage, difference in differences.items():
+            print(f"{stage}: {difference} leads differ from the replay")
+        print("replay matches the stage data" if not differences else "replay differs")
+        sys.exit(1 if differences else 0)
+    elif command == "history" and len(sys.argv) > 2:
+        lead = int(sys.argv[2])
+        for event in history(lead):
+            print(json.dumps(event))
+        where = lead_store.locate([lead]).get(lead)
+        print(f"lead {lead} is now in {where[0]}, row {where[1]}" if where else f"lead {lead} is in no stage")
+    elif command == "replay" and len(sys.argv) > 2:
+        rebuilt, unmatched = replay()
+        os.makedirs(sys.argv[2], exist_ok=True)
+        for stage, data in rebuilt.items():
+            data.to_csv(os.path.join(sys.argv[2], f"{stage}.csv"), index_label=lead_store.ID_COLUMN)
+        print(f"{len(rebuilt)} stages written to {sys.argv[2]}; {unmatched} events did not match a lead")
+    else:
+        sys.exit(__doc__.splitlines()[2].strip())
+
+if __name__ == "__main__":
+    main()
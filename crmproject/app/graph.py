@@ -1,67 +1,123 @@
 import streamlit as st
 import pandas as pd
-import os
-import matplotlib.pyplot as plt
+from functools import lru_cache
+from io import BytesIO
+import weekly_cube
 
-# File paths
-DEALS_ACTIVE_PATH = "/crmproject/data/deals_active.csv"
-FOLLOW_UP_PATH = "/crmproject/data/follow_up.csv"
-CLOSED_DEAL_PATH = "/crmproject/data/closed_deal.csv"
-Qualified_DEAL_PATH = "/crmproject/data/qualified.csv"
+# Selectable stages -> stage names in the weekly cube
+STAGE_OPTIONS = {
+    "Active": "deals_active",
+    "Closed": "closed_deal",
+    "Follow-Up": "follow_up",
+    "Qualified": "qualified",
+    "Lost": "lost_deal",
+    "Disqualified": "disqualified",
+}
 
-def load_data(file_path):
-    if os.path.exists(file_path):
-        return pd.read_csv(file_path)
-    else:
-        return pd.DataFrame()
+# Order of the bars in the stage funnel
+FUNNEL_STAGES = ["Qualified", "Disqualified", "Active", "Follow-Up", "Closed", "Lost"]
+
+# Rendered PNGs kept per process; each entry is one small image
+CHART_CACHE_SIZE = 128
+
+def range_counts(start_date, end_date):
+    """Weekly cube counts of every stage for the weeks overlapping [start_date, end_date]."""
+    data = weekly_cube.all_counts()
+    first_week = pd.Timestamp(start_date) - pd.Timedelta(days=pd.Timestamp(start_date).weekday())
+    data = data[(data['week'] >= first_week) & (data['week'] <= pd.Timestamp(end_date))]
+    labels = {stage: label for label, stage in STAGE_OPTIONS.items()}
+    return data.assign(Stage=data['stage'].map(labels))
+
+def _draw_bar(ax, data, csv_option):
+    # Count rows grouped by 'AppSetter'
+    grouped_data = data[data['Stage'] == csv_option].groupby('AppSetter')['Count'].sum().reset_index()
+    ax.bar(grouped_data['AppSetter'], grouped_data['Count'], color='skyblue')
+    ax.set_xlabel('AppSetter', fontsize=10)
+    ax.set_ylabel('Number of Rows', fontsize=10)
+    ax.set_title(f'Bar Graph for {csv_option} Deals', fontsize=12)
+    ax.set_xticks(range(len(grouped_data['AppSetter'])))
+    ax.set_xticklabels(grouped_data['AppSetter'], rotation=45, ha='right', fontsize=8)
+
+def _draw_trend(ax, data, csv_option):
+    trend = data[data['Stage'] == csv_option].pivot_table(index='week', columns='AppSetter', values='Count', aggfunc='sum', fill_value=0)
+    for appsetter in trend.columns:
+        ax.plot(trend.index, trend[appsetter], marker='o', label=appsetter)
+    ax.set_ylabel('Leads per Week', fontsize=10)
+    ax.set_title(f'Weekly Trend for {csv_option} Deals', fontsize=12)
+    ax.tick_params(axis='x', labelrotation=45, labelsize=8)
+    if len(trend.columns):
+        ax.legend(fontsize=8)
+
+def _draw_funnel(ax, data, csv_option):
+    totals = data.groupby('Stage')['Count'].sum().reindex(FUNNEL_STAGES, fill_value=0)
+    colors = ['steelblue' if stage == csv_option else 'skyblue' for stage in totals.index]
+    ax.barh(totals.index[::-1], totals.values[::-1], color=colors[::-1])
+    ax.set_xlabel('Number of Rows', fontsize=10)
+    ax.set_title('Stage Funnel', fontsize=12)
+
+def _draw_conversion(ax, data, csv_option):
+    by_appsetter = data.pivot_table(index='AppSetter', columns='Stage', values='Count', aggfunc='sum', fill_value=0)
+    by_appsetter = by_appsetter.reindex(columns=['Qualified', 'Closed'], fill_value=0)
+    ratio = (by_appsetter['Closed'] / by_appsetter['Qualified'].where(by_appsetter['Qualified'] > 0)).fillna(0)
+    ax.bar(ratio.index, ratio.values * 100, color='seagreen')
+    ax.set_ylabel('Closed / Qualified (%)', fontsize=10)
+    ax.set_title('Conversion Ratio by AppSetter', fontsize=12)
+    ax.tick_params(axis='x', labelrotation=45, labelsize=8)
+
+CHARTS = {
+    "bar": _draw_bar,
+    "trend": _draw_trend,
+    "funnel": _draw_funnel,
+    "conversion": _draw_conversion,
+}
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def render_chart(kind, csv_option, start_date, end_date, data_version):
+    """Render one dashboard chart to PNG bytes.
+
+    data_version (weekly_cube.version()) is part of the cache key, so any stage change
+    renders fresh charts while repeated views come straight from the cache.
+    """
+    # Imported here so opening other pages never pays for loading matplotlib
+    from matplotlib.figure import Figure
+
+    # A bare Figure is not registered with pyplot, so nothing accumulates between reruns
+    fig = Figure(figsize=(5, 3))
+    try:
+        CHARTS[kind](fig.subplots(), range_counts(start_date, end_date), csv_option)
+        buffer = BytesIO()
+        fig.savefig(buffer, format='png', bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        fig.clf()
 
 def weekly_graphs_page():
     st.title("Weekly Graphs")
-    
-    # CSV Selection
-    csv_option = st.selectbox("Select Deal Page", ["Active", "Closed", "Follow-Up",'Qualified'])
-    if csv_option == "Active":
-        data_path = DEALS_ACTIVE_PATH
-    elif csv_option == "Closed":
-        data_path = CLOSED_DEAL_PATH
-    elif csv_option == "Follow-Up":
-        data_path = FOLLOW_UP_PATH
-    elif csv_option == "Qualified":
-        data_path = Qualified_DEAL_PATH
-    
-    # Load the selected CSV
-    data = load_data(data_path)
-    
+
+    # Stage Selection
+    csv_option = st.selectbox("Select Deal Page", list(STAGE_OPTIONS))
+
+    # Weekly counts per AppSetter come from the precomputed cube, not the stage files
+    data = weekly_cube.weekly_counts(STAGE_OPTIONS[csv_option])
+
     if data.empty:
-        st.warning("No data available in the selected CSV.")
-        return
-    
-    # Ensure 'Date' and 'AppSetter' columns exist
-    if 'Date' not in data.columns or 'AppSetter' not in data.columns:
-        st.error("The selected CSV is missing required columns: 'Date' and 'AppSetter'.")
+        st.warning("No data available in the selected stage.")
         return
-    
-    # Filter by date range
-    data['Date'] = pd.to_datetime(data['Date'], errors='coerce')  # Convert Date column to datetime
-    data = data.dropna(subset=['Date'])  # Remove rows with invalid dates
 
     st.subheader("Filter Data by Date Range")
-    min_date = data['Date'].min()
-    max_date = data['Date'].max()
+    min_date = data['week'].min()
+    max_date = data['week'].max() + pd.Timedelta(days=6)
     start_date, end_date = st.date_input("Select Date Range", [min_date, max_date])
-    
+
     if start_date > end_date:
         st.error("Start date cannot be after end date.")
         return
-    
-    filtered_data = data[(data['Date'] >= pd.Timestamp(start_date)) & (data['Date'] <= pd.Timestamp(end_date))]
 
-    if filtered_data.empty:
+    if range_counts(start_date, end_date).query('Stage == @csv_option').empty:
         st.warning("No data found for the selected date range.")
         return
-    
-    # Count rows grouped by 'AppSetter'
-    grouped_data = filtered_data.groupby('AppSetter').size().reset_index(name='Count')
+
+    data_version = weekly_cube.version()
 
 # Plotting the bar graph
     st.subheader("Bar Graph")
@@ -69,17 +125,12 @@ def weekly_graphs_page():
 
     with col1:
         # Show the graph in the narrower column
-        fig, ax = plt.subplots(figsize=(5, 3))  # Adjust figure size
-        ax.bar(grouped_data['AppSetter'], grouped_data['Count'], color='skyblue')
-        ax.set_xlabel('AppSetter', fontsize=10)
-        ax.set_ylabel('Number of Rows', fontsize=10)
-        ax.set_title(f'Bar Graph for {csv_option} Deals', fontsize=12)
-        ax.set_xticks(range(len(grouped_data['AppSetter'])))
-        ax.set_xticklabels(grouped_data['AppSetter'], rotation=45, ha='right', fontsize=8)
-
-        st.pyplot(fig)
+        st.image(render_chart("bar", csv_option, start_date, end_date, data_version))
 
     with col2:
-        # Add other graphs or information in the second column
-        st.write("Placeholder for other content")
-
+        st.image(render_chart("trend", csv_option, start_date, end_date, data_version))
+        funnel_col, conversion_col = st.columns(2)
+        with funnel_col:
+            st.image(render_chart("funnel", csv_option, start_date, end_date, data_version))
+        with conversion_col:
+            st.image(render_chart("conversion", csv_option, start_date, end_date, data_version))
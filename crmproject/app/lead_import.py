@@ -0,0 +1,166 @@
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+import lead_store
+from lead_store import DATA_DIR, STAGE_PATHS, LEAD_COLUMNS, save_data
+
+RAW_DATA_PATH = STAGE_PATHS["raw_data"]
+DUPLICATED_PATH = os.path.join(DATA_DIR, "duplicated.csv")
+DEDUP_INDEX_PATH = os.path.join(DATA_DIR, "dedup_index.npy")
+
+CHUNK_SIZE = 50_000
+
+# Vendor header spellings (lower-cased, single-spaced) -> our column names
+COLUMN_ALIASES = {
+    "first name": "First Name", "firstname": "First Name", "first": "First Name",
+    "last name": "Last Name", "lastname": "Last Name", "last": "Last Name", "surname": "Last Name",
+    "title": "Title", "job title": "Title", "position": "Title",
+    "company": "Company", "company name": "Company", "organization": "Company", "account name": "Company",
+    "email": "Email", "email address": "Email", "work email": "Email", "e mail": "Email",
+    "phone number": "Phone Number", "phone": "Phone Number", "mobile phone": "Phone Number",
+    "work direct phone": "Phone Number", "corporate phone": "Phone Number",
+    "industry": "Industry",
+    "person linkedin url": "Person Linkedin Url", "linkedin url": "Person Linkedin Url",
+    "linkedin": "Person Linkedin Url", "linkedin profile": "Person Linkedin Url",
+    "website": "Website", "company website": "Website",
+    "company linkedin url": "Company Linkedin Url", "company linkedin": "Company Linkedin Url",
+    "company address": "Company Address", "address": "Company Address",
+    "company city": "Company City", "city": "Company City",
+    "company state": "Company State", "state": "Company State", "region": "Company State",
+    "company country": "Company Country", "country": "Company Country",
+}
+
+def normalize_columns(chunk):
+    """Rename vendor headers to the 18-column lead schema, dropping anything else."""
+    renames = {}
+    for column in chunk.columns:
+        name = re.sub(r"[\s_\-]+", " ", str(column)).strip().lower()
+        target = COLUMN_ALIASES.get(name)
+        if target and target not in renames.values():
+            renames[column] = target
+    return chunk.rename(columns=renames).reindex(columns=LEAD_COLUMNS)
+
+def normalize_email(values):
+    return values.fillna("").astype(str).str.strip().str.lower()
+
+def normalize_linkedin(values):
+    """Reduce profile URLs to host/path so http/https, www. and trailing slashes compare equal."""
+    values = values.fillna("").astype(str).str.strip().str.lower()
+    return values.str.replace(r"^https?://", "", regex=True).str.replace(r"^www\.", "", regex=True).str.rstrip("/")
+
+def _hash(values):
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+def lead_keys(data):
+    """Hashes of the normalized Email and LinkedIn URL of each row, with masks of the non-empty ones."""
+    emails = normalize_email(data["Email"]) if "Email" in data.columns else pd.Series("", index=data.index)
+    profiles = (normalize_linkedin(data["Person Linkedin Url"]) if "Person Linkedin Url" in data.columns
+                else pd.Series("", index=data.index))
+    # Salt the URL hashes so an email can never collide with a profile URL
+    return (_hash(emails), (emails != "").to_numpy(),
+            _hash("li:" + profiles), (profiles != "").to_numpy(), emails, profiles)
+
+class DedupIndex:
+    """Persistent set of Email / LinkedIn URL hashes for every lead in every stage.
+
+    Stored as one sorted uint64 array, so membership checks for a whole chunk are a
+    single vectorized searchsorted.
+    """
+
+    def __init__(self, path=DEDUP_INDEX_PATH):
+        self.path = path
+        if os.path.exists(path):
+            self.keys = np.load(path)
+        else:
+            self.rebuild()
+
+    def rebuild(self):
+        """Build the index from scratch from every stage."""
+        hashes = []
+        for file_path in STAGE_PATHS.values():
+            data = lead_store.load_data(file_path, ["Email", "Person Linkedin Url"])
+            if data.empty:
+                continue
+            email_hash, has_email, profile_hash, has_profile, _, _ = lead_keys(data)
+            hashes += [email_hash[has_email], profile_hash[has_profile]]
+        self.keys = np.unique(np.concatenate(hashes)) if hashes else np.array([], dtype=np.uint64)
+        self.save()
+
+    def contains(self, hashes):
+        if not len(self.keys):
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(self.keys, hashes)
+        positions[positions == len(self.keys)] = 0
+        return self.keys[positions] == hashes
+
+    def add(self, hashes):
+        self.keys = np.union1d(self.keys, hashes)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.keys)
+        os.replace(tmp_path, self.path)
+
+def _read_chunks(source, chunksize):
+    """Yield DataFrame chunks of a CSV or Excel export without loading it all at once."""
+    name = getattr(source, "name", source)
+    if str(name).lower().endswith((".xlsx", ".xlsm")):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportError("Importing Excel files requires openpyxl (pip install openpyxl).")
+        sheet = load_workbook(source, read_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(value) for value in next(rows, [])]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header, dtype=str)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header, dtype=str)
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize, dtype=str)
+
+def import_leads(source, chunksize=CHUNK_SIZE):
+    """Stream a vendor CSV/Excel export into raw_data, skipping leads we already have.
+
+    A row is rejected when its normalized Email or Person Linkedin Url is already in any
+    stage or earlier in the import; rejected rows go to duplicated.csv with a Reason.
+    Returns {"imported": n, "rejected": n}.
+    """
+    index = DedupIndex()
+    source_name = os.path.basename(str(getattr(source, "name", source)))
+    imported = rejected = 0
+
+    for chunk in _read_chunks(source, chunksize):
+        chunk = normalize_columns(chunk)
+        email_hash, has_email, profile_hash, has_profile, emails, profiles = lead_keys(chunk)
+
+        dup_email = has_email & (index.contains(email_hash) | emails.where(has_email).duplicated().to_numpy())
+        dup_profile = has_profile & (index.contains(profile_hash) | profiles.where(has_profile).duplicated().to_numpy())
+        duplicate = dup_email | dup_profile
+
+        accepted = chunk[~duplicate]
+        if len(accepted):
+            save_data(accepted, RAW_DATA_PATH, append=True)
+            index.add(np.concatenate([email_hash[has_email & ~duplicate], profile_hash[has_profile & ~duplicate]]))
+        if duplicate.any():
+            reasons = np.where(dup_email, "duplicate email", "duplicate linkedin url")[duplicate]
+            save_data(chunk[duplicate].assign(Reason=reasons, Source=source_name), DUPLICATED_PATH, append=True)
+
+        imported += len(accepted)
+        rejected += int(duplicate.sum())
+
+    index.save()
+    return {"imported": imported, "rejected": rejected}
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python lead_import.py <vendor export .csv/.xlsx>")
+    result = import_leads(sys.argv[1])
+    print(f"{result['imported']} leads imported, {result['rejected']} duplicates rejected")
@@ -0,0 +1,740 @@
+import io
+import os
+import json
+import uuid
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+import perf_metrics
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the thread lock still applies
+    fcntl = None
+
+DATA_DIR = os.environ.get("CRM_DATA_DIR", "/crmproject/data")
+
+# "csv" keeps one file per stage; "parquet" keeps one typed Parquet file per stage
+# (parquet_store); "sqlite" reads and writes the leads table in sqlite_store
+BACKEND = os.environ.get("CRM_STORAGE_BACKEND", "csv")
+
+# Pipeline stage name -> the stage file it has always lived in
+STAGE_PATHS = {
+    "raw_data": os.path.join(DATA_DIR, "raw_data.csv"),
+    "not_picked": os.path.join(DATA_DIR, "not_picked.csv"),
+    "callback": os.path.join(DATA_DIR, "callback.csv"),
+    "meeting_booked": os.path.join(DATA_DIR, "meeting_booked.csv"),
+    "qualified": os.path.join(DATA_DIR, "qualified.csv"),
+    "disqualified": os.path.join(DATA_DIR, "disqualified.csv"),
+    "deals_active": os.path.join(DATA_DIR, "deals_active.csv"),
+    "follow_up": os.path.join(DATA_DIR, "follow_up.csv"),
+    "closed_deal": os.path.join(DATA_DIR, "closed_deal.csv"),
+    "lost_deal": os.path.join(DATA_DIR, "lost_deal.csv"),
+    "bin": os.path.join(DATA_DIR, "bin.csv"),
+}
+
+# Every cell edit saved through apply_patch, one JSON object per line
+CHANGE_LOG_PATH = os.path.join(DATA_DIR, "change_log.jsonl")
+
+# Every stage file stores the lead ID as its first column; frames are indexed by it
+ID_COLUMN = "Lead ID"
+
+# Next unused lead ID; IDs only ever grow, so a deleted lead's ID is never handed out again
+LEAD_ID_PATH = os.path.join(DATA_DIR, "lead_ids.next")
+
+# The 18 columns every stage file carries besides its lead ID
+LEAD_COLUMNS = [
+    "First Name", "Last Name", "Title", "Company", "Email", "Phone Number", "Industry",
+    "Person Linkedin Url", "Website", "Company Linkedin Url", "Company Address",
+    "Company City", "Company State", "Company Country", "Date", "priority", "comment", "AppSetter",
+]
+
+# Columns the pages let setters edit; the rest identify the lead
+EDITABLE_COLUMNS = ["Date", "priority", "comment", "AppSetter"]
+IDENTITY_COLUMNS = [col for col in LEAD_COLUMNS if col not in EDITABLE_COLUMNS]
+
+# Key of a bulk-move condition on the age of a lead's Date, in days
+OLDER_THAN = "older_than_days"
+
+# Low-cardinality columns, held as categoricals whose dictionary is shared by every stage frame
+CATEGORY_COLUMNS = ["priority", "AppSetter", "Industry", "Company City", "Company State", "Company Country"]
+_dictionaries = {}  # {column: CategoricalDtype}; a dictionary only ever grows
+_dictionary_lock = threading.Lock()
+
+# Held while reading-checking-writing stage data, across threads and worker processes
+LOCK_PATH = os.path.join(DATA_DIR, ".store.lock")
+_store_lock = threading.RLock()
+_lock_state = {"depth": 0, "file": None}
+
+# Outcome of apply_patch: cells written, and (row, column) edits rejected as conflicts
+PatchResult = namedtuple("PatchResult", ["written", "conflicts"])
+
+# Called as fn(file_path, columns, versions) after save_data or apply_patch writes a file.
+# columns is the set of columns an edit changed, or None when whole rows were written;
+# versions is (stage_version before the write, after it), both taken under the store lock
+_write_listeners = []
+
+# Parsed stage files shared by every session: {storage path: ((mtime_ns, size), DataFrame, _Tail or None)}
+_cache = {}
+_cache_lock = threading.Lock()
+
+# Rewrite generation of each stage file. Appends leave it alone; a rewrite makes it odd
+# while the file is replaced and a new even value after, so a reader that sees the same even
+# generation before and after reading knows the bytes it parsed earlier are all still there
+GENERATIONS_PATH = os.path.join(DATA_DIR, "stage_generations.json")
+
+# What the last read of a CSV stage file covered: its generation, the bytes parsed, the
+# header line and the last line parsed; the next read parses only what was appended after
+_Tail = namedtuple("_Tail", ["generation", "offset", "header", "last_line"])
+
+def stage_for_path(file_path):
+    """Return the stage name stored in file_path, or None if it is not a stage file."""
+    for stage, stage_path in STAGE_PATHS.items():
+        if stage_path == file_path:
+            return stage
+    return None
+
+def storage_path(file_path):
+    """The file that actually holds the stage known by file_path under the current backend."""
+    if BACKEND == "parquet" and stage_for_path(file_path) is not None:
+        import parquet_store
+        return parquet_store.parquet_path(file_path)
+    return file_path
+
+def _read_frame(path, columns=None):
+    if path.endswith(".parquet"):
+        import parquet_store
+        return parquet_store.read_frame(path, columns)
+    if columns is not None:
+        return pd.read_csv(path, usecols=lambda col: col in columns or col == ID_COLUMN)
+    return pd.read_csv(path)
+
+def _has_ids(path):
+    """Whether the stage file at path already stores lead IDs."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return ID_COLUMN in pq.read_schema(path).names
+    with open(path) as f:
+        return f.readline().split(",")[0].strip('"\n') == ID_COLUMN
+
+def _read_stage(path, columns=None):
+    """Read a stage file indexed by lead ID, first giving it IDs if it was written before they existed."""
+    data = _read_frame(path, columns)
+    if ID_COLUMN not in data.columns:
+        assign_lead_ids([path])
+        data = _read_frame(path, columns)
+    return data.set_index(ID_COLUMN).rename_axis(None)
+
+def write_frame(data, path):
+    """Write a stage frame, lead IDs included, to path in the format its extension names."""
+    with rewriting([path]):
+        if path.endswith(".parquet"):
+            import parquet_store
+            # Via a temp file, so readers never see half a Parquet file
+            parquet_store.write_frame(data, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+        else:
+            data.to_csv(path, index_label=ID_COLUMN)
+    perf_metrics.count(nbytes=os.path.getsize(path))
+
+def _generations():
+    try:
+        with open(GENERATIONS_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"epoch": None, "files": {}}
+
+def _bump_generations(paths, odd):
+    generations = _generations()
+    if generations["epoch"] is None:
+        # A lost or fresh file starts a new epoch, so no generation read before can match again
+        generations = {"epoch": uuid.uuid4().hex, "files": {}}
+    files = generations["files"]
+    for path in paths:
+        current = files.get(os.path.basename(path), 0)
+        if odd:
+            # Odd even if a crashed rewrite left it odd already
+            current += 1 if current % 2 == 0 else 2
+        elif current % 2:
+            current += 1
+        files[os.path.basename(path)] = current
+    with open(f"{GENERATIONS_PATH}.tmp", "w") as f:
+        json.dump(generations, f)
+    os.replace(f"{GENERATIONS_PATH}.tmp", GENERATIONS_PATH)
+
+def _generation(path):
+    """(epoch, generation) of the stage file at path, or None while it is being rewritten."""
+    generations = _generations()
+    generation = generations["files"].get(os.path.basename(path), 0)
+    return None if generation % 2 else (generations["epoch"], generation)
+
+@contextmanager
+def rewriting(paths):
+    """Mark the stage files at paths (storage paths) as rewritten by the block, not appended to."""
+    if not os.path.isdir(DATA_DIR):
+        yield
+        return
+    with store_lock():
+        _bump_generations(paths, odd=True)
+        try:
+            yield
+        finally:
+            _bump_generations(paths, odd=False)
+
+def _max_lead_id():
+    """Highest lead ID stored anywhere, in the files of either file backend or the database."""
+    top = 0
+    if BACKEND == "sqlite":
+        import sqlite_store
+        top = sqlite_store.max_lead_id()
+    for file_path in STAGE_PATHS.values():
+        for path in {file_path, storage_path(file_path)}:
+            if os.path.exists(path) and _has_ids(path):
+                ids = _read_frame(path, [ID_COLUMN])[ID_COLUMN]
+                top = max(top, int(ids.max()) if len(ids) else 0)
+    return top
+
+def new_lead_ids(count):
+    """Reserve count new lead IDs and return them in order."""
+    with store_lock():
+        try:
+            with open(LEAD_ID_PATH) as f:
+                start = int(f.read())
+        except (FileNotFoundError, ValueError):
+            start = _max_lead_id() + 1
+        with open(f"{LEAD_ID_PATH}.tmp", "w") as f:
+            f.write(str(start + count))
+        os.replace(f"{LEAD_ID_PATH}.tmp", LEAD_ID_PATH)
+    return list(range(start, start + count))
+
+def assign_lead_ids(paths=None):
+    """Give the leads of stage files written before lead IDs existed an ID each.
+
+    paths are storage paths and default to every stage of the current backend. Files that
+    already carry IDs are left alone; returns the number of leads given one.
+    """
+    if paths is None:
+        paths = [storage_path(file_path) for file_path in STAGE_PATHS.values()]
+    with store_lock():
+        legacy = {path: _read_frame(path) for path in paths if os.path.exists(path) and not _has_ids(path)}
+        ids = new_lead_ids(sum(len(data) for data in legacy.values()))
+        for path, data in legacy.items():
+            data.index, ids = ids[:len(data)], ids[len(data):]
+            write_frame(data, path)
+        with _cache_lock:
+            for path in legacy:
+                _cache.pop(path, None)
+    return sum(len(data) for data in legacy.values())
+
+def ensure_lead_ids(file_path):
+    """Upgrade the stage file of file_path to carry lead IDs before rows are appended to it raw."""
+    path = storage_path(file_path)
+    if os.path.exists(path) and not _has_ids(path):
+        assign_lead_ids([path])
+
+def add_write_listener(listener):
+    """Register a callback that is told about every file written through the store."""
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+def _notify_write(file_path, columns, versions):
+    for listener in _write_listeners:
+        listener(file_path, columns, versions)
+
+@contextmanager
+def store_lock():
+    """Exclusive, re-entrant lock over the whole store for compare-and-swap writes."""
+    with _store_lock:
+        if _lock_state["depth"] == 0 and fcntl is not None and os.path.isdir(DATA_DIR):
+            _lock_state["file"] = open(LOCK_PATH, "a")
+            fcntl.flock(_lock_state["file"], fcntl.LOCK_EX)
+        _lock_state["depth"] += 1
+        try:
+            yield
+        finally:
+            _lock_state["depth"] -= 1
+            if _lock_state["depth"] == 0 and _lock_state["file"] is not None:
+                fcntl.flock(_lock_state["file"], fcntl.LOCK_UN)
+                _lock_state["file"].close()
+                _lock_state["file"] = None
+
+def _cell_text(value):
+    """Text form of a cell, so parsed, edited and stored values compare alike."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value)
+
+def _text_frame(data, columns):
+    text = data[[col for col in columns if col in data.columns]].astype(object)
+    return text.where(text.notna(), "").astype(str)
+
+def _stamps(data, columns):
+    return pd.util.hash_pandas_object(_text_frame(data, columns), index=False)
+
+def identity_stamps(data):
+    """Per-row hash of the columns that identify a lead (everything but the editable ones)."""
+    return _stamps(data, IDENTITY_COLUMNS)
+
+def version_stamps(data):
+    """Per-row version stamp: a hash of every column, so any edit to the row changes it."""
+    return _stamps(data, LEAD_COLUMNS)
+
+def edit_base(data):
+    """Snapshot of what an editor showed: editable cells plus identity and version stamps."""
+    return _text_frame(data, EDITABLE_COLUMNS).assign(
+        _identity=identity_stamps(data), _version=version_stamps(data),
+    )
+
+def _shared_dtype(column, values):
+    """The shared categorical dtype of column, grown to also cover values."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        seen = values.cat.categories
+    else:
+        seen = pd.Index(values.dropna().unique())
+    with _dictionary_lock:
+        dtype = _dictionaries.get(column)
+        known = dtype.categories if dtype is not None else pd.Index([], dtype=object)
+        new = seen.astype(object).difference(known)
+        if dtype is None or len(new):
+            dtype = pd.CategoricalDtype(known.append(new))
+            _dictionaries[column] = dtype
+        return dtype
+
+def compact(data):
+    """Dictionary-encode the low-cardinality columns of data with the shared dictionaries, in place.
+
+    Every stage frame uses the same categorical dtypes, so frames concatenate without
+    falling back to object and a repeated value costs one small code per row.
+    """
+    for column in CATEGORY_COLUMNS:
+        if column in data.columns:
+            dtype = _shared_dtype(column, data[column])
+            if data[column].dtype != dtype:
+                data[column] = data[column].astype(dtype)
+    return data
+
+def _read_csv_stage(path, cached=None):
+    """Read a CSV stage file, or with cached=(frame, tail) only the rows appended since tail.
+
+    Returns (frame, tail for the next read or None), or None when the file was rewritten
+    since tail and has to be read whole. Only whole lines are parsed, so a row still being
+    appended is picked up by a later read.
+    """
+    generation = _generation(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        if cached is None:
+            start = len(header)
+        else:
+            data, tail = cached
+            if generation is None or generation != tail.generation or header != tail.header:
+                return None
+            f.seek(tail.offset - len(tail.last_line))
+            if f.read(len(tail.last_line)) != tail.last_line:
+                return None
+            start = tail.offset
+        f.seek(start)
+        body = f.read()
+    end = body.rfind(b"\n") + 1
+    body = body[:end]
+    rows = pd.read_csv(io.BytesIO(header + body)).set_index(ID_COLUMN).rename_axis(None)
+    if cached is not None:
+        data = _append_rows(data, compact(rows)) if len(rows) else data
+    else:
+        data = compact(rows)
+    last_line = body[body.rfind(b"\n", 0, end - 1) + 1:] if end else (cached[1].last_line if cached else b"")
+    if generation is None or generation != _generation(path):
+        return data, None
+    return data, _Tail(generation, start + end, header, last_line)
+
+def _append_rows(data, rows):
+    """data with rows appended, both already dictionary-encoded."""
+    data = data.copy(deep=False)
+    for column in CATEGORY_COLUMNS:
+        if column in data.columns and isinstance(data[column].dtype, pd.CategoricalDtype) \
+                and data[column].dtype != rows[column].dtype:
+            # Dictionaries only grow, so the cached codes keep their meaning under the newer dtype
+            data[column] = pd.Categorical.from_codes(data[column].cat.codes, dtype=rows[column].dtype)
+    return pd.concat([data, rows])
+
+def _read_appended(path, key, entry):
+    """The (frame, tail) of a cache entry brought up to version key of path, or None.
+
+    Only works when the file grew by appends since the entry was read; just the appended
+    rows are parsed.
+    """
+    _, data, tail = entry
+    if tail is None or key[1] <= tail.offset:
+        return None
+    with perf_metrics.timed("parse_tail", nbytes=key[1] - tail.offset):
+        return _read_csv_stage(path, (data, tail))
+
+def _file_key(file_path):
+    """Return the (mtime, size) pair used to detect changes to a file."""
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _cached_frame(file_path, columns=None):
+    """Return the shared parsed frame for file_path, re-parsing it only when the file changed.
+
+    A CSV stage file that only grew since it was parsed has just its new rows parsed and
+    appended to the cached frame. With CRM_SHARED_CACHE=1, worker processes share what they
+    parse through shared_cache instead of each parsing the file. The returned frame is the cached object itself and must
+    not be modified. With columns, a file that is not cached yet is read with just those
+    columns and left uncached.
+    """
+    path = storage_path(file_path)
+    try:
+        key = _file_key(path)
+    except FileNotFoundError:
+        invalidate(file_path)
+        return pd.DataFrame()
+
+    with _cache_lock:
+        entry = _cache.get(path)
+
+    stage = stage_for_path(file_path)
+    read = _read_stage if stage is not None else _read_frame
+    if entry is not None and entry[0] == key:
+        data = entry[1]
+    elif columns is not None:
+        with perf_metrics.timed("parse", nbytes=key[1]):
+            data = compact(read(path, columns))
+            perf_metrics.count(rows=len(data))
+        return data
+    else:
+        result = _read_appended(path, key, entry) if entry is not None else None
+        if result is None and stage is not None:
+            # Another worker process may have parsed this version, or an older one it grew from
+            import shared_cache
+            shared = shared_cache.load(path, key)
+            if shared is not None:
+                result = shared[1:] if shared[0] == key else _read_appended(path, key, shared)
+        if result is None:
+            with perf_metrics.timed("parse", nbytes=key[1]):
+                if stage is not None and path.endswith(".csv") and _has_ids(path):
+                    result = _read_csv_stage(path)
+                else:
+                    result = (compact(read(path)), None)
+                perf_metrics.count(rows=len(result[0]))
+            if stage is not None:
+                shared_cache.publish(path, key, *result)
+        data, tail = result
+        with _cache_lock:
+            _cache[path] = (key, data, tail)
+    return data if columns is None else data[[col for col in columns if col in data.columns]]
+
+@perf_metrics.instrument("load_data")
+def load_data(file_path, columns=None, pending=False):
+    """Load a stage through the shared cache, re-parsing it only when the file changed.
+
+    columns limits the frame to the columns a view needs; on a cold read only those are parsed.
+    pending=True also shows the edits and moves still waiting in the write-behind queue,
+    which is what a page should display; writers must see only what is stored.
+    """
+    stage = stage_for_path(file_path)
+    if BACKEND == "sqlite" and stage is not None:
+        import sqlite_store
+        data = compact(sqlite_store.load_stage(stage, columns))
+    else:
+        # Pages edit and drop rows in place, so never hand out the cached frame itself
+        data = _cached_frame(file_path, columns).copy()
+    if pending:
+        import write_queue
+        data = write_queue.overlay(file_path, data)
+    return data
+
+def _filter_mask(data, filters):
+    """Boolean mask of the rows matching {column: [allowed values]}."""
+    mask = pd.Series(True, index=data.index)
+    for column, values in (filters or {}).items():
+        if column in data.columns and values:
+            mask &= data[column].isin(values)
+    return mask
+
+def match_leads(data, where):
+    """Boolean mask of the rows matching every condition of where, in one vectorized pass.
+
+    where maps a column to its allowed values, as filters do, and OLDER_THAN to a number
+    of days the lead's Date must lie in the past. A condition on a column data does not
+    have matches nothing, so a bulk move never widens to the whole stage.
+    """
+    mask = pd.Series(True, index=data.index)
+    for column, values in (where or {}).items():
+        if column == OLDER_THAN:
+            if "Date" not in data.columns:
+                return pd.Series(False, index=data.index)
+            dates = pd.to_datetime(data["Date"].astype(object), errors="coerce")
+            # Leads without a valid Date are never old enough
+            mask &= dates < pd.Timestamp.today().normalize() - pd.Timedelta(days=int(values))
+        elif column not in data.columns:
+            return pd.Series(False, index=data.index)
+        else:
+            mask &= data[column].isin(values)
+    return mask
+
+def select_leads(file_path, where, pending=False):
+    """IDs of the leads in file_path matching where; pending works as in load_data."""
+    columns = ["Date" if column == OLDER_THAN else column for column in where]
+    data = load_data(file_path, columns, pending=pending)
+    return data.index[match_leads(data, where).to_numpy()].tolist()
+
+def count_rows(file_path, filters=None):
+    """Number of rows in file_path matching filters."""
+    stage = stage_for_path(file_path)
+    if BACKEND == "sqlite" and stage is not None:
+        import sqlite_store
+        return sqlite_store.count_rows(stage, filters)
+
+    data = _cached_frame(file_path)
+    return int(_filter_mask(data, filters).sum()) if filters else len(data)
+
+@perf_metrics.instrument("load_page")
+def load_page(file_path, filters=None, offset=0, limit=100, pending=False):
+    """Load only the window of rows [offset, offset + limit) matching filters.
+
+    Rows keep their lead IDs as the index, so they can be saved or moved later.
+    pending works as in load_data.
+    """
+    stage = stage_for_path(file_path)
+    if BACKEND == "sqlite" and stage is not None:
+        import sqlite_store
+        data = compact(sqlite_store.load_page(stage, filters, offset, limit))
+    else:
+        data = _cached_frame(file_path)
+        if filters:
+            data = data[_filter_mask(data, filters)]
+        data = data.iloc[offset:offset + limit].copy()
+    if pending:
+        import write_queue
+        data = write_queue.overlay(file_path, data)
+    return data
+
+def distinct_values(file_path, column):
+    """Sorted non-empty values of column in file_path, for filter widgets."""
+    stage = stage_for_path(file_path)
+    if BACKEND == "sqlite" and stage is not None:
+        import sqlite_store
+        return sqlite_store.distinct_values(stage, column)
+
+    data = _cached_frame(file_path)
+    if column not in data.columns:
+        return []
+    return sorted(data[column].dropna().astype(str).unique().tolist())
+
+def stage_version(file_path):
+    """Opaque value that changes whenever the leads stored for file_path change."""
+    stage = stage_for_path(file_path)
+    if BACKEND == "sqlite" and stage is not None:
+        import sqlite_store
+        return str(sqlite_store.stage_version(stage))
+    try:
+        return "%d-%d" % _file_key(storage_path(file_path))
+    except FileNotFoundError:
+        return "missing"
+
+def locate(lead_ids):
+    """Where each lead is now, as {lead ID: (stage, row offset in load_data of that stage)}.
+
+    Stage frames are indexed by lead ID, so this is one hash lookup per stage rather than a
+    scan. IDs that are in no stage are left out.
+    """
+    lead_ids = [int(lead_id) for lead_id in lead_ids]
+    if BACKEND == "sqlite":
+        import sqlite_store
+        return sqlite_store.locate(lead_ids)
+    found = {}
+    for stage, file_path in STAGE_PATHS.items():
+        positions = _cached_frame(file_path).index.get_indexer(lead_ids)
+        found.update({lead_id: (stage, int(position)) for lead_id, position in zip(lead_ids, positions) if position >= 0})
+    return found
+
+def invalidate(file_path=None):
+    """Drop the cached frame for file_path, or the whole cache when no path is given.
+
+    A CSV frame whose file nothing has rewritten since it was read is kept, so the next read
+    after an append parses just the appended rows.
+    """
+    with _cache_lock:
+        paths = list(_cache) if file_path is None else [storage_path(file_path)]
+        for path in paths:
+            entry = _cache.get(path)
+            if entry is not None and (entry[2] is None or entry[2].generation != _generation(path)):
+                del _cache[path]
+
+@perf_metrics.instrument("save_data")
+def save_data(data, file_path, append=False, keep_ids=False):
+    """Save data to the given file, appending if append is True, otherwise overwriting the file.
+
+    Leads appended to a stage are new and get new lead IDs, unless keep_ids is set for leads
+    coming back under IDs no stage holds any more (restored from the Bin archive); a stage
+    written whole keeps the IDs its index holds.
+    """
+    stage = stage_for_path(file_path)
+    perf_metrics.count(rows=len(data))
+    with store_lock():
+        before = stage_version(file_path)
+        if stage is not None and append and not keep_ids:
+            data = data.set_axis(new_lead_ids(len(data)))
+        rows = data
+        if BACKEND == "sqlite" and stage is not None:
+            import sqlite_store
+            if append:
+                sqlite_store.insert_leads(stage, data)
+            else:
+                sqlite_store.replace_stage(stage, data)
+        elif BACKEND == "parquet" and stage is not None:
+            # Parquet files cannot grow in place, so an append rewrites the stage
+            if append:
+                data = pd.concat([_cached_frame(file_path), data])
+            write_frame(data, storage_path(file_path))
+        elif stage is not None:
+            ensure_lead_ids(file_path)
+            if append and os.path.exists(file_path):
+                size = os.path.getsize(file_path)
+                data.to_csv(file_path, mode='a', header=False)
+                perf_metrics.count(nbytes=os.path.getsize(file_path) - size)
+            else:
+                write_frame(data, file_path)
+        elif not os.path.exists(file_path) or not append:
+            # If the file does not exist or append is False, create it with headers (overwrite)
+            data.to_csv(file_path, index=False)
+        else:
+            # Append to the file if it exists and append is True
+            data.to_csv(file_path, mode='a', header=False, index=False)
+        invalidate(file_path)
+        if stage is not None:
+            import event_log
+            event_log.record_save(file_path, rows, append)
+        versions = (before, stage_version(file_path))
+    _notify_write(file_path, None, versions)
+
+def _log_changes(file_path, old_values, patch):
+    """Append one change-log line per edited cell."""
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    lines = []
+    for (row, column), old in old_values.items():
+        new = patch[row][column]
+        lines.append(json.dumps({
+            "ts": timestamp,
+            "file": os.path.basename(file_path),
+            "row": row.item() if hasattr(row, "item") else row,
+            "column": column,
+            "old": None if pd.isna(old) else old,
+            "new": new,
+        }, default=str))
+    with open(CHANGE_LOG_PATH, "a") as f:
+        f.write("\n".join(lines) + "\n")
+
+def _resolve_patch(current, patch, base):
+    """Split patch into the edits that may be applied to current and the conflicting ones.
+
+    An edit goes through when its row still holds the same lead and either the row is
+    unchanged since the editor loaded it (version stamp matches), or the edited cell still
+    holds the value the editor showed, i.e. someone else changed other cells and the two
+    edits merge. Anything else is returned as a (row, column) conflict.
+    """
+    if base is None:
+        return patch, []
+    present = [row for row in patch if row in current.index and row in base.index]
+    identities = identity_stamps(current.loc[present])
+    versions = version_stamps(current.loc[present])
+
+    accepted, conflicts = {}, []
+    for row, changes in patch.items():
+        if row not in present or identities[row] != base.at[row, "_identity"]:
+            conflicts += [(row, column) for column in changes]
+            continue
+        if versions[row] == base.at[row, "_version"]:
+            accepted[row] = changes
+            continue
+        merged = {}
+        for column, value in changes.items():
+            now = _cell_text(current.at[row, column])
+            if now in (base.at[row, column], _cell_text(value)):
+                merged[column] = value
+            else:
+                conflicts.append((row, column))
+        if merged:
+            accepted[row] = merged
+    return accepted, conflicts
+
+def apply_patch(file_path, patch, base=None):
+    """Write {row label: {column: new value}} cell edits to file_path and log them.
+
+    Only the listed cells are changed, so the cost follows the size of the edit
+    rather than a comparison of the whole table. With base (an edit_base snapshot of
+    what the editor showed) the write is a compare-and-swap: edits that clash with a
+    concurrent change are not written and come back in PatchResult.conflicts.
+    """
+    return apply_patches(file_path, [(patch, base)])[0]
+
+def patch_frame(data, patch):
+    """Set the patched cells of data in place; return {(row, column): old value}."""
+    old_values = {}
+    for row, changes in patch.items():
+        if row not in data.index:
+            continue
+        for column, value in changes.items():
+            if column not in data.columns:
+                continue
+            if data[column].dtype != object:
+                data[column] = data[column].astype(object)
+            old_values[(row, column)] = data.at[row, column]
+            data.at[row, column] = value
+    return old_values
+
+@perf_metrics.instrument("apply_patches")
+def apply_patches(file_path, patches):
+    """Apply a list of (patch, base) edits to file_path in order, writing the file once.
+
+    Each edit sees the ones before it, exactly as if apply_patch had been called for
+    each in turn. Returns one PatchResult per edit.
+    """
+    stage = stage_for_path(file_path)
+    perf_metrics.count(rows=sum(len(patch) for patch, _ in patches))
+    results, applied = [], []  # applied: [(rows, patch, old_values)] of edits that changed cells
+    with store_lock():
+        before = stage_version(file_path)
+        data = None
+        for patch, base in patches:
+            if not patch:
+                results.append(PatchResult(0, []))
+                continue
+            if BACKEND == "sqlite" and stage is not None:
+                import sqlite_store
+                rows = sqlite_store.load_rows(stage, list(patch))
+                patch, conflicts = _resolve_patch(rows, patch, base)
+                old_values = sqlite_store.apply_patch(stage, patch)
+            else:
+                if data is None:
+                    data = _cached_frame(file_path).copy()
+                rows = data
+                patch, conflicts = _resolve_patch(data, patch, base)
+                old_values = patch_frame(data, patch)
+            results.append(PatchResult(len(old_values), conflicts))
+            if old_values:
+                applied.append((rows, patch, old_values))
+
+        if applied and data is not None:
+            path = storage_path(file_path)
+            write_frame(compact(data), path)
+            # The patched frame is exactly what was written, so keep it instead of re-parsing
+            if BACKEND != "parquet":
+                with _cache_lock:
+                    _cache[path] = (_file_key(path), data, None)
+            else:
+                invalidate(file_path)
+        if stage is not None:
+            import event_log
+            for rows, patch, old_values in applied:
+                event_log.record_patch(file_path, rows, old_values, patch)
+        versions = (before, stage_version(file_path))
+
+    for _, patch, old_values in applied:
+        _log_changes(file_path, old_values, patch)
+    if applied:
+        _notify_write(file_path, {column for _, _, old_values in applied for _, column in old_values}, versions)
+    return results
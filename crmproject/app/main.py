@@ -1,33 +1,67 @@
 import streamlit as st
-from raw_data import raw_data_page
-from bin import bin_page
-from meeting_booked import meeting_booked_page
-from qualified_disqualified import qualified_disqualified_page
-from not_picked import not_picked_page
-from callback import callback_page
-from deal import deals_page
-from graph import weekly_graphs_page
+from page_registry import PAGES, load_page
+from write_status import write_status
+import perf_metrics
+import change_watch
+
+st.set_page_config(layout="wide")  # Enables wide-screen layout
+
+# Custom CSS to Reduce Table Header Size and Padding
+def set_custom_css():
+    custom_css = """
+    <style>
+        /* Make table headers smaller */
+        .stDataFrame table th {
+            font-size: 12px !important;  /* Adjust header font size */
+            padding: 4px !important;     /* Reduce padding */
+        }
+
+        /* Make table content smaller */
+        .stDataFrame table td {
+            font-size: 12px !important;  /* Adjust content font size */
+            padding: 4px !important;     /* Reduce padding */
+        }
+
+        /* Enable horizontal scrolling */
+        .stDataFrame table {
+            display: block;
+            overflow-x: auto; /* Add horizontal scroll for wide tables */
+            white-space: nowrap;
+        }
+    </style>
+    """
+    st.markdown(custom_css, unsafe_allow_html=True)
+
+# Call custom CSS
+set_custom_css()
+
+# Drop cached stage frames as soon as any worker process writes a stage file
+change_watch.start()
 
 # Sidebar Navigation
 st.sidebar.title("Navigation")
-page = st.sidebar.radio(
-    "Go to", ["Raw Data", "Not Picked", "Callback", "Meeting Booked", "Qualified/Disqualified", "Deals Page", "Bin", "Weekly Graphs"]
-)
-
-# Render pages based on selection
-if page == "Raw Data":
-    raw_data_page()
-elif page == "Bin":
-    bin_page()
-elif page == "Meeting Booked":
-    meeting_booked_page()
-elif page == "Qualified/Disqualified":
-    qualified_disqualified_page()
-elif page == "Not Picked":
-    not_picked_page()
-elif page == "Callback":
-    callback_page()
-elif page == "Deals Page":
-    deals_page()
-elif page == "Weekly Graphs":
-    weekly_graphs_page()
+page = st.sidebar.radio("Go to", list(PAGES))
+
+# Search every stage at once through the full-text index
+query = st.sidebar.text_input("Search leads", placeholder="Name, company, email, phone...")
+if query:
+    import search_index
+    results = search_index.search(query)
+    if results.empty:
+        st.sidebar.info("No matching leads.")
+    else:
+        st.sidebar.dataframe(results, hide_index=True, use_container_width=True)
+
+# Whether this session's saves and moves have reached the disk yet
+with st.sidebar:
+    write_status()
+
+# Render the selected page, timed when metrics are on; the Performance page can ask for one
+# render to run under cProfile instead
+render = load_page(page)
+if st.session_state.pop("profile_next_render", False):
+    _, st.session_state["last_profile"] = perf_metrics.profile(render)
+    st.session_state["last_profile_page"] = page
+else:
+    with perf_metrics.timed(f"page:{page}"):
+        render()
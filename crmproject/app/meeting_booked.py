@@ -1,26 +1,21 @@
 import streamlit as st
 import pandas as pd
 import os
-from raw_data import editable_table  # Import the editable_table function
+import lead_store
+from lead_store import DATA_DIR
+from raw_data import bulk_move_panel, editable_table, editor_key, editor_patch, move_leads, save_editor_changes  # Import the editable_table function
 
-MEETING_BOOKED_PATH = "/crmproject/data/meeting_booked.csv"
-QUALIFIED_PATH = "/crmproject/data/qualified.csv"
-DISQUALIFIED_PATH = "/crmproject/data/disqualified.csv"
-DEALS_ACTIVE_PATH = "/crmproject/data/deals_active.csv"
+MEETING_BOOKED_PATH = os.path.join(DATA_DIR, "meeting_booked.csv")
+QUALIFIED_PATH = os.path.join(DATA_DIR, "qualified.csv")
+DISQUALIFIED_PATH = os.path.join(DATA_DIR, "disqualified.csv")
+DEALS_ACTIVE_PATH = os.path.join(DATA_DIR, "deals_active.csv")
 
 def load_meeting_data():
     if os.path.exists(MEETING_BOOKED_PATH):
-        return pd.read_csv(MEETING_BOOKED_PATH)
+        return lead_store.load_data(MEETING_BOOKED_PATH, pending=True)
     else:
         return pd.DataFrame()
 
-def save_data(data, file_path, append=False):
-    """Save data to the given file, appending if append is True, otherwise overwriting the file."""
-    if not os.path.exists(file_path) or not append:
-        data.to_csv(file_path, index=False)
-    else:
-        data.to_csv(file_path, mode='a', header=False, index=False)
-
 def meeting_booked_page():
     st.title("Meeting Booked Page")
     data = load_meeting_data()
@@ -28,13 +23,15 @@ def meeting_booked_page():
     if not data.empty:
         # Display and allow inline editing of the table
         st.subheader("Edit Meeting Booked Data")
-        edited_data = editable_table(data)  # Get the edited data
+        editable_table(data, key=editor_key("meeting_booked_table"))
 
         # Track changes in session state
         if 'changed' not in st.session_state:
             st.session_state.changed = False
         
-        if not edited_data.equals(data):
+        # The editor's own delta tells us what changed, without comparing the whole table
+        patch = editor_patch(data, "meeting_booked_table")
+        if patch:
             st.session_state.changed = True
         else:
             st.session_state.changed = False
@@ -43,30 +40,21 @@ def meeting_booked_page():
         if st.session_state.changed:
             save_button = st.button("Save Changes")
             if save_button:
-                save_data(edited_data, MEETING_BOOKED_PATH)
-                st.success("Changes saved successfully!")
+                if save_editor_changes(MEETING_BOOKED_PATH, data, "meeting_booked_table").written:
+                    st.success("Changes saved successfully!")
         else:
             st.write("No changes detected.")
 
         # Row selection and moving logic
         st.subheader("Select rows to move:")
         selected_rows = st.multiselect(
-            "Select Rows by Index", data.index.tolist(), default=[]
+            "Select Leads by ID", data.index.tolist(), default=[]
         )
         
         if st.button("Move to Qualified"):
             if selected_rows:
-                qualified_data = pd.DataFrame(data.loc[selected_rows])
-                
-                # Append to qualified file
-                save_data(qualified_data, QUALIFIED_PATH, append=True)
-                
-                # Append to Deals Active table
-                save_data(qualified_data, DEALS_ACTIVE_PATH, append=True)
-                
-                # Remove from Meeting Booked
-                data.drop(index=selected_rows, inplace=True)
-                save_data(data, MEETING_BOOKED_PATH)
+                # Append to qualified file and Deals Active table, remove from Meeting Booked
+                move_leads(data, selected_rows, MEETING_BOOKED_PATH, [QUALIFIED_PATH, DEALS_ACTIVE_PATH])
                 st.success("Selected rows moved to Qualified and Deals Active!")
                 st.experimental_rerun()
             else:
@@ -74,17 +62,16 @@ def meeting_booked_page():
         
         if st.button("Move to Disqualified"):
             if selected_rows:
-                disqualified_data = pd.DataFrame(data.loc[selected_rows])
-                
-                # Append to disqualified file
-                save_data(disqualified_data, DISQUALIFIED_PATH, append=True)
-                
-                # Remove from Meeting Booked
-                data.drop(index=selected_rows, inplace=True)
-                save_data(data, MEETING_BOOKED_PATH)
+                # Append to disqualified file, remove from Meeting Booked
+                move_leads(data, selected_rows, MEETING_BOOKED_PATH, [DISQUALIFIED_PATH])
                 st.success("Selected rows moved to Disqualified!")
                 st.experimental_rerun()
             else:
                 st.warning("Please select rows to move.")
+
+        bulk_move_panel(MEETING_BOOKED_PATH, {
+            "Qualified": [QUALIFIED_PATH, DEALS_ACTIVE_PATH],
+            "Disqualified": [DISQUALIFIED_PATH],
+        }, "meeting_booked")
     else:
         st.info("No data in Meeting Booked.")
@@ -0,0 +1,21 @@
+import importlib
+
+# Sidebar entry -> (module, page function); a page module is only imported when first opened
+PAGES = {
+    "Raw Data": ("raw_data", "raw_data_page"),
+    "Not Picked": ("not_picked", "not_picked_page"),
+    "Callback": ("callback", "callback_page"),
+    "Meeting Booked": ("meeting_booked", "meeting_booked_page"),
+    "Qualified/Disqualified": ("qualified_disqualified", "qualified_disqualified_page"),
+    "Deals Page": ("deal", "deals_page"),
+    "Bin": ("bin", "bin_page"),
+    "Duplicates": ("duplicates", "duplicates_page"),
+    "Weekly Graphs": ("graph", "weekly_graphs_page"),
+    "Settings": ("settings", "settings_page"),
+    "Performance": ("performance", "performance_page"),
+}
+
+def load_page(name):
+    """Return the page function behind a sidebar entry, importing its module on first use."""
+    module_name, function_name = PAGES[name]
+    return getattr(importlib.import_module(module_name), function_name)
@@ -0,0 +1,69 @@
+import os
+import sys
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from lead_store import STAGE_PATHS, LEAD_COLUMNS, CATEGORY_COLUMNS, ID_COLUMN
+
+# CATEGORY_COLUMNS are stored dictionary-encoded and read back as pandas categoricals
+DATE_COLUMNS = ["Date"]
+
+SCHEMA = pa.schema([pa.field(ID_COLUMN, pa.int64())] + [
+    pa.field(col, pa.dictionary(pa.int32(), pa.string()) if col in CATEGORY_COLUMNS
+             else pa.date32() if col in DATE_COLUMNS else pa.string())
+    for col in LEAD_COLUMNS
+])
+
+def parquet_path(file_path):
+    """The Parquet file holding the stage that has always lived in the CSV file_path."""
+    return os.path.splitext(file_path)[0] + ".parquet"
+
+def to_table(data):
+    """Convert a stage frame, indexed by lead ID, to an Arrow table with the declared lead schema."""
+    data = data.reindex(columns=LEAD_COLUMNS)
+    columns = {ID_COLUMN: data.index.astype("int64")}
+    for col in LEAD_COLUMNS:
+        if col in DATE_COLUMNS:
+            dates = pd.to_datetime(data[col], errors="coerce")
+            columns[col] = dates.dt.date.where(dates.notna(), None)
+        else:
+            # Edits and CSV inference can leave numbers or mixed values behind; store text
+            columns[col] = data[col].astype("string").replace("", pd.NA)
+    table = pa.Table.from_pandas(pd.DataFrame(columns), schema=SCHEMA, preserve_index=False)
+    # Drop the pandas metadata so reads come back with the schema's own types
+    return table.replace_schema_metadata()
+
+def read_frame(path, columns=None):
+    """Read a stage Parquet file, only decoding the requested columns."""
+    if columns is not None:
+        stored = pq.read_schema(path).names
+        columns = [col for col in [ID_COLUMN] + list(columns) if col in stored]
+    return pq.read_table(path, columns=columns).to_pandas()
+
+def write_frame(data, path):
+    """Write a stage frame to path as Parquet."""
+    pq.write_table(to_table(data), path)
+
+def migrate_csvs(force=False):
+    """One-shot conversion of every stage CSV to a typed Parquet file next to it.
+
+    Existing Parquet files are left alone unless force is True.
+    """
+    import lead_store
+    # The leads keep the IDs their CSVs give them, so IDs survive a change of backend
+    lead_store.assign_lead_ids(list(STAGE_PATHS.values()))
+    converted = {}
+    for stage, file_path in STAGE_PATHS.items():
+        path = parquet_path(file_path)
+        if not os.path.exists(file_path) or (os.path.exists(path) and not force):
+            continue
+        data = pd.read_csv(file_path, dtype=str, keep_default_na=False).set_index(ID_COLUMN)
+        tmp_path = f"{path}.tmp"
+        write_frame(data, tmp_path)
+        os.replace(tmp_path, path)
+        converted[stage] = len(data)
+    return converted
+
+if __name__ == "__main__":
+    for stage, count in migrate_csvs(force="--force" in sys.argv).items():
+        print(f"{stage}: {count} leads converted")
@@ -0,0 +1,144 @@
+"""Opt-in timing of the hot paths: stage loads and parses, editable_table, saves, moves and page renders.
+
+Off unless CRM_PERF_METRICS=1 is set or it is switched on from the Performance page. While
+on, every instrumented operation records its wall time, the rows it handled and the bytes
+it read or wrote as one JSON line in metrics.jsonl, which rolls over to metrics.jsonl.1
+past MAX_BYTES. Operations nest: a page render contains its loads, which contain the parse.
+
+    python perf_metrics.py   # print p50/p95 per operation
+"""
+import os
+import json
+import time
+import cProfile
+import pstats
+import io
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+
+# metrics.jsonl is rolled over once it grows past this
+MAX_BYTES = 5 * 2**20
+
+# Functions listed in a cProfile report
+PROFILE_LINES = 40
+
+_state = {"enabled": os.environ.get("CRM_PERF_METRICS") == "1"}
+_file_lock = threading.Lock()
+_local = threading.local()  # .stack: open operations; .done: finished records not yet written
+
+def _paths():
+    # Imported here because lead_store itself is instrumented
+    from lead_store import DATA_DIR
+    path = os.path.join(DATA_DIR, "metrics.jsonl")
+    return path, f"{path}.1"
+
+def enabled():
+    return _state["enabled"]
+
+def set_enabled(on):
+    """Switch recording on or off for this server process."""
+    _state["enabled"] = bool(on)
+
+def _write(records):
+    path, rolled = _paths()
+    lines = "".join(json.dumps(record) + "\n" for record in records)
+    with _file_lock:
+        if os.path.exists(path) and os.path.getsize(path) > MAX_BYTES:
+            os.replace(path, rolled)
+        with open(path, "a") as f:
+            f.write(lines)
+
+@contextmanager
+def timed(operation, rows=None, nbytes=None):
+    """Time the block as operation; count() inside it adds rows and bytes to the record."""
+    if not _state["enabled"]:
+        yield
+        return
+    stack = _local.__dict__.setdefault("stack", [])
+    record = {"op": operation, "rows": rows, "bytes": nbytes}
+    stack.append(record)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        record["at"] = datetime.now().isoformat(timespec="seconds")
+        stack.pop()
+        done = _local.__dict__.setdefault("done", [])
+        done.append(record)
+        # Written once the outermost operation ends, so a render costs one append
+        if not stack:
+            _local.done = []
+            _write(done)
+
+def count(rows=None, nbytes=None):
+    """Add rows handled or bytes read/written to the innermost operation being timed."""
+    stack = getattr(_local, "stack", None)
+    if not _state["enabled"] or not stack:
+        return
+    record = stack[-1]
+    if rows is not None:
+        record["rows"] = (record["rows"] or 0) + rows
+    if nbytes is not None:
+        record["bytes"] = (record["bytes"] or 0) + nbytes
+
+def instrument(operation):
+    """Decorator timing every call as operation; a returned DataFrame counts as its rows."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _state["enabled"]:
+                return function(*args, **kwargs)
+            with timed(operation):
+                result = function(*args, **kwargs)
+                if hasattr(result, "columns"):
+                    count(rows=len(result))
+            return result
+        return wrapper
+    return decorate
+
+def load_records():
+    """Every recorded operation still on disk, oldest first, as a DataFrame."""
+    import pandas as pd
+    records = []
+    for path in reversed(_paths()):
+        if os.path.exists(path):
+            with open(path) as f:
+                records.extend(json.loads(line) for line in f if line.endswith("\n"))
+    return pd.DataFrame(records, columns=["op", "ms", "rows", "bytes", "at"])
+
+def summary():
+    """p50/p95/max wall time, median rows and total bytes per operation, slowest p95 first."""
+    records = load_records()
+    grouped = records.groupby("op")
+    table = grouped["ms"].agg(
+        calls="count",
+        p50_ms=lambda ms: ms.quantile(0.5),
+        p95_ms=lambda ms: ms.quantile(0.95),
+        max_ms="max",
+    )
+    table["rows_p50"] = grouped["rows"].median()
+    table["bytes_total"] = grouped["bytes"].sum(min_count=1)
+    return table.sort_values("p95_ms", ascending=False).round(2).reset_index()
+
+def clear():
+    """Delete every recorded operation."""
+    with _file_lock:
+        for path in _paths():
+            if os.path.exists(path):
+                os.remove(path)
+
+def profile(function, *args, **kwargs):
+    """Run function under cProfile; return (its result, the top functions by cumulative time as text)."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return result, report.getvalue()
+
+if __name__ == "__main__":
+    import pandas as pd
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(summary().to_string(index=False))
@@ -0,0 +1,31 @@
+import streamlit as st
+import perf_metrics
+
+def performance_page():
+    st.title("Performance")
+
+    on = st.checkbox("Record timings", value=perf_metrics.enabled(),
+                     help="Times loads, parses, editable tables, saves, moves and page renders in this server process.")
+    if on != perf_metrics.enabled():
+        perf_metrics.set_enabled(on)
+
+    # Per-operation latency from the rolling metrics file
+    st.subheader("Operations")
+    table = perf_metrics.summary()
+    if table.empty:
+        st.info("No timings recorded yet. Switch recording on and use the other pages.")
+    else:
+        st.dataframe(table, hide_index=True, use_container_width=True)
+    if st.button("Clear Timings"):
+        perf_metrics.clear()
+        st.rerun()
+
+    # cProfile capture of a single rerun
+    st.subheader("Profile a Render")
+    st.write("Profiles the next page render of this session, e.g. after switching to the page to inspect.")
+    if st.button("Profile Next Render"):
+        st.session_state["profile_next_render"] = True
+        st.success("The next page you open will be profiled.")
+    if "last_profile" in st.session_state:
+        st.caption(f"Last profile: {st.session_state['last_profile_page']}")
+        st.code(st.session_state["last_profile"], language=None)
@@ -0,0 +1,244 @@
+import os
+import json
+import shutil
+import uuid
+import pandas as pd
+import lead_store
+import event_log
+import perf_metrics
+from lead_store import DATA_DIR
+
+JOURNAL_PATH = os.path.join(DATA_DIR, "pipeline.journal")
+
+# Called after every committed move as fn(moved_rows, source_path, target_paths, versions), where
+# versions is {file_path: (stage_version before the commit, stage_version after it)} for every
+# stage the commit touched, both taken under the store lock
+_move_listeners = []
+
+def add_move_listener(listener):
+    """Register a callback that is told about every committed lead move."""
+    if listener not in _move_listeners:
+        _move_listeners.append(listener)
+
+def _fsync_file(file_path):
+    with open(file_path, "rb+") as f:
+        os.fsync(f.fileno())
+
+def _write_journal(tx_id, renames):
+    """Durably record the temp -> final renames a transaction is about to perform."""
+    tmp_path = f"{JOURNAL_PATH}.{tx_id}"
+    with open(tmp_path, "w") as f:
+        json.dump({"tx": tx_id, "renames": renames}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, JOURNAL_PATH)
+
+def _apply_renames(renames):
+    for tmp_path, final_path in renames:
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, final_path)
+        lead_store.invalidate(final_path)
+
+def recover():
+    """Finish a transaction interrupted after its journal was written, if there is one."""
+    with lead_store.store_lock():
+        if not os.path.exists(JOURNAL_PATH):
+            return False
+        with open(JOURNAL_PATH) as f:
+            journal = json.load(f)
+        # The journal does not say which files were appended to, so treat them all as rewritten
+        with lead_store.rewriting([final_path for _, final_path in journal["renames"]]):
+            _apply_renames(journal["renames"])
+        os.remove(JOURNAL_PATH)
+        return True
+
+class TransitionBatch:
+    """Collects lead moves between stage files and writes them all in a single atomic flush.
+
+    Use it as a context manager to batch several moves; the batch commits on a clean exit
+    and is discarded if the block raises. Moves are applied under the store lock to the
+    stage data as it is at commit time, so concurrent edits by other setters survive and a
+    lead someone else already moved is skipped instead of being duplicated. Leads are
+    addressed by lead ID, so a selection stays valid however the stage files change.
+    """
+
+    def __init__(self):
+        self._moves = []  # [(selected lead IDs or a where condition, source path, target paths)]
+        self.moved_counts = []  # leads moved by each move of the last commit, in queue order
+
+    def move(self, data, selected_rows, source_path, target_paths):
+        """Queue moving the leads with the selected_rows IDs out of source_path into every target path.
+
+        data is the frame the selection was made on, or None; IDs it does not hold are
+        dropped. Returns the number of leads queued.
+        """
+        if data is not None:
+            selected_rows = [row for row in selected_rows if row in data.index]
+        self._moves.append((list(selected_rows), source_path, list(target_paths)))
+        return len(selected_rows)
+
+    def move_where(self, where, source_path, target_paths):
+        """Queue moving every lead of source_path matching where (see lead_store.match_leads).
+
+        The condition is evaluated at commit time, under the store lock, so it moves what
+        matches then, including leads added since.
+        """
+        self._moves.append((dict(where), source_path, list(target_paths)))
+
+    def _apply_sqlite(self, moves):
+        import sqlite_store
+        events, stage_moves = [], []
+        for selected_rows, source_path, target_paths in moves:
+            source_stage = lead_store.stage_for_path(source_path)
+            if isinstance(selected_rows, dict):
+                selected_rows = lead_store.select_leads(source_path, selected_rows)
+            # Compare-and-swap: only leads still in the source stage move
+            current = sqlite_store.load_rows(source_stage, selected_rows)
+            target_stages = [lead_store.stage_for_path(target_path) for target_path in target_paths]
+            copies = [current.set_axis(lead_store.new_lead_ids(len(current))) for _ in target_paths[1:]]
+            stage_moves.append((list(current.index), source_stage, target_stages, [list(copy.index) for copy in copies]))
+            events.append((current, source_path, target_paths, copies))
+        sqlite_store.apply_moves(stage_moves)
+        return events
+
+    def _apply_files(self, moves):
+        frames = {}   # {file_path: current contents with the batch's moves applied}
+        appends = {}  # {file_path: [frames to append]} for targets that are not rewritten
+
+        def current(file_path):
+            if file_path not in frames:
+                frames[file_path] = lead_store.load_data(file_path)
+                if file_path in appends:
+                    # Rows queued into this file earlier in the batch become part of the source
+                    frames[file_path] = pd.concat([frames[file_path]] + appends.pop(file_path))
+            return frames[file_path]
+
+        events = []
+        for selected_rows, source_path, target_paths in moves:
+            source = current(source_path)
+            if isinstance(selected_rows, dict):
+                moved = source[lead_store.match_leads(source, selected_rows).to_numpy()]
+            else:
+                # A hash lookup per selected ID; IDs the source no longer holds were moved by someone else
+                moved = source.loc[source.index.intersection(selected_rows)]
+            frames[source_path] = source.drop(index=moved.index)
+            # Extra targets (Meeting Booked -> Qualified and Deals Active) get copies under new IDs
+            copies = [moved.set_axis(lead_store.new_lead_ids(len(moved))) for _ in target_paths[1:]]
+            for target_path, rows in zip(target_paths, [moved] + copies):
+                if target_path in frames:
+                    frames[target_path] = pd.concat([frames[target_path], rows])
+                else:
+                    appends.setdefault(target_path, []).append(rows)
+            events.append((moved, source_path, target_paths, copies))
+
+        _commit_files(frames, appends)
+        return events
+
+    @perf_metrics.instrument("move")
+    def commit(self):
+        """Apply every queued move at once and return the number of leads moved."""
+        if not self._moves:
+            return 0
+        moves, self._moves = self._moves, []
+        paths = {path for _, source_path, target_paths in moves for path in [source_path] + list(target_paths)}
+        with lead_store.store_lock():
+            if any(lead_store.STAGE_PATHS["bin"] in target_paths for _, _, target_paths in moves):
+                # Seal last month's Bin first, so leads binned now land in this month's
+                import bin_archive
+                bin_archive.rotate()
+            before = {path: lead_store.stage_version(path) for path in paths}
+            if lead_store.BACKEND == "sqlite":
+                events = self._apply_sqlite(moves)
+            else:
+                events = self._apply_files(moves)
+            # Logged under the lock so the event log follows the order the stage files changed in
+            for moved, source_path, target_paths, copies in events:
+                event_log.record_moves(moved, source_path, target_paths, copies)
+            versions = {path: (before[path], lead_store.stage_version(path)) for path in paths}
+        for moved, source_path, target_paths, _ in events:
+            for listener in _move_listeners:
+                listener(moved, source_path, target_paths, versions)
+        self.moved_counts = [len(moved) for moved, _, _, _ in events]
+        perf_metrics.count(rows=sum(self.moved_counts))
+        return sum(self.moved_counts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            # Drop everything queued for a failed batch
+            self._moves.clear()
+        return False
+
+def _write_stage(data, tmp_path, path):
+    """Write data to tmp_path in the format of the stage file path it will replace."""
+    if path.endswith(".parquet"):
+        import parquet_store
+        parquet_store.write_frame(data, tmp_path)
+    else:
+        data.to_csv(tmp_path, index_label=lead_store.ID_COLUMN)
+
+def _stage_files(tx_id, frames, appends):
+    """Write the new version of every touched file next to it and return the renames."""
+    renames = []
+    for file_path, data in frames.items():
+        path = lead_store.storage_path(file_path)
+        tmp_path = f"{path}.{tx_id}.tmp"
+        _write_stage(data, tmp_path, path)
+        _fsync_file(tmp_path)
+        perf_metrics.count(nbytes=os.path.getsize(tmp_path))
+        renames.append([tmp_path, path])
+
+    for file_path, rows in appends.items():
+        path = lead_store.storage_path(file_path)
+        tmp_path = f"{path}.{tx_id}.tmp"
+        rows = pd.concat(rows)
+        if path.endswith(".parquet"):
+            # Parquet cannot be appended to, so the target is rewritten with the new rows
+            _write_stage(pd.concat([lead_store.load_data(file_path), rows]), tmp_path, path)
+        elif os.path.exists(path):
+            # Byte copy of the existing target, no re-parse, then append the new rows
+            lead_store.ensure_lead_ids(file_path)
+            shutil.copyfile(path, tmp_path)
+            rows.to_csv(tmp_path, mode='a', header=False)
+        else:
+            rows.to_csv(tmp_path, index_label=lead_store.ID_COLUMN)
+        _fsync_file(tmp_path)
+        perf_metrics.count(nbytes=os.path.getsize(tmp_path))
+        renames.append([tmp_path, path])
+    return renames
+
+def _commit_files(frames, appends):
+    """Stage temp files, journal the renames, then rename them into place."""
+    recover()
+    tx_id = uuid.uuid4().hex
+    with lead_store.store_lock():
+        try:
+            renames = _stage_files(tx_id, frames, appends)
+        except Exception:
+            for file_path in list(frames) + list(appends):
+                tmp_path = f"{lead_store.storage_path(file_path)}.{tx_id}.tmp"
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            raise
+        _write_journal(tx_id, renames)
+        # Sources are rewritten; targets are copied and appended to, so cached reads of them stay valid
+        with lead_store.rewriting([lead_store.storage_path(file_path) for file_path in frames]):
+            _apply_renames(renames)
+        os.remove(JOURNAL_PATH)
+
+def move_leads(data, selected_rows, source_path, target_paths):
+    """Move the leads with the selected_rows IDs from source_path into every target path as one transaction.
+
+    Returns the number of leads actually moved, which is lower than the selection when
+    some of them were moved or deleted by someone else in the meantime.
+    """
+    batch = TransitionBatch()
+    batch.move(data, selected_rows, source_path, target_paths)
+    return batch.commit()
+
+# Finish any transaction a crashed process left half-applied
+recover()
@@ -1,19 +1,18 @@
 import streamlit as st
-import pandas as pd
 import os
-from raw_data import editable_table
+import lead_store
+from lead_store import DATA_DIR
+from raw_data import editable_table, editor_key, save_editor_changes
 
-QUALIFIED_PATH = "/crmproject/data/qualified.csv"
-DISQUALIFIED_PATH = "/crmproject/data/disqualified.csv"
+QUALIFIED_PATH = os.path.join(DATA_DIR, "qualified.csv")
+DISQUALIFIED_PATH = os.path.join(DATA_DIR, "disqualified.csv")
 
 def load_data(file_path):
-    if os.path.exists(file_path):
-        return pd.read_csv(file_path)
-    else:
-        return pd.DataFrame()
+    return lead_store.load_data(file_path, pending=True)
 
-def save_data(file_path, data):
-    data.to_csv(file_path, index=False)
+def save_data(file_path, data, editor_name):
+    """Write only the cells edited in editor_name back to file_path."""
+    return save_editor_changes(file_path, data, editor_name)
 
 def qualified_disqualified_page():
     st.title("Qualified/Disqualified Page")
@@ -24,16 +23,16 @@ def qualified_disqualified_page():
 
     # Editable table for Qualified Data
     st.subheader("Qualified Data")
-    qualified_data = editable_table(qualified_data)   
+    editable_table(qualified_data, key=editor_key("qualified_table"))
    
 
     # Editable table for Disqualified Data
     st.subheader("Disqualified Data")
-    disqualified_data = editable_table(disqualified_data)   
+    editable_table(disqualified_data, key=editor_key("disqualified_table"))
      
     
     # Save button to store changes to CSV
     if st.button("Save Changes"):
-        save_data(QUALIFIED_PATH, qualified_data)
-        save_data(DISQUALIFIED_PATH, disqualified_data)
+        save_data(QUALIFIED_PATH, qualified_data, "qualified_table")
+        save_data(DISQUALIFIED_PATH, disqualified_data, "disqualified_table")
         st.success("Changes saved successfully!")
@@ -1,77 +1,28 @@
 import streamlit as st
 import pandas as pd
 import os
+import lead_store
+import write_queue
+import reference_data
+import perf_metrics
+from write_status import track_write
+from lead_store import DATA_DIR
 
-DATA_PATH = "/crmproject/data/raw_data.csv"
-BIN_PATH = "/crmproject/data/bin.csv"
-MEETING_BOOKED_PATH = "/crmproject/data/meeting_booked.csv"
-APPSETTER_PATH = "/crmproject/data/appsetter.csv"
-NOT_PICKED_PATH = "/crmproject/data/not_picked.csv"
-CALLBACK_PATH = "/crmproject/data/callback.csv"
-
-def load_data():
-    """Load raw data from CSV."""
-    if os.path.exists(DATA_PATH):
-        return pd.read_csv(DATA_PATH)
-    else:
-        st.error("Raw data file not found!")
-        return pd.DataFrame()
-
-
-#ddS
-def load_appsetters():
-    """Load AppSetter names from appsetter.csv."""
-    if os.path.exists(APPSETTER_PATH):
-        df = pd.read_csv(APPSETTER_PATH)
-        return df["AppSetter"].dropna().tolist()
-    else:
-        st.error("AppSetter file not found!")
-        return []
-
-def save_data(data, file_path, append=False):
-    """Save data to the given file, appending if append is True, otherwise overwriting the file."""
-    if not os.path.exists(file_path) or not append:
-        # If the file does not exist or append is False, create it with headers (overwrite)
-        data.to_csv(file_path, index=False)
-    else:
-        # Append to the file if it exists and append is True
-        data.to_csv(file_path, mode='a', header=False, index=False)
-
-st.set_page_config(layout="wide")  # Enables wide-screen layout
-
-# Custom CSS to Reduce Table Header Size and Padding
-def set_custom_css():
-    custom_css = """
-    <style>
-        /* Make table headers smaller */
-        .stDataFrame table th {
-            font-size: 12px !important;  /* Adjust header font size */
-            padding: 4px !important;     /* Reduce padding */
-        }
-
-        /* Make table content smaller */
-        .stDataFrame table td {
-            font-size: 12px !important;  /* Adjust content font size */
-            padding: 4px !important;     /* Reduce padding */
-        }
-
-        /* Enable horizontal scrolling */
-        .stDataFrame table {
-            display: block;
-            overflow-x: auto; /* Add horizontal scroll for wide tables */
-            white-space: nowrap;
-        }
-    </style>
-    """
-    st.markdown(custom_css, unsafe_allow_html=True)
+DATA_PATH = os.path.join(DATA_DIR, "raw_data.csv")
+BIN_PATH = os.path.join(DATA_DIR, "bin.csv")
+MEETING_BOOKED_PATH = os.path.join(DATA_DIR, "meeting_booked.csv")
+NOT_PICKED_PATH = os.path.join(DATA_DIR, "not_picked.csv")
+CALLBACK_PATH = os.path.join(DATA_DIR, "callback.csv")
 
-# Call custom CSS
-set_custom_css()
+PAGE_SIZE_OPTIONS = [50, 100, 250, 500]
+FILTER_COLUMNS = ["Industry", "Company State", "AppSetter"]
+EDITABLE_COLUMNS = lead_store.EDITABLE_COLUMNS
 
-def editable_table(data):
-    """Allow inline editing of Date, Priority, Comment, and AppSetter."""
-    
+# Columns a bulk move can select leads by, with their labels
+BULK_COLUMNS = {"priority": "Priority", "Industry": "Industry", "AppSetter": "AppSetter"}
 
+def coerce_editable_columns(data):
+    """Give the editable columns the types st.data_editor expects, in place."""
     # Ensure Date column is in the correct format
     if "Date" in data.columns:
         data["Date"] = pd.to_datetime(data["Date"], errors="coerce").dt.date
@@ -79,108 +30,261 @@ def editable_table(data):
     # Convert text columns to string for consistency
     for col in ["comment", "AppSetter", "priority"]:  # Add more editable columns if needed
         if col in data.columns:
-            data[col] = data[col].fillna("").astype(str)
-
-    # Load AppSetter dropdown options
-    appsetter_names = load_appsetters()
-
-    # Define Streamlit column configuration for editable fields
-    column_config = {
-        "Date": st.column_config.DateColumn("Date", format="YYYY-MM-DD"),
-        "priority": st.column_config.SelectboxColumn(
-            "Priority",
-            options=["High", "Medium", "Low"],  # Define options explicitly
-        ),
-        "comment": st.column_config.TextColumn("Comment"),
-        "AppSetter": st.column_config.SelectboxColumn(
-            "AppSetter",
-            options=appsetter_names,  # Dynamically load dropdown options
-        ),
-    }
-
-    # Display the data editor with editable fields
-    editable_data = st.data_editor(
-        data,
-        column_config=column_config,
-        disabled=list(data.columns.difference(["Date", "priority", "comment", "AppSetter"])),
-        use_container_width=True,
-    )
+            data[col] = data[col].astype(object).fillna("").astype(str)
+
+    # The store's shared categoricals are decoded here; the editor only sees plain values
+    for col in data.columns[[isinstance(dtype, pd.CategoricalDtype) for dtype in data.dtypes]]:
+        data[col] = data[col].astype(object)
+    return data
+
+@perf_metrics.instrument("editable_table")
+def editable_table(data, key=None, selectable=False):
+    """Allow inline editing of Date, Priority, Comment, and AppSetter.
+
+    With selectable=True the leading "Select" checkbox column is editable as well.
+    """
+    if key is not None:
+        with perf_metrics.timed("editable_table.track_edits", rows=len(data)):
+            track_editor_edits(data, key)
+    with perf_metrics.timed("editable_table.coerce", rows=len(data)):
+        coerce_editable_columns(data)
+
+    # Column configs are cached and only rebuilt when appsetter.csv changes
+    column_config = reference_data.column_config(selectable)
+    editable_columns = list(EDITABLE_COLUMNS) + (["Select"] if selectable else [])
+
+    # Display the data editor with editable fields; this serializes data for the browser
+    with perf_metrics.timed("editable_table.render", rows=len(data)):
+        editable_data = st.data_editor(
+            data,
+            column_config=column_config,
+            disabled=list(data.columns.difference(editable_columns)),
+            use_container_width=True,
+            key=key,
+        )
 
     return editable_data
 
+def _edits_to_patch(state, base):
+    patch = {}
+    for position, changes in state.get("edited_rows", {}).items():
+        changes = {column: value for column, value in changes.items() if column in EDITABLE_COLUMNS}
+        if changes and int(position) < len(base):
+            patch[base.index[int(position)]] = changes
+    return patch
+
+def track_editor_edits(data, key):
+    """Capture the edits made to editor key against what it last showed, then keep data as shown.
+
+    Runs before the editor is drawn: the widget state still describes the previous render,
+    and its positions are mapped through the frame that render showed. That keeps the edits
+    correct (and checkable) even if the data changed underneath in the meantime. Only the
+    edited rows are snapshotted, so a rerun without cell edits does no per-row work.
+    """
+    shown = st.session_state.get(f"{key}_shown")
+    patch, base = {}, None
+    if shown is not None:
+        patch = _edits_to_patch(st.session_state.get(key) or {}, shown)
+        if patch:
+            base = lead_store.edit_base(shown.loc[list(patch)])
+    st.session_state[f"{key}_pending"] = (patch, base)
+    # Shallow: shares data's columns, but not the changes made to data after this (copy-on-write)
+    st.session_state[f"{key}_shown"] = data.copy(deep=False)
+
+def editor_key(name):
+    """Widget key for the editor called name; reset_editor moves it to a fresh key."""
+    return f"{name}_v{st.session_state.get(f'{name}_version', 0)}"
+
+def reset_editor(name):
+    """Start a new edit session for the editor called name, e.g. once its edits are saved."""
+    for suffix in ("_shown", "_pending"):
+        st.session_state.pop(f"{editor_key(name)}{suffix}", None)
+    st.session_state[f"{name}_version"] = st.session_state.get(f"{name}_version", 0) + 1
+
+def editor_patch(data, name):
+    """Cell edits made in the editor called name, as {row label: {column: new value}}.
+
+    Read from the widget's own edited_rows delta, so no table comparison is needed.
+    """
+    pending = st.session_state.get(f"{editor_key(name)}_pending")
+    if pending is not None:
+        return pending[0]
+    return _edits_to_patch(st.session_state.get(editor_key(name)) or {}, data)
+
+def editor_base(name):
+    """Snapshot of the rows the editor called name showed when its pending edits were made."""
+    pending = st.session_state.get(f"{editor_key(name)}_pending")
+    return pending[1] if pending is not None else None
+
+def save_editor_changes(file_path, data, name):
+    """Queue a compare-and-swap write of the edits made in editor name into file_path.
+
+    Returns as soon as the edits are journaled; write_status reports any conflicts once
+    the writer has applied them.
+    """
+    patch = editor_patch(data, name)
+    if patch:
+        track_write(write_queue.submit_patch(file_path, patch, base=editor_base(name)))
+    reset_editor(name)
+    return lead_store.PatchResult(sum(len(changes) for changes in patch.values()), [])
+
+def move_leads(data, selected_rows, source_path, target_paths):
+    """Queue moving the leads with the selected_rows IDs; returns the number queued.
+
+    data is the frame the selection was made on, or None; IDs it does not hold are dropped.
+    """
+    if data is not None:
+        selected_rows = [row for row in selected_rows if row in data.index]
+    if selected_rows:
+        track_write(write_queue.submit_move(selected_rows, source_path, target_paths))
+    return len(selected_rows)
+
+def bulk_move_panel(source_path, targets, key):
+    """Move every lead of source_path matching a condition at once, after a dry-run count.
+
+    targets maps a destination label to the target paths of that move.
+    """
+    with st.expander("Bulk Move"):
+        columns = st.columns(len(BULK_COLUMNS) + 1)
+        days = columns[0].number_input("Date older than (days, 0 = any)", min_value=0, value=0, key=f"{key}_bulk_days")
+        where = {lead_store.OLDER_THAN: days} if days else {}
+        for column, (name, label) in zip(columns[1:], BULK_COLUMNS.items()):
+            chosen = column.multiselect(label, lead_store.distinct_values(source_path, name), key=f"{key}_bulk_{name}")
+            if chosen:
+                where[name] = chosen
+        if not where:
+            st.info("Choose at least one condition.")
+            return
+
+        # Dry run: what would move right now, queued edits and moves included
+        matched = lead_store.select_leads(source_path, where, pending=True)
+        st.write(f"{len(matched)} leads match.")
+        label = st.selectbox("Move to", list(targets), key=f"{key}_bulk_target")
+        if matched and st.button(f"Move {len(matched)} leads to {label}", key=f"{key}_bulk_move"):
+            move_leads(None, matched, source_path, targets[label])
+            clear_selection(key)
+            st.success(f"{len(matched)} leads queued to move to {label}.")
+
+def filter_controls(file_path, key):
+    """Render the filter and page-size widgets; return the active filters and the page size."""
+    columns = st.columns(len(FILTER_COLUMNS) + 1)
+    filters = {}
+    for column, name in zip(columns, FILTER_COLUMNS):
+        chosen = column.multiselect(name, lead_store.distinct_values(file_path, name), key=f"{key}_filter_{name}")
+        if chosen:
+            filters[name] = chosen
+    page_size = columns[-1].selectbox("Rows per page", PAGE_SIZE_OPTIONS, index=1, key=f"{key}_page_size")
+    return filters, page_size
+
+def paginated_table(file_path, key):
+    """Show one filtered page of file_path in the editor, with checkbox selection kept across pages.
+
+    Returns the window, the name of its editor and the set of selected row labels.
+    """
+    filters, page_size = filter_controls(file_path, key)
+    total = lead_store.count_rows(file_path, filters)
+    page_count = max(1, -(-total // page_size))
+    page = st.number_input(f"Page (of {page_count}, {total} rows)", min_value=1, max_value=page_count, value=1, key=f"{key}_page")
+
+    # Only this window is materialized and sent to the browser
+    window = lead_store.load_page(file_path, filters, (page - 1) * page_size, page_size, pending=True)
+    selected = st.session_state.setdefault(f"{key}_selected", set())
+    window.insert(0, "Select", window.index.isin(list(selected)))
+
+    # The editor keeps its edits per key, so give every page/filter combination its own
+    editor_name = f"{key}_table_{page}_{page_size}_{sorted(filters.items())}"
+    st.session_state[f"{key}_editor"] = editor_name
+    edited = editable_table(window, key=editor_key(editor_name), selectable=True)
+
+    selected.difference_update(window.index)
+    selected.update(edited.index[edited["Select"]])
+    return window, editor_name, selected
+
+def clear_selection(key):
+    """Empty the selection of paginated_table key.
+
+    The editor keeps its ticked boxes by row position, so it is reset too; otherwise the
+    next render would tick them again, on whatever leads now sit in those rows.
+    """
+    st.session_state.get(f"{key}_selected", set()).clear()
+    editor_name = st.session_state.get(f"{key}_editor")
+    if editor_name is not None:
+        reset_editor(editor_name)
+
 def raw_data_page():
     """Main page for raw data handling."""
     st.title("Raw Data Page")
-    data = load_data()
+    if not os.path.exists(DATA_PATH):
+        st.error("Raw data file not found!")
+        return
 
-    if not data.empty:
-        # Display and allow inline editing of 4 specific columns
-        edited_data = editable_table(data)
+    with st.expander("Import Leads"):
+        upload = st.file_uploader("Vendor export (CSV or Excel)", type=["csv", "xlsx"])
+        if upload is not None and st.button("Import"):
+            from lead_import import import_leads
+            result = import_leads(upload)
+            st.success(f"{result['imported']} leads imported, {result['rejected']} duplicates rejected.")
+
+    if lead_store.count_rows(DATA_PATH):
+        # Display and allow inline editing of 4 specific columns, one page at a time
+        window, editor_name, selected = paginated_table(DATA_PATH, "raw_data")
 
         st.subheader("Select rows to move:")
-        selected_rows = st.multiselect(
-            "Select Rows by Index", data.index.tolist(), default=[]
-        )
+        st.write(f"{len(selected)} rows selected across all pages.")
+        if st.button("Clear Selection"):
+            clear_selection("raw_data")
+            st.rerun()
+        selected_rows = sorted(selected)
 
-        # Check which rows have been modified
+        # Save only the cells edited on this page
         if st.button("Save Changes"):
-            # Compare the original data with the edited data
-            modified_rows = edited_data != data
-            modified_rows_index = modified_rows.any(axis=1).index[modified_rows.any(axis=1)].tolist()
-
-            if modified_rows_index:
-                # Update only modified rows in the original data
-                for row_index in modified_rows_index:
-                    data.loc[row_index] = edited_data.loc[row_index]
-
-                # Save the updated data to the raw data file
-                save_data(data, DATA_PATH)
-                st.success("Changes saved successfully!")
+            if editor_patch(window, editor_name):
+                if save_editor_changes(DATA_PATH, window, editor_name).written:
+                    st.success("Changes saved successfully!")
             else:
                 st.warning("No changes detected.")
 
         # Move to Bin
         if st.button("Move to notpicked"):
             if selected_rows:
-                notpicked = pd.DataFrame(data.loc[selected_rows])
-                save_data(notpicked, NOT_PICKED_PATH , append=True)  # Remove append=True
-                data.drop(index=selected_rows, inplace=True)
-                save_data(data, DATA_PATH)  # Save updated raw_data.csv
+                move_leads(None, selected_rows, DATA_PATH, [NOT_PICKED_PATH])
+                clear_selection("raw_data")
                 st.success("Selected rows moved to notpicked!")
-                st.experimental_rerun()
+                st.rerun()
             else:
                 st.warning("Please select rows to move.")
         if st.button("Move to callback"):
             if selected_rows:
-                callback = pd.DataFrame(data.loc[selected_rows])
-                save_data(callback, CALLBACK_PATH, append=True)  # Remove append=True
-                data.drop(index=selected_rows, inplace=True)
-                save_data(data, DATA_PATH)  # Save updated raw_data.csv
+                move_leads(None, selected_rows, DATA_PATH, [CALLBACK_PATH])
+                clear_selection("raw_data")
                 st.success("Selected rows moved to callback!")
-                st.experimental_rerun()
+                st.rerun()
             else:
                 st.warning("Please select rows to move.")
         if st.button("Move to Bin"):
             if selected_rows:
-                bin_data = pd.DataFrame(data.loc[selected_rows])
-                save_data(bin_data, BIN_PATH, append=True)  # Append data to Bin
-                data.drop(index=selected_rows, inplace=True)
-                save_data(data, DATA_PATH)  # Save updated callback.csv
+                move_leads(None, selected_rows, DATA_PATH, [BIN_PATH])
+                clear_selection("raw_data")
                 st.success("Selected rows moved to Bin!")
-                st.experimental_rerun()
+                st.rerun()
             else:
                 st.warning("Please select rows to move.")
 
         # Move to Meeting Booked
         if st.button("Move to Meeting Booked"):
             if selected_rows:
-                meeting_data = pd.DataFrame(data.loc[selected_rows])
-                save_data(meeting_data, MEETING_BOOKED_PATH, append=True)  # Append data to Meeting Booked
-                data.drop(index=selected_rows, inplace=True)
-                save_data(data, DATA_PATH)  # Save updated callback.csv
+                move_leads(None, selected_rows, DATA_PATH, [MEETING_BOOKED_PATH])
+                clear_selection("raw_data")
                 st.success("Selected rows moved to Meeting Booked!")
-                st.experimental_rerun()
+                st.rerun()
             else:
                 st.warning("Please select rows to move.")
+
+        bulk_move_panel(DATA_PATH, {
+            "notpicked": [NOT_PICKED_PATH],
+            "callback": [CALLBACK_PATH],
+            "Bin": [BIN_PATH],
+            "Meeting Booked": [MEETING_BOOKED_PATH],
+        }, "raw_data")
     else:
         st.info("No data available in Raw Data.")
@@ -0,0 +1,100 @@
+"""Reference data every editable table needs: AppSetter names, priority options, column configs.
+
+Cached per process and reloaded only when appsetter.csv changes, so drawing a table costs one
+stat() instead of a CSV read and a rebuilt config. add_appsetter and set_appsetter_active
+edit the file, which every session then picks up on its next rerun.
+"""
+import os
+import threading
+import pandas as pd
+import streamlit as st
+import lead_store
+from lead_store import DATA_DIR
+
+APPSETTER_PATH = os.path.join(DATA_DIR, "appsetter.csv")
+
+PRIORITY_OPTIONS = ["High", "Medium", "Low"]
+
+_cache = {}  # {name: ((mtime_ns, size) of appsetter.csv, value)}
+_lock = threading.Lock()
+
+def _file_key():
+    try:
+        stat = os.stat(APPSETTER_PATH)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _cached(name, build):
+    """The value cached under name, rebuilt with build() when appsetter.csv has changed."""
+    key = _file_key()
+    with _lock:
+        entry = _cache.get(name)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    value = build()
+    with _lock:
+        _cache[name] = (key, value)
+    return value
+
+def _read_table():
+    if not os.path.exists(APPSETTER_PATH):
+        return pd.DataFrame({"AppSetter": pd.Series(dtype=str), "Active": pd.Series(dtype=bool)})
+    table = pd.read_csv(APPSETTER_PATH, dtype=str, keep_default_na=False)
+    table = table[table["AppSetter"].str.strip() != ""].reset_index(drop=True)
+    # Files from before deactivation existed have no Active column: everyone is active
+    active = table["Active"] if "Active" in table.columns else pd.Series("", index=table.index)
+    table["Active"] = active.str.strip().str.lower() != "false"
+    return table[["AppSetter", "Active"]]
+
+def appsetter_table():
+    """Every AppSetter with whether they are active. The cached frame itself; do not modify it."""
+    return _cached("table", _read_table)
+
+def appsetters(include_inactive=False):
+    """AppSetter names offered in the editors: the active ones, or all with include_inactive."""
+    def build():
+        table = appsetter_table()
+        return table["AppSetter"].tolist(), table.loc[table["Active"], "AppSetter"].tolist()
+    everyone, active = _cached("names", build)
+    return list(everyone if include_inactive else active)
+
+def column_config(selectable=False):
+    """column_config for an editable lead table, plus the Select checkbox with selectable."""
+    def build():
+        config = {
+            "Date": st.column_config.DateColumn("Date", format="YYYY-MM-DD"),
+            "priority": st.column_config.SelectboxColumn("Priority", options=PRIORITY_OPTIONS),
+            "comment": st.column_config.TextColumn("Comment"),
+            "AppSetter": st.column_config.SelectboxColumn("AppSetter", options=appsetters()),
+        }
+        if selectable:
+            config["Select"] = st.column_config.CheckboxColumn("Select")
+        return config
+    return dict(_cached(("config", selectable), build))
+
+def _write_table(table):
+    with lead_store.store_lock():
+        table.to_csv(f"{APPSETTER_PATH}.tmp", index=False)
+        os.replace(f"{APPSETTER_PATH}.tmp", APPSETTER_PATH)
+
+def add_appsetter(name):
+    """Add an active AppSetter, or reactivate one with that name; False if name is blank."""
+    name = name.strip()
+    if not name:
+        return False
+    with lead_store.store_lock():
+        table = _read_table()
+        if name in table["AppSetter"].tolist():
+            table.loc[table["AppSetter"] == name, "Active"] = True
+        else:
+            table = pd.concat([table, pd.DataFrame({"AppSetter": [name], "Active": [True]})], ignore_index=True)
+        _write_table(table)
+    return True
+
+def set_appsetter_active(name, active):
+    """Activate or deactivate an AppSetter; their existing leads keep the name either way."""
+    with lead_store.store_lock():
+        table = _read_table()
+        table.loc[table["AppSetter"] == name, "Active"] = bool(active)
+        _write_table(table)
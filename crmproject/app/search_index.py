@@ -0,0 +1,222 @@
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+import pandas as pd
+import lead_store
+import pipeline
+from lead_store import DATA_DIR, STAGE_PATHS
+
+INDEX_PATH = os.path.join(DATA_DIR, "search_index.db")
+
+# Lead column -> full-text column of the index
+SEARCH_COLUMNS = {
+    "First Name": "first_name",
+    "Last Name": "last_name",
+    "Company": "company",
+    "Email": "email",
+    "Phone Number": "phone",
+    "Title": "title",
+    "Industry": "industry",
+}
+
+# Stage -> where to find it in the sidebar
+STAGE_LABELS = {
+    "raw_data": "Raw Data",
+    "not_picked": "Not Picked",
+    "callback": "Callback",
+    "meeting_booked": "Meeting Booked",
+    "qualified": "Qualified",
+    "disqualified": "Disqualified",
+    "deals_active": "Deals (Active)",
+    "follow_up": "Deals (Follow-Up)",
+    "closed_deal": "Deals (Closed)",
+    "lost_deal": "Deals (Lost)",
+    "bin": "Bin",
+}
+
+MAX_RESULTS = 50
+
+_TEXT_SQL = ", ".join(SEARCH_COLUMNS.values())
+
+# lead_rows holds one row per lead per stage; lead_text holds its searchable text under the same rowid
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS lead_rows (
+    id INTEGER PRIMARY KEY,
+    identity INTEGER NOT NULL,
+    stage TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lead_rows_stage ON lead_rows (stage, identity);
+CREATE VIRTUAL TABLE IF NOT EXISTS lead_text USING fts5(
+    {_TEXT_SQL}, phone_digits, tokenize = 'unicode61', prefix = '2 3'
+);
+CREATE TABLE IF NOT EXISTS stage_stamps (
+    stage TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL
+);
+"""
+
+_schema_ready = False
+_lock = threading.Lock()
+
+def connect():
+    """Open the search index, creating it on first use."""
+    global _schema_ready
+    conn = sqlite3.connect(INDEX_PATH, timeout=30)
+    if not _schema_ready:
+        with _lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            _schema_ready = True
+    return conn
+
+def _identities(data):
+    # SQLite integers are signed 64-bit, so store the uint64 stamps reinterpreted as int64
+    return lead_store.identity_stamps(data).to_numpy().view("int64")
+
+def _text_rows(data):
+    """Searchable text of every row of data: the SEARCH_COLUMNS plus the bare phone digits."""
+    text = pd.DataFrame({
+        column: data[column].astype(object).where(data[column].notna(), "").astype(str)
+        if column in data.columns else ""
+        for column in SEARCH_COLUMNS
+    }, index=data.index)
+    # Bare digits, and the last ten of them, so a number matches with or without its country code
+    digits = text["Phone Number"].str.replace(r"\D", "", regex=True)
+    text["phone_digits"] = digits + " " + digits.str[-10:]
+    return list(text.itertuples(index=False, name=None))
+
+def _insert(conn, stage, data):
+    """Index every row of data as a lead in stage."""
+    if data.empty:
+        return
+    start = conn.execute("SELECT COALESCE(MAX(id), 0) FROM lead_rows").fetchone()[0] + 1
+    ids = range(start, start + len(data))
+    conn.executemany(
+        "INSERT INTO lead_rows (id, identity, stage) VALUES (?, ?, ?)",
+        [(row_id, int(identity), stage) for row_id, identity in zip(ids, _identities(data))],
+    )
+    conn.executemany(
+        f"INSERT INTO lead_text (rowid, {_TEXT_SQL}, phone_digits) VALUES (?{', ?' * (len(SEARCH_COLUMNS) + 1)})",
+        [(row_id,) + text for row_id, text in zip(ids, _text_rows(data))],
+    )
+
+def _delete(conn, row_ids):
+    conn.executemany("DELETE FROM lead_rows WHERE id = ?", [(row_id,) for row_id in row_ids])
+    conn.executemany("DELETE FROM lead_text WHERE rowid = ?", [(row_id,) for row_id in row_ids])
+
+def _rows_of(conn, stage, identity, limit):
+    return [row[0] for row in conn.execute(
+        "SELECT id FROM lead_rows WHERE stage = ? AND identity = ? LIMIT ?", (stage, identity, limit),
+    )]
+
+def _reconcile(conn, stage):
+    """Bring the index of stage in line with its stage file, touching only leads that differ."""
+    data = lead_store.load_data(STAGE_PATHS[stage])
+    stamp = lead_store.stage_version(STAGE_PATHS[stage])
+    wanted = Counter(_identities(data).tolist()) if not data.empty else Counter()
+    indexed = Counter(dict(conn.execute(
+        "SELECT identity, COUNT(*) FROM lead_rows WHERE stage = ? GROUP BY identity", (stage,),
+    ).fetchall()))
+
+    surplus = indexed - wanted
+    _delete(conn, [row_id for identity, count in surplus.items() for row_id in _rows_of(conn, stage, identity, count)])
+    missing = wanted - indexed
+    if missing:
+        # Each missing identity claims as many rows of data as it is short of
+        identities = pd.Series(_identities(data), index=data.index)
+        occurrence = identities.groupby(identities).cumcount()
+        short = identities.map(missing).fillna(0)
+        _insert(conn, stage, data[(occurrence < short).to_numpy()])
+
+    conn.execute("INSERT OR REPLACE INTO stage_stamps (stage, stamp) VALUES (?, ?)", (stage, stamp))
+
+def refresh():
+    """Reindex any stage whose leads changed without going through a tracked move."""
+    conn = connect()
+    try:
+        with conn:
+            stamps = dict(conn.execute("SELECT stage, stamp FROM stage_stamps").fetchall())
+            for stage, file_path in STAGE_PATHS.items():
+                if stamps.get(stage) != lead_store.stage_version(file_path):
+                    _reconcile(conn, stage)
+    finally:
+        conn.close()
+
+def _match_query(query):
+    """FTS5 query requiring every word of query, each as a prefix."""
+    words = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{word}"*' for word in words)
+
+def search(query, limit=MAX_RESULTS):
+    """Leads matching every word of query, with the stage each one is in now."""
+    columns = ["Stage"] + list(SEARCH_COLUMNS)
+    match = _match_query(query)
+    if not match:
+        return pd.DataFrame(columns=columns)
+    refresh()
+    conn = connect()
+    try:
+        rows = conn.execute(
+            f"SELECT r.stage, {_TEXT_SQL} FROM lead_text JOIN lead_rows r ON r.id = lead_text.rowid "
+            f"WHERE lead_text MATCH ? ORDER BY rank LIMIT ?",
+            (match, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    results = pd.DataFrame(rows, columns=columns)
+    results["Stage"] = results["Stage"].map(STAGE_LABELS)
+    return results
+
+def _on_move(moved, source_path, target_paths, versions):
+    """Move the moved leads' index rows to their new stage; their text does not change.
+
+    Only valid if the index was current for every stage involved right before the move;
+    otherwise those stages are reconciled on the next search instead.
+    """
+    source = lead_store.stage_for_path(source_path)
+    targets = [lead_store.stage_for_path(target_path) for target_path in target_paths]
+    if moved.empty or source is None or None in targets:
+        return
+    conn = connect()
+    try:
+        with conn:
+            tracked = dict(conn.execute("SELECT stage, stamp FROM stage_stamps").fetchall())
+            paths = [source_path] + list(target_paths)
+            # A stage another process wrote to unseen is behind, even if this move's delta is applied
+            if any(tracked.get(stage) not in versions[path] for stage, path in zip([source] + targets, paths)):
+                conn.executemany("DELETE FROM stage_stamps WHERE stage = ?", [(stage,) for stage in [source] + targets])
+                return
+            for identity, count in Counter(_identities(moved).tolist()).items():
+                row_ids = _rows_of(conn, source, identity, count)
+                conn.executemany("UPDATE lead_rows SET stage = ? WHERE id = ?", [(targets[0], row_id) for row_id in row_ids])
+            for target in targets[1:]:
+                # Extra targets (Meeting Booked -> Qualified and Deals Active) get their own copy
+                _insert(conn, target, moved)
+            # Every stage involved was indexed right before the commit, so it is current as of its end
+            for stage, path in zip([source] + targets, paths):
+                conn.execute("UPDATE stage_stamps SET stamp = ? WHERE stage = ?", (versions[path][1], stage))
+    finally:
+        conn.close()
+
+def _on_write(file_path, columns, versions):
+    """A save can add or replace leads, so reconcile that stage on the next search.
+
+    An edit of columns the index does not hold leaves it as current as it was: a stamp of
+    the version right before the edit moves on to the version right after it.
+    """
+    stage = lead_store.stage_for_path(file_path)
+    if stage is not None and os.path.exists(INDEX_PATH):
+        conn = connect()
+        try:
+            with conn:
+                if columns is not None and not columns & set(SEARCH_COLUMNS):
+                    conn.execute("UPDATE stage_stamps SET stamp = ? WHERE stage = ? AND stamp = ?", (versions[1], stage, versions[0]))
+                else:
+                    conn.execute("DELETE FROM stage_stamps WHERE stage = ?", (stage,))
+        finally:
+            conn.close()
+
+pipeline.add_move_listener(_on_move)
+lead_store.add_write_listener(_on_write)
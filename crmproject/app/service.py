@@ -0,0 +1,194 @@
+"""UI-independent pipeline operations for nightly jobs, the HTTP API (api_server) and scripts.
+
+Stages are addressed by name (raw_data, callback, ..., bin) and leads by lead ID. Each call
+is one batch: a bulk move is a single TransitionBatch and a bulk update writes every stage
+it touches once, however many leads are involved. Bad requests raise ValueError.
+
+    python service.py counts
+    python service.py leads callback [--offset 0] [--limit 100]
+    python service.py move callback bin [--older-than 30] [--priority Low] [--industry retail] [--ids 1 2 3] [--dry-run]
+    python service.py update updates.json
+    python service.py export closed_deal [-o closed_deal.csv]
+    python service.py import vendor_export.csv
+    python service.py report
+    python service.py serve [--host 127.0.0.1] [--port 8502]
+
+serve's port defaults to CRM_API_PORT, or 8502, like api_server.py's.
+"""
+import sys
+import json
+import argparse
+from collections import defaultdict
+import lead_store
+import pipeline
+from lead_store import STAGE_PATHS, LEAD_COLUMNS, EDITABLE_COLUMNS, OLDER_THAN, ID_COLUMN
+
+def stage_path(stage):
+    """The stage file of a stage name."""
+    if stage not in STAGE_PATHS:
+        raise ValueError(f"unknown stage {stage!r}; expected one of {', '.join(STAGE_PATHS)}")
+    return STAGE_PATHS[stage]
+
+def _check_where(where):
+    if not isinstance(where, dict) or not where:
+        raise ValueError("where must be a non-empty object of conditions")
+    for column, values in where.items():
+        if column == OLDER_THAN:
+            if not isinstance(values, int) or values < 0:
+                raise ValueError(f"{OLDER_THAN} must be a non-negative number of days")
+        elif column not in LEAD_COLUMNS:
+            raise ValueError(f"unknown column {column!r} in where")
+        elif not isinstance(values, list):
+            raise ValueError(f"where[{column!r}] must be a list of allowed values")
+
+def stage_counts():
+    """{stage: number of leads} for every stage."""
+    return {stage: lead_store.count_rows(file_path) for stage, file_path in STAGE_PATHS.items()}
+
+def list_leads(stage, filters=None, offset=0, limit=100):
+    """(matching leads in stage, one window of them indexed by lead ID)."""
+    file_path = stage_path(stage)
+    return lead_store.count_rows(file_path, filters), lead_store.load_page(file_path, filters, offset, limit)
+
+def bulk_move(moves, dry_run=False):
+    """Apply a list of moves as one transaction; return the number of leads each one moved.
+
+    Each move is {"from": stage, "to": stage or [stages], "ids": [lead IDs]} or the same
+    with "where": {column: [values], "older_than_days": n} instead of ids. With dry_run
+    nothing is written and the counts are what each move would move right now.
+    """
+    batch, counts = pipeline.TransitionBatch(), []
+    for move in moves:
+        source = stage_path(move.get("from"))
+        targets = move.get("to")
+        targets = [stage_path(stage) for stage in ([targets] if isinstance(targets, str) else targets or [])]
+        if not targets:
+            raise ValueError("every move needs a target stage in \"to\"")
+        if ("ids" in move) == ("where" in move):
+            raise ValueError("every move needs exactly one of \"ids\" and \"where\"")
+        if "where" in move:
+            _check_where(move["where"])
+            if dry_run:
+                counts.append(len(lead_store.select_leads(source, move["where"])))
+            else:
+                batch.move_where(move["where"], source, targets)
+        else:
+            ids = [int(lead_id) for lead_id in move["ids"]]
+            if dry_run:
+                stage = lead_store.stage_for_path(source)
+                counts.append(sum(1 for found, _ in lead_store.locate(ids).values() if found == stage))
+            else:
+                batch.move(None, ids, source, targets)
+    if dry_run:
+        return counts
+    batch.commit()
+    return batch.moved_counts
+
+def bulk_update(updates):
+    """Set editable cells of many leads, writing each stage once; return what was written.
+
+    updates is a list of {"stage": stage, "id": lead ID, "changes": {column: value}}.
+    Returns {"written": cells written, "missing": [IDs not in the stage they were sent for]}.
+    """
+    patches = defaultdict(dict)
+    for update in updates:
+        file_path = stage_path(update.get("stage"))
+        changes = update.get("changes") or {}
+        invalid = [column for column in changes if column not in EDITABLE_COLUMNS]
+        if invalid:
+            raise ValueError(f"only {', '.join(EDITABLE_COLUMNS)} can be updated, not {', '.join(invalid)}")
+        patches[file_path].setdefault(int(update["id"]), {}).update(changes)
+
+    written, missing = 0, []
+    for file_path, patch in patches.items():
+        stage = lead_store.stage_for_path(file_path)
+        with lead_store.store_lock():
+            present = {lead_id for lead_id, (found, _) in lead_store.locate(list(patch)).items() if found == stage}
+            missing += [lead_id for lead_id in patch if lead_id not in present]
+            patch = {lead_id: changes for lead_id, changes in patch.items() if lead_id in present}
+            if patch:
+                written += lead_store.apply_patches(file_path, [(patch, None)])[0].written
+    return {"written": written, "missing": missing}
+
+def export_stage(stage, out):
+    """Write every lead of stage, lead IDs first, as CSV to out (a path or a text stream)."""
+    lead_store.load_data(stage_path(stage)).to_csv(out, index_label=ID_COLUMN)
+
+def import_leads(source):
+    """Import a vendor CSV/Excel export into Raw Data; {"imported": n, "rejected": n}."""
+    from lead_import import import_leads as run_import
+    return run_import(source)
+
+def weekly_report():
+    """Weekly lead counts per stage and AppSetter, as on the Weekly Graphs page."""
+    import weekly_cube
+    return weekly_cube.all_counts()
+
+def _main(argv):
+    # Imported here: api_server imports this module
+    import api_server
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("counts", help="leads per stage")
+    leads = commands.add_parser("leads", help="print one window of a stage")
+    leads.add_argument("stage")
+    leads.add_argument("--offset", type=int, default=0)
+    leads.add_argument("--limit", type=int, default=100)
+    move = commands.add_parser("move", help="move the leads of a stage matching conditions or IDs")
+    move.add_argument("source")
+    move.add_argument("targets", nargs="+")
+    move.add_argument("--ids", type=int, nargs="+")
+    move.add_argument("--older-than", type=int, help="Date more than this many days ago")
+    move.add_argument("--priority", nargs="+")
+    move.add_argument("--industry", nargs="+")
+    move.add_argument("--appsetter", nargs="+")
+    move.add_argument("--dry-run", action="store_true")
+    update = commands.add_parser("update", help="apply a JSON list of {stage, id, changes}")
+    update.add_argument("file")
+    export = commands.add_parser("export", help="write a stage as CSV")
+    export.add_argument("stage")
+    export.add_argument("-o", "--output", default=None, help="file to write (default: stdout)")
+    imported = commands.add_parser("import", help="import a vendor CSV/Excel export into Raw Data")
+    imported.add_argument("file")
+    commands.add_parser("report", help="weekly counts per stage and AppSetter")
+    serve = commands.add_parser("serve", help="run the local HTTP API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=api_server.API_PORT)
+    args = parser.parse_args(argv)
+
+    if args.command == "counts":
+        print(json.dumps(stage_counts(), indent=2))
+    elif args.command == "leads":
+        total, window = list_leads(args.stage, offset=args.offset, limit=args.limit)
+        print(window.to_csv(index_label=ID_COLUMN), end="")
+        print(f"{len(window)} of {total} leads", file=sys.stderr)
+    elif args.command == "move":
+        move = {"from": args.source, "to": args.targets}
+        if args.ids:
+            move["ids"] = args.ids
+        else:
+            where = {column: values for column, values in
+                     (("priority", args.priority), ("Industry", args.industry), ("AppSetter", args.appsetter)) if values}
+            if args.older_than is not None:
+                where[OLDER_THAN] = args.older_than
+            move["where"] = where
+        moved = bulk_move([move], dry_run=args.dry_run)[0]
+        print(f"{moved} leads {'would move' if args.dry_run else 'moved'}")
+    elif args.command == "update":
+        with open(args.file) as f:
+            print(json.dumps(bulk_update(json.load(f))))
+    elif args.command == "export":
+        export_stage(args.stage, args.output or sys.stdout)
+    elif args.command == "import":
+        result = import_leads(args.file)
+        print(f"{result['imported']} leads imported, {result['rejected']} duplicates rejected")
+    elif args.command == "report":
+        print(weekly_report().to_csv(index=False), end="")
+    elif args.command == "serve":
+        api_server.serve(args.host, args.port)
+
+if __name__ == "__main__":
+    try:
+        _main(sys.argv[1:])
+    except ValueError as exc:
+        sys.exit(f"error: {exc}")
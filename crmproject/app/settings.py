@@ -0,0 +1,33 @@
+import streamlit as st
+import reference_data
+
+def settings_page():
+    st.title("Settings")
+
+    # AppSetters: deactivated ones drop out of the dropdowns but stay on the leads they hold
+    st.subheader("AppSetters")
+    table = reference_data.appsetter_table()
+    if table.empty:
+        st.info("No AppSetters yet.")
+    else:
+        edited = st.data_editor(
+            table.copy(),
+            column_config={"Active": st.column_config.CheckboxColumn("Active")},
+            disabled=["AppSetter"],
+            hide_index=True,
+            use_container_width=True,
+            key="appsetter_table",
+        )
+        if st.button("Save AppSetters"):
+            changed = edited[edited["Active"] != table["Active"]]
+            for name, active in zip(changed["AppSetter"], changed["Active"]):
+                reference_data.set_appsetter_active(name, active)
+            st.success(f"Updated {len(changed)} AppSetter(s).")
+
+    with st.form("add_appsetter", clear_on_submit=True):
+        name = st.text_input("New AppSetter")
+        if st.form_submit_button("Add AppSetter"):
+            if reference_data.add_appsetter(name):
+                st.success(f"Added {name.strip()}.")
+            else:
+                st.error("Enter a name to add.")
@@ -0,0 +1,106 @@
+"""Parsed stage frames shared by the app worker processes of one host (see workers.py).
+
+The first worker to parse a stage file publishes the frame as an Arrow IPC snapshot in
+SNAPSHOT_DIR (shared memory under /dev/shm where there is one). The other workers memory-map
+that snapshot instead of parsing the file themselves: their string columns point straight
+into the shared pages, so N workers hold one copy of each stage, and a cold worker is ready
+in milliseconds. A snapshot of an older version of a CSV stage that has only grown since is
+still used, with just the appended rows parsed on top (lead_store._read_csv_stage).
+
+Switched on by CRM_SHARED_CACHE=1, which workers.py sets. Needs pyarrow; without it every
+worker keeps parsing for itself.
+"""
+import os
+import glob
+import json
+import hashlib
+import lead_store
+from lead_store import DATA_DIR
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # snapshots are an optimization; without pyarrow each worker parses
+    pa = None
+
+ENABLED = os.environ.get("CRM_SHARED_CACHE") == "1" and pa is not None
+
+def _default_dir():
+    # One directory per data directory, so two deployments on a host never share frames
+    name = "crm-" + hashlib.sha1(os.path.abspath(DATA_DIR).encode()).hexdigest()[:12]
+    return os.path.join("/dev/shm", name) if os.path.isdir("/dev/shm") else os.path.join(DATA_DIR, ".snapshots")
+
+SNAPSHOT_DIR = os.environ.get("CRM_SNAPSHOT_DIR") or _default_dir()
+
+def _snapshot_path(path, key):
+    return os.path.join(SNAPSHOT_DIR, "%s.%d-%d.arrow" % ((os.path.basename(path),) + tuple(key)))
+
+def _snapshots(path):
+    """{file key: snapshot path} of every snapshot of the stage file at path."""
+    found = {}
+    for snapshot in glob.glob(os.path.join(SNAPSHOT_DIR, glob.escape(os.path.basename(path)) + ".*.arrow")):
+        mtime_ns, size = snapshot.rsplit(".", 2)[1].split("-")
+        found[(int(mtime_ns), int(size))] = snapshot
+    return found
+
+def _encode_tail(tail):
+    if tail is None:
+        return None
+    return {"generation": list(tail.generation), "offset": tail.offset,
+            "header": tail.header.decode("latin-1"), "last_line": tail.last_line.decode("latin-1")}
+
+def _decode_tail(entry):
+    if entry is None:
+        return None
+    return lead_store._Tail(tuple(entry["generation"]), entry["offset"],
+                            entry["header"].encode("latin-1"), entry["last_line"].encode("latin-1"))
+
+def load(path, key):
+    """(file key, frame, tail) of the newest snapshot of the stage file at path, or None.
+
+    Newer snapshots than key are ignored; an older one is the caller's to bring up to date.
+    """
+    if not ENABLED:
+        return None
+    candidates = sorted((found for found in _snapshots(path) if found[0] <= key[0]), reverse=True)
+    for found in candidates:
+        try:
+            table = ipc.open_file(pa.memory_map(_snapshot_path(path, found))).read_all()
+        except (OSError, pa.ArrowException):
+            # Pruned by another worker between the listing and the read
+            continue
+        tail = json.loads((table.schema.metadata or {}).get(b"crm_tail", b"null"))
+        return found, lead_store.compact(table.to_pandas()), _decode_tail(tail)
+    return None
+
+def publish(path, key, data, tail=None):
+    """Share the frame parsed from the version key of the stage file at path; drop older snapshots."""
+    if not ENABLED or any(found[0] > key[0] for found in _snapshots(path)):
+        return
+    try:
+        table = pa.Table.from_pandas(data, preserve_index=True)
+    except (pa.ArrowException, TypeError, ValueError):
+        # Edited frames can hold mixed types Arrow will not take; the next clean parse is shared
+        return
+    metadata = dict(table.schema.metadata or {}, crm_tail=json.dumps(_encode_tail(tail)))
+    table = table.replace_schema_metadata(metadata)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    snapshot = _snapshot_path(path, key)
+    tmp_path = f"{snapshot}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as f:
+        with ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, snapshot)
+    prune(path, before=key)
+
+def prune(path, before=None):
+    """Delete the snapshots of the stage file at path older than version before, or all of them.
+
+    Workers that still have an older snapshot mapped keep reading it until they let go.
+    """
+    for found, snapshot in _snapshots(path).items():
+        if before is None or found[0] < before[0]:
+            try:
+                os.remove(snapshot)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,252 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from lead_store import DATA_DIR, STAGE_PATHS, LEAD_COLUMNS, ID_COLUMN
+
+DB_PATH = os.path.join(DATA_DIR, "leads.db")
+
+_COLUMN_SQL = ", ".join(f'"{col}"' for col in LEAD_COLUMNS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY,
+    stage TEXT NOT NULL,
+    {", ".join(f'"{col}" TEXT' for col in LEAD_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS idx_leads_stage ON leads (stage, id);
+CREATE INDEX IF NOT EXISTS idx_leads_appsetter ON leads ("AppSetter", stage);
+CREATE INDEX IF NOT EXISTS idx_leads_date ON leads (stage, "Date");
+CREATE INDEX IF NOT EXISTS idx_leads_email ON leads ("Email");
+CREATE TABLE IF NOT EXISTS stage_versions (
+    stage TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def connect():
+    """Open a connection to the leads database, creating the schema on first use."""
+    global _schema_ready
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    if not _schema_ready:
+        with _schema_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            _schema_ready = True
+    return conn
+
+@contextmanager
+def transaction():
+    """Yield a connection whose statements commit together, or roll back on error."""
+    conn = connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _bump_versions(conn, stages):
+    """Advance the change counter of every stage written in this transaction."""
+    conn.executemany(
+        "INSERT INTO stage_versions (stage, version) VALUES (?, 1) "
+        "ON CONFLICT(stage) DO UPDATE SET version = version + 1",
+        [(stage,) for stage in set(stages)],
+    )
+
+def stage_version(stage):
+    """Change counter of stage; it moves whenever leads in the stage are written."""
+    with transaction() as conn:
+        row = conn.execute("SELECT version FROM stage_versions WHERE stage = ?", (stage,)).fetchone()
+    return row[0] if row else 0
+
+def _to_rows(stage, data, with_ids=False):
+    """Turn a stage frame into parameter tuples, storing every value as text like the CSVs do."""
+    data = data.reindex(columns=LEAD_COLUMNS)
+    rows = []
+    for lead_id, values in zip(data.index, data.itertuples(index=False, name=None)):
+        row = [None if pd.isna(v) or v == "" else str(v) for v in values]
+        rows.append(([int(lead_id)] if with_ids else []) + [stage] + row)
+    return rows
+
+def load_stage(stage, columns=None):
+    """Load the leads currently in stage, indexed by their lead id."""
+    columns = columns or LEAD_COLUMNS
+    column_sql = ", ".join(f'"{col}"' for col in columns)
+    with transaction() as conn:
+        data = pd.read_sql_query(
+            f"SELECT id, {column_sql} FROM leads WHERE stage = ? ORDER BY id",
+            conn, params=(stage,), index_col="id",
+        )
+    data.index.name = None
+    return data
+
+def load_rows(stage, lead_ids):
+    """Load the given leads of stage, indexed by lead id; ids not in stage are left out."""
+    lead_ids = [int(lead_id) for lead_id in lead_ids]
+    if not lead_ids:
+        return pd.DataFrame(columns=LEAD_COLUMNS)
+    with transaction() as conn:
+        data = pd.read_sql_query(
+            f"SELECT id, {_COLUMN_SQL} FROM leads WHERE stage = ? AND id IN ({', '.join('?' * len(lead_ids))})",
+            conn, params=[stage] + lead_ids, index_col="id",
+        )
+    data.index.name = None
+    return data
+
+def _filter_sql(stage, filters):
+    """WHERE clause and parameters for a stage slice narrowed by {column: [values]}."""
+    clauses, params = ["stage = ?"], [stage]
+    for column, values in (filters or {}).items():
+        if column in LEAD_COLUMNS and values:
+            clauses.append(f'"{column}" IN ({", ".join("?" * len(values))})')
+            params.extend(str(value) for value in values)
+    return " AND ".join(clauses), params
+
+def count_rows(stage, filters=None):
+    """Number of leads in stage matching filters."""
+    where, params = _filter_sql(stage, filters)
+    with transaction() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM leads WHERE {where}", params).fetchone()[0]
+
+def load_page(stage, filters=None, offset=0, limit=100):
+    """Load one window of the stage slice, indexed by lead id."""
+    where, params = _filter_sql(stage, filters)
+    with transaction() as conn:
+        data = pd.read_sql_query(
+            f"SELECT id, {_COLUMN_SQL} FROM leads WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+            conn, params=params + [limit, offset], index_col="id",
+        )
+    data.index.name = None
+    return data
+
+def distinct_values(stage, column):
+    """Sorted non-empty values of column within stage."""
+    if column not in LEAD_COLUMNS:
+        return []
+    with transaction() as conn:
+        rows = conn.execute(
+            f'SELECT DISTINCT "{column}" FROM leads WHERE stage = ? AND "{column}" IS NOT NULL ORDER BY 1',
+            (stage,),
+        ).fetchall()
+    return [row[0] for row in rows]
+
+def max_lead_id():
+    with transaction() as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM leads").fetchone()[0]
+
+def locate(lead_ids):
+    """{lead id: (stage, row offset in load_stage)} for the given leads that exist."""
+    found = {}
+    with transaction() as conn:
+        for start in range(0, len(lead_ids), 500):
+            chunk = lead_ids[start:start + 500]
+            for lead_id, stage in conn.execute(
+                f"SELECT id, stage FROM leads WHERE id IN ({', '.join('?' * len(chunk))})", chunk,
+            ).fetchall():
+                # load_stage orders by id, so the offset is the number of smaller ids in the stage
+                offset = conn.execute("SELECT COUNT(*) FROM leads WHERE stage = ? AND id < ?", (stage, lead_id)).fetchone()[0]
+                found[lead_id] = (stage, offset)
+    return found
+
+def insert_leads(stage, data):
+    """Add new leads to stage under the lead IDs data is indexed by, and return those ids."""
+    placeholders = ", ".join("?" * (len(LEAD_COLUMNS) + 2))
+    with transaction() as conn:
+        conn.executemany(
+            f"INSERT INTO leads (id, stage, {_COLUMN_SQL}) VALUES ({placeholders})",
+            _to_rows(stage, data, with_ids=True),
+        )
+        _bump_versions(conn, [stage])
+    return [int(lead_id) for lead_id in data.index]
+
+def replace_stage(stage, data):
+    """Make the stage slice match data: rows are matched on id, missing ids are deleted."""
+    placeholders = ", ".join("?" * (len(LEAD_COLUMNS) + 2))
+    ids = [int(lead_id) for lead_id in data.index]
+    with transaction() as conn:
+        existing = {row[0] for row in conn.execute("SELECT id FROM leads WHERE stage = ?", (stage,))}
+        removed = existing.difference(ids)
+        conn.executemany("DELETE FROM leads WHERE id = ?", [(lead_id,) for lead_id in removed])
+        conn.executemany(
+            f"INSERT OR REPLACE INTO leads (id, stage, {_COLUMN_SQL}) VALUES ({placeholders})",
+            _to_rows(stage, data, with_ids=True),
+        )
+        _bump_versions(conn, [stage])
+
+def apply_patch(stage, patch):
+    """Update only the edited cells of leads in stage; return {(id, column): old value}."""
+    old_values = {}
+    with transaction() as conn:
+        for lead_id, changes in patch.items():
+            columns = [column for column in changes if column in LEAD_COLUMNS]
+            if not columns:
+                continue
+            column_sql = ", ".join(f'"{column}"' for column in columns)
+            old = conn.execute(f"SELECT {column_sql} FROM leads WHERE id = ? AND stage = ?", (int(lead_id), stage)).fetchone()
+            if old is None:
+                continue
+            assignments = ", ".join(f'"{column}" = ?' for column in columns)
+            values = [None if pd.isna(changes[column]) or changes[column] == "" else str(changes[column]) for column in columns]
+            conn.execute(f"UPDATE leads SET {assignments} WHERE id = ?", values + [int(lead_id)])
+            old_values.update({(lead_id, column): value for column, value in zip(columns, old)})
+        _bump_versions(conn, [stage])
+    return old_values
+
+def apply_moves(moves):
+    """Apply a list of (lead_ids, source_stage, target_stages, copy_ids) moves in one transaction.
+
+    Each lead still in its source stage is moved to the first target stage with one UPDATE;
+    further targets (Meeting Booked -> Qualified and Deals Active) get their own copy, which
+    is a lead of its own: copy_ids[k][i] is the id of lead_ids[i]'s copy in target_stages[k + 1].
+    """
+    moved = 0
+    with transaction() as conn:
+        for lead_ids, source_stage, target_stages, copy_ids in moves:
+            lead_ids = [int(lead_id) for lead_id in lead_ids]
+            if not lead_ids:
+                continue
+            id_sql = ", ".join("?" * len(lead_ids))
+            for stage, ids in zip(target_stages[1:], copy_ids):
+                conn.executemany(
+                    f"INSERT INTO leads (id, stage, {_COLUMN_SQL}) SELECT ?, ?, {_COLUMN_SQL} FROM leads "
+                    f"WHERE stage = ? AND id = ?",
+                    [(int(copy_id), stage, source_stage, lead_id) for copy_id, lead_id in zip(ids, lead_ids)],
+                )
+            cursor = conn.execute(
+                f"UPDATE leads SET stage = ? WHERE stage = ? AND id IN ({id_sql})",
+                [target_stages[0], source_stage] + lead_ids,
+            )
+            moved += cursor.rowcount
+            _bump_versions(conn, [source_stage] + target_stages)
+    return moved
+
+def migrate_csvs(force=False):
+    """One-shot import of every stage CSV into the leads table.
+
+    Refuses to run against a database that already holds leads unless force is True,
+    in which case the table is emptied first.
+    """
+    with transaction() as conn:
+        if conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0]:
+            if not force:
+                raise RuntimeError(f"{DB_PATH} already contains leads; pass force=True to re-import.")
+            conn.execute("DELETE FROM leads")
+
+    import lead_store
+    # The leads keep the IDs their CSVs give them, so IDs survive a change of backend
+    lead_store.assign_lead_ids(list(STAGE_PATHS.values()))
+    imported = {}
+    for stage, file_path in STAGE_PATHS.items():
+        if not os.path.exists(file_path):
+            continue
+        data = pd.read_csv(file_path, dtype=str, keep_default_na=False).set_index(ID_COLUMN)
+        imported[stage] = len(insert_leads(stage, data))
+    return imported
+
+if __name__ == "__main__":
+    for stage, count in migrate_csvs().items():
+        print(f"{stage}: {count} leads imported")
@@ -0,0 +1,83 @@
+"""Report what each page module costs to import on a cold start.
+
+    python startup_report.py [--top 5] [--json report.json]
+
+Every page is imported in a fresh interpreter under `python -X importtime`, after
+streamlit and pandas, which any session loads anyway. The report shows the milliseconds
+the page adds the first time it is opened, and the heaviest imports it pulls in.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from page_registry import PAGES
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Loaded by every session before any page is opened
+BASELINE_IMPORTS = ["streamlit", "pandas"]
+
+# Imports a page defers until it first needs them, e.g. matplotlib for the first chart
+DEFERRED_IMPORTS = {"Weekly Graphs": ["matplotlib.figure"]}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def import_times(module):
+    """Import module in a fresh interpreter; return [(name, depth, cumulative us)]."""
+    code = f"import {', '.join(BASELINE_IMPORTS)}; import {module}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            entries.append((match[4], (len(match[3]) - 1) // 2, int(match[2])))
+    return entries
+
+def page_report(module, top):
+    """Cold import cost of module beyond the baseline, with its top heaviest dependencies."""
+    entries = import_times(module)
+    # importtime prints a module after everything it imported, so its subtree precedes it
+    end = max(i for i, (name, depth, _) in enumerate(entries) if name == module and depth == 0)
+    start = max((i + 1 for i, (_, depth, _) in enumerate(entries[:end]) if depth == 0), default=0)
+    subtree = entries[start:end]
+    heaviest = sorted((entry for entry in subtree if entry[1] == 1), key=lambda entry: -entry[2])[:top]
+    return {
+        "module": module,
+        "import_ms": round(entries[end][2] / 1000, 1),
+        "heaviest": [{"module": name, "import_ms": round(us / 1000, 1)} for name, _, us in heaviest],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports listed per page")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    baseline = import_times(BASELINE_IMPORTS[-1])
+    baseline_ms = sum(us for _, depth, us in baseline if depth == 0) / 1000
+    print(f"baseline ({', '.join(BASELINE_IMPORTS)}): {baseline_ms:.0f} ms")
+
+    report = {"baseline_ms": round(baseline_ms, 1), "pages": {}}
+    for page, (module, _) in PAGES.items():
+        row = page_report(module, args.top)
+        report["pages"][page] = row
+        heaviest = ", ".join(f"{dep['module']} {dep['import_ms']:.0f}" for dep in row["heaviest"])
+        print(f"{page:<24} {row['import_ms']:>8.1f} ms   {heaviest}")
+        for module in DEFERRED_IMPORTS.get(page, []):
+            deferred = page_report(module, args.top)
+            row.setdefault("deferred", []).append(deferred)
+            print(f"{'':<24} {deferred['import_ms']:>8.1f} ms   deferred: {module}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from lead_store import STAGE_PATHS, LEAD_COLUMNS, ID_COLUMN
+
+# Share of all generated leads that lands in each stage, roughly what a live pipeline looks like
+STAGE_SHARES = {
+    "raw_data": 0.60, "not_picked": 0.12, "callback": 0.08, "meeting_booked": 0.05,
+    "qualified": 0.04, "disqualified": 0.03, "deals_active": 0.025, "follow_up": 0.015,
+    "closed_deal": 0.015, "lost_deal": 0.015, "bin": 0.01,
+}
+
+APPSETTERS = ["fida", "hammad", "omer", "sana", "bilal", "ayesha"]
+
+FIRST_NAMES = ["Kurt", "Mitch", "William", "Renoir", "Sarah", "Maria", "James", "Linda", "David", "Emily",
+               "Robert", "Jessica", "Michael", "Karen", "Daniel", "Laura", "Thomas", "Nancy", "Steven", "Olivia"]
+LAST_NAMES = ["Clark", "Toro", "Battle", "Smith", "Johnson", "Garcia", "Miller", "Davis", "Lopez", "Wilson",
+              "Anderson", "Taylor", "Moore", "Martin", "Lee", "Walker", "Young", "King", "Wright", "Scott"]
+TITLES = ["CEO", "Co Owner", "CEO & President", "Founder", "Managing Director", "VP Sales",
+          "Head of Marketing", "Operations Manager", "Independent Business Owner", "CTO"]
+INDUSTRIES = ["food & beverages", "entertainment", "retail", "construction", "health, wellness & fitness",
+              "information technology & services", "real estate", "marketing & advertising", "automotive"]
+COMPANY_WORDS = ["Triangle", "Grove", "Protochol", "Beverage", "Artists", "Frame", "Summit", "Harbor",
+                 "Pioneer", "Bright", "Atlas", "Maple", "Cedar", "Nova", "Vertex", "Blue"]
+LOCATIONS = [("Richardson", "Texas"), ("Erie", "Pennsylvania"), ("Pasadena", "California"),
+             ("Highland Park", "Illinois"), ("Austin", "Texas"), ("Miami", "Florida"), ("Denver", "Colorado"),
+             ("Seattle", "Washington"), ("Boston", "Massachusetts"), ("Phoenix", "Arizona")]
+PRIORITIES = ["High", "Medium", "Low"]
+COMMENTS = ["call back next week", "interested", "send deck", "no answer", "asked for pricing", "gatekeeper"]
+
+def generate_leads(rows, rng, worked=False, start=0):
+    """Build rows synthetic 18-column leads; start offsets the serial that keeps emails unique.
+
+    worked leads (anything past Raw Data) carry a Date, priority, comment and AppSetter, as
+    the setters fill those in; only a few raw leads have them.
+    """
+    serial = pd.Series(np.arange(start, start + rows)).astype(str)
+    first = pd.Series(rng.choice(FIRST_NAMES, rows))
+    last = pd.Series(rng.choice(LAST_NAMES, rows))
+    company = pd.Series(rng.choice(COMPANY_WORDS, rows)) + " " + pd.Series(rng.choice(COMPANY_WORDS, rows))
+    domain = company.str.lower().str.replace(" ", "", regex=False) + serial + ".com"
+    slug = first.str.lower() + "-" + last.str.lower() + "-" + serial
+    city, state = zip(*[LOCATIONS[i] for i in rng.integers(len(LOCATIONS), size=rows)])
+    city, state = pd.Series(city), pd.Series(state)
+    phone = pd.Series(rng.integers(2_000_000_000, 9_999_999_999, size=rows)).astype(str)
+
+    data = pd.DataFrame({
+        "First Name": first,
+        "Last Name": last,
+        "Title": rng.choice(TITLES, rows),
+        "Company": company,
+        "Email": first.str.lower() + "." + last.str.lower() + "@" + domain,
+        "Phone Number": "+1 " + phone.str[:3] + "-" + phone.str[3:6] + "-" + phone.str[6:],
+        "Industry": rng.choice(INDUSTRIES, rows),
+        "Person Linkedin Url": "http://www.linkedin.com/in/" + slug,
+        "Website": "http://www." + domain,
+        "Company Linkedin Url": "http://www.linkedin.com/company/" + company.str.lower().str.replace(" ", "-", regex=False),
+        "Company Address": city + ", " + state + ", United States",
+        "Company City": city,
+        "Company State": state,
+        "Company Country": "United States",
+    })
+
+    # Dates spread over the last 26 weeks so the Weekly Graphs page has a real range
+    dates = pd.Timestamp.today().normalize() - pd.to_timedelta(rng.integers(0, 182, size=rows), unit="D")
+    assigned = np.ones(rows, dtype=bool) if worked else rng.random(rows) < 0.3
+    data["Date"] = pd.Series(dates.strftime("%Y-%m-%d")).where(assigned, "")
+    data["priority"] = pd.Series(rng.choice(PRIORITIES, rows)).where(assigned, "")
+    data["comment"] = pd.Series(rng.choice(COMMENTS, rows)).where(assigned & (rng.random(rows) < 0.5), "")
+    data["AppSetter"] = pd.Series(rng.choice(APPSETTERS, rows)).where(assigned, "")
+    return data[LEAD_COLUMNS]
+
+def write_dataset(data_dir, rows, seed=0):
+    """Write rows synthetic leads split across every stage file in data_dir, plus appsetter.csv."""
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    start = 0
+    counts = {}
+    for stage, share in STAGE_SHARES.items():
+        count = max(1, int(rows * share))
+        data = generate_leads(count, rng, worked=stage != "raw_data", start=start)
+        data.index = range(start + 1, start + count + 1)  # lead IDs, unique across stages
+        data.to_csv(os.path.join(data_dir, os.path.basename(STAGE_PATHS[stage])), index_label=ID_COLUMN)
+        start += count
+        counts[stage] = count
+    pd.DataFrame({"AppSetter": APPSETTERS}).to_csv(os.path.join(data_dir, "appsetter.csv"), index=False)
+    return counts
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        sys.exit("usage: python synthetic_leads.py <data dir> <rows> [seed]")
+    counts = write_dataset(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) == 4 else 0)
+    print(f"{sum(counts.values())} leads written to {sys.argv[1]}")
@@ -0,0 +1,128 @@
+import os
+import json
+import threading
+import pandas as pd
+import lead_store
+import pipeline
+from lead_store import DATA_DIR, STAGE_PATHS
+
+CUBE_PATH = os.path.join(DATA_DIR, "weekly_cube.json")
+
+# Stages the Weekly Graphs page can chart
+CUBE_STAGES = ["deals_active", "closed_deal", "follow_up", "qualified", "lost_deal", "disqualified"]
+
+# Guards _state within this process; weekly_cube.json read-modify-writes also hold the store
+# lock, so worker processes never lose each other's updates
+_lock = threading.Lock()
+_state = {"file_key": None, "counts": {}, "stamps": {}}
+
+def _week_counts(data):
+    """Count rows per (AppSetter, ISO week start) for one stage frame."""
+    if data.empty or "Date" not in data.columns or "AppSetter" not in data.columns:
+        return {}
+    dates = pd.to_datetime(data["Date"], errors="coerce")
+    appsetters = data["AppSetter"].astype(object).fillna("").astype(str)
+    valid = dates.notna() & (appsetters != "")
+    dates = dates[valid]
+    weeks = (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.strftime("%Y-%m-%d")
+    grouped = pd.DataFrame({"AppSetter": appsetters[valid], "week": weeks}).groupby(["AppSetter", "week"]).size()
+    return {f"{appsetter}|{week}": int(count) for (appsetter, week), count in grouped.items()}
+
+def _save():
+    tmp_path = f"{CUBE_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"counts": _state["counts"], "stamps": _state["stamps"]}, f)
+    os.replace(tmp_path, CUBE_PATH)
+    _state["file_key"] = lead_store.stage_version(CUBE_PATH)
+
+def _load():
+    """Pick up the cube file if another process rewrote it since we last read it."""
+    file_key = lead_store.stage_version(CUBE_PATH)
+    if file_key == _state["file_key"]:
+        return
+    if os.path.exists(CUBE_PATH):
+        with open(CUBE_PATH) as f:
+            stored = json.load(f)
+        _state.update(counts=stored["counts"], stamps=stored["stamps"])
+    else:
+        _state.update(counts={}, stamps={})
+    _state["file_key"] = file_key
+
+def _stale():
+    return [stage for stage in CUBE_STAGES
+            if _state["stamps"].get(stage) != lead_store.stage_version(STAGE_PATHS[stage])]
+
+def refresh():
+    """Recount any stage whose leads changed without going through a tracked move."""
+    with _lock:
+        _load()
+        if not _stale():
+            return
+    with lead_store.store_lock(), _lock:
+        _load()
+        stale = _stale()
+        for stage in stale:
+            file_path = STAGE_PATHS[stage]
+            _state["stamps"][stage] = lead_store.stage_version(file_path)
+            _state["counts"][stage] = _week_counts(lead_store.load_data(file_path, ["Date", "AppSetter"]))
+        if stale:
+            _save()
+
+def all_counts():
+    """Weekly counts of every cube stage as one frame with stage, AppSetter, week and Count."""
+    refresh()
+    with _lock:
+        rows = [[stage] + key.split("|", 1) + [count]
+                for stage, counts in _state["counts"].items() if stage in CUBE_STAGES
+                for key, count in counts.items() if count > 0]
+    data = pd.DataFrame(rows, columns=["stage", "AppSetter", "week", "Count"])
+    data["week"] = pd.to_datetime(data["week"])
+    return data
+
+def weekly_counts(stage):
+    """Per-AppSetter weekly counts of stage as a frame with AppSetter, week and Count."""
+    data = all_counts()
+    return data[data["stage"] == stage].drop(columns="stage").reset_index(drop=True)
+
+def version():
+    """Changes whenever any cube count changes; used to key caches built on the cube."""
+    refresh()
+    with _lock:
+        return tuple(_state["stamps"].get(stage) for stage in CUBE_STAGES)
+
+def _on_move(moved, source_path, target_paths, versions):
+    """Shift the moved leads' counts from the source stage to the target stages.
+
+    A stage whose counts were not current right before the move is recounted on next read.
+    """
+    delta = _week_counts(moved)
+    stages = [(source_path, -1)] + [(target_path, 1) for target_path in target_paths]
+    with lead_store.store_lock(), _lock:
+        _load()
+        for file_path, sign in stages:
+            stage = lead_store.stage_for_path(file_path)
+            if stage not in CUBE_STAGES or stage not in _state["stamps"]:
+                continue
+            if _state["stamps"][stage] != versions[file_path][0]:
+                # The counts missed a write this move knows nothing about
+                del _state["stamps"][stage]
+                continue
+            counts = _state["counts"].setdefault(stage, {})
+            for key, count in delta.items():
+                counts[key] = counts.get(key, 0) + sign * count
+                if counts[key] <= 0:
+                    del counts[key]
+            _state["stamps"][stage] = versions[file_path][1]
+        _save()
+
+def _on_write(file_path, columns, versions):
+    """Edits can change a lead's Date or AppSetter, so recount that stage on next read."""
+    stage = lead_store.stage_for_path(file_path)
+    if stage in CUBE_STAGES:
+        with lead_store.store_lock(), _lock:
+            _load()
+            _state["stamps"].pop(stage, None)
+            _save()
+
+pipeline.add_move_listener(_on_move)
+lead_store.add_write_listener(_on_write)
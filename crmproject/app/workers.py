@@ -0,0 +1,92 @@
+"""Run several app worker processes on one host, sharing parsed stage data.
+
+    python workers.py [--workers 4] [--port 8511] [--address 0.0.0.0]
+
+Starts one `streamlit run main.py` per worker on consecutive ports (8511, 8512, ...), each
+with CRM_SHARED_CACHE=1 so they share parsed stages through shared_cache, and stops them
+all on Ctrl-C. The ports must not include the API server's (CRM_API_PORT, or 8502) and
+must all be free. Writes are already safe across processes (store lock, write-queue
+journal) and every worker's change_watch thread drops its cached frames when another one
+writes.
+
+Put a load balancer with sticky sessions in front, since a Streamlit session lives in the
+worker that served its websocket, for example with nginx:
+
+    upstream crm { ip_hash; server 127.0.0.1:8511; server 127.0.0.1:8512; ... }
+    location / {
+        proxy_pass http://crm;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection "upgrade";
+    }
+"""
+import os
+import sys
+import time
+import socket
+import signal
+import argparse
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# First worker port; clear of Streamlit's own 8501 and of the API server's default 8502
+FIRST_PORT = 8511
+
+# Read like api_server.API_PORT, without importing the service layer into the launcher
+API_PORT = int(os.environ.get("CRM_API_PORT", 8502))
+
+def _port_free(address, port):
+    with socket.socket() as probe:
+        try:
+            probe.bind((address, port))
+        except OSError:
+            return False
+    return True
+
+def check_ports(ports, address):
+    """Raise ValueError if a worker port is the API server's or is already taken."""
+    if API_PORT in ports:
+        raise ValueError(f"worker ports {ports[0]}-{ports[-1]} include the API port {API_PORT}; pick another --port or CRM_API_PORT")
+    taken = [port for port in ports if not _port_free(address, port)]
+    if taken:
+        raise ValueError(f"ports already in use: {', '.join(map(str, taken))}")
+
+def worker_command(port, address):
+    return [sys.executable, "-m", "streamlit", "run", os.path.join(APP_DIR, "main.py"),
+            "--server.port", str(port), "--server.address", address, "--server.headless", "true",
+            "--server.enableCORS", "false", "--server.enableXsrfProtection", "false"]
+
+def run(workers=os.cpu_count() or 1, port=FIRST_PORT, address="0.0.0.0"):
+    """Start workers app processes and wait; stop them all when one exits or on Ctrl-C."""
+    ports = list(range(port, port + workers))
+    check_ports(ports, address)
+    env = dict(os.environ, CRM_SHARED_CACHE="1")
+    processes = [subprocess.Popen(worker_command(worker_port, address), env=env) for worker_port in ports]
+    print(f"{workers} workers on ports {port}-{port + workers - 1}")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=FIRST_PORT, help="port of the first worker")
+    parser.add_argument("--address", default="0.0.0.0")
+    args = parser.parse_args()
+    try:
+        run(args.workers, args.port, args.address)
+    except ValueError as exc:
+        sys.exit(f"error: {exc}")
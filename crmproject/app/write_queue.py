@@ -0,0 +1,302 @@
+"""Write-behind queue: pages hand their edits and moves to one writer thread and return at once.
+
+A mutation is journaled (fsynced) before it is acknowledged, so once submit_patch or
+submit_move returns it survives the server stopping; a journaled mutation the writer did not
+finish is picked up again the next time a writer starts. The writer drains everything
+queued, coalesces it (all edits to one stage file go out in a single write, all moves in
+one TransitionBatch) and records one result per ticket.
+
+Until a mutation is written, overlay() shows it on top of the stored data, so the pages
+display what the setter just did.
+"""
+import os
+import json
+import glob
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import pandas as pd
+import lead_store
+import pipeline
+from lead_store import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the thread lock still applies
+    fcntl = None
+
+JOURNAL_PATH = os.path.join(DATA_DIR, "write_queue.journal")
+
+# One lock file per running writer process, held (flock) for the life of the process, so a
+# journal entry whose owner's lock is free was left by a process that has stopped
+OWNERS_DIR = os.path.join(DATA_DIR, "write_queue.owners")
+
+# This process's owner ID; unlike a PID it is never reused by a later process
+BOOT_ID = uuid.uuid4().hex
+
+# Finished results kept for status lookups
+MAX_RESULTS = 1000
+
+# Journal size past which finished entries are dropped from it
+COMPACT_BYTES = 1 * 2**20
+
+_queue = queue.Queue()
+_lock = threading.Lock()
+_journal_thread_lock = threading.Lock()
+_pending = OrderedDict()  # {ticket: mutation} submitted but not yet written, in order
+_results = OrderedDict()  # {ticket: result dict} of finished mutations
+_state = {"writer": None, "owner_file": None}
+
+@contextmanager
+def _journal_lock():
+    """Exclusive access to the journal, across threads and processes; separate from the store lock."""
+    with _journal_thread_lock:
+        if fcntl is None or not os.path.isdir(DATA_DIR):
+            yield
+            return
+        with open(f"{JOURNAL_PATH}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _plain(value):
+    return value.item() if hasattr(value, "item") else value
+
+def _encode(mutation):
+    """JSON-safe journal form of a mutation."""
+    entry = {key: value for key, value in mutation.items() if key not in ("patch", "base", "rows")}
+    if "rows" in mutation:
+        entry["rows"] = [_plain(row) for row in mutation["rows"]]
+    if "patch" in mutation:
+        entry["patch"] = [[_plain(row), changes] for row, changes in mutation["patch"].items()]
+    base = mutation.get("base")
+    if base is not None:
+        entry["base"] = {
+            "index": [_plain(row) for row in base.index],
+            "columns": list(base.columns),
+            "data": [[_plain(value) for value in row] for row in base.itertuples(index=False)],
+        }
+    return entry
+
+def _decode(entry):
+    mutation = dict(entry)
+    if "patch" in entry:
+        mutation["patch"] = {row: changes for row, changes in entry["patch"]}
+    if entry.get("base") is not None:
+        base = pd.DataFrame(entry["base"]["data"], index=entry["base"]["index"], columns=entry["base"]["columns"], dtype=object)
+        for column in ("_identity", "_version"):
+            base[column] = base[column].astype("uint64")
+        mutation["base"] = base
+    return mutation
+
+def _journal(lines):
+    """Append lines to the journal and fsync them."""
+    with _journal_lock():
+        with open(JOURNAL_PATH, "a") as f:
+            f.write("".join(json.dumps(line, default=str) + "\n" for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+def _read_journal():
+    """(entries not yet done, set of done tickets) from the journal, each with its current owner."""
+    entries, done = OrderedDict(), set()
+    if not os.path.exists(JOURNAL_PATH):
+        return entries, done
+    with open(JOURNAL_PATH) as f:
+        for line in f:
+            # A torn last line is a submit that was never acknowledged
+            if not line.endswith("\n"):
+                continue
+            line = json.loads(line)
+            if "done" in line:
+                done.update(line["done"])
+            elif "claim" in line:
+                for ticket in line["claim"]:
+                    if ticket in entries:
+                        entries[ticket]["owner"] = line["owner"]
+            else:
+                entries[line["ticket"]] = line
+    return OrderedDict((ticket, entry) for ticket, entry in entries.items() if ticket not in done), done
+
+def _owner_path(owner):
+    return os.path.join(OWNERS_DIR, f"{owner}.lock")
+
+def _hold_owner_lock():
+    """Take this process's owner lock and keep it until the process exits."""
+    if fcntl is None or not os.path.isdir(DATA_DIR):
+        return
+    os.makedirs(OWNERS_DIR, exist_ok=True)
+    f = open(_owner_path(BOOT_ID), "a")
+    fcntl.flock(f, fcntl.LOCK_EX)
+    _state["owner_file"] = f
+
+def _owner_stopped(owner):
+    """Whether the process that journaled under owner has stopped, i.e. its owner lock is free.
+
+    Removes the lock file of a stopped owner. Entries from before owner IDs have none.
+    """
+    if owner == BOOT_ID:
+        return False
+    if owner is None or fcntl is None:
+        return True
+    try:
+        f = open(_owner_path(owner), "r")
+    except FileNotFoundError:
+        return True
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        os.remove(_owner_path(owner))
+    return True
+
+def _compact():
+    """Rewrite the journal with only the entries still waiting to be written."""
+    with _journal_lock():
+        if not os.path.exists(JOURNAL_PATH) or os.path.getsize(JOURNAL_PATH) < COMPACT_BYTES:
+            return
+        entries, _ = _read_journal()
+        with open(f"{JOURNAL_PATH}.tmp", "w") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries.values()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{JOURNAL_PATH}.tmp", JOURNAL_PATH)
+
+def _submit(mutation):
+    mutation = dict(mutation, ticket=uuid.uuid4().hex, owner=BOOT_ID)
+    start()
+    _journal([_encode(mutation)])
+    with _lock:
+        _pending[mutation["ticket"]] = mutation
+    _queue.put(mutation["ticket"])
+    return mutation["ticket"]
+
+def submit_patch(file_path, patch, base=None):
+    """Queue apply_patch(file_path, patch, base); return its ticket once it is journaled."""
+    return _submit({"kind": "patch", "file": file_path, "patch": patch, "base": base})
+
+def submit_move(selected_rows, source_path, target_paths):
+    """Queue moving the leads with the selected_rows IDs; return its ticket once it is journaled."""
+    return _submit({"kind": "move", "rows": list(selected_rows), "file": source_path, "targets": list(target_paths)})
+
+def result(ticket):
+    """Outcome of a ticket once written: {"written", "conflicts"} for an edit, {"moved"} for a
+    move, {"error"} if it failed; None while it is still queued."""
+    with _lock:
+        if ticket in _pending:
+            return None
+        # Results are only kept for a while; a ticket that is neither pending nor kept was written
+        return _results.get(ticket, {})
+
+def wait(timeout=None):
+    """Block until every mutation queued so far is written; False if timeout ran out first."""
+    start()
+    done = threading.Event()
+    _queue.put(done)
+    return done.wait(timeout)
+
+def overlay(file_path, data):
+    """data with the not yet written edits to file_path applied and the leads queued to move out of it removed."""
+    with _lock:
+        mutations = [mutation for mutation in _pending.values() if mutation["file"] == file_path]
+    for mutation in mutations:
+        if mutation["kind"] == "move":
+            data = data.drop(index=data.index.intersection(mutation["rows"]))
+        else:
+            lead_store.patch_frame(data, {row: changes for row, changes in mutation["patch"].items() if row in data.index})
+    return data
+
+def _runs(batch):
+    """Split a batch into runs of consecutive mutations of the same kind."""
+    runs = []
+    for mutation in batch:
+        if runs and runs[-1][0]["kind"] == mutation["kind"]:
+            runs[-1].append(mutation)
+        else:
+            runs.append([mutation])
+    return runs
+
+def _write(batch):
+    """Write a batch of mutations; return {ticket: result}."""
+    results = {}
+    for run in _runs(batch):
+        try:
+            if run[0]["kind"] == "move":
+                # All moves of the run go out as one transaction
+                transition = pipeline.TransitionBatch()
+                for mutation in run:
+                    transition.move(None, mutation["rows"], mutation["file"], mutation["targets"])
+                transition.commit()
+                results.update({mutation["ticket"]: {"moved": moved} for mutation, moved in zip(run, transition.moved_counts)})
+            else:
+                # All edits to one stage file go out in a single write
+                by_file = OrderedDict()
+                for mutation in run:
+                    by_file.setdefault(mutation["file"], []).append(mutation)
+                for file_path, mutations in by_file.items():
+                    patched = lead_store.apply_patches(file_path, [(m["patch"], m["base"]) for m in mutations])
+                    results.update({m["ticket"]: {"written": r.written, "conflicts": r.conflicts} for m, r in zip(mutations, patched)})
+        except Exception as exc:
+            results.update({mutation["ticket"]: {"error": repr(exc)} for mutation in run if mutation["ticket"] not in results})
+    return results
+
+def _drain(first):
+    """The first item and everything queued behind it: (mutations, events to set)."""
+    items = [first]
+    while True:
+        try:
+            items.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    with _lock:
+        batch = [_pending[item] for item in items if isinstance(item, str) and item in _pending]
+    return batch, [item for item in items if isinstance(item, threading.Event)]
+
+def _writer():
+    while True:
+        batch, waiters = _drain(_queue.get())
+        if batch:
+            results = _write(batch)
+            _journal([{"done": list(results)}])
+            with _lock:
+                for ticket, outcome in results.items():
+                    _pending.pop(ticket, None)
+                    _results[ticket] = outcome
+                while len(_results) > MAX_RESULTS:
+                    _results.popitem(last=False)
+            _compact()
+        for waiter in waiters:
+            waiter.set()
+
+def start():
+    """Start the writer thread, first taking over what stopped processes left unwritten."""
+    with _lock:
+        if _state["writer"] is not None:
+            return
+        thread = threading.Thread(target=_writer, name="write-behind", daemon=True)
+        _state["writer"] = thread
+    with _journal_lock():
+        # Under the journal lock, so no other process sees the file before it is locked
+        _hold_owner_lock()
+        entries, _ = _read_journal()
+        orphaned = [ticket for ticket, entry in entries.items() if _owner_stopped(entry.get("owner"))]
+        # Clear the lock files of stopped processes that left nothing behind
+        for path in glob.glob(os.path.join(OWNERS_DIR, "*.lock")):
+            _owner_stopped(os.path.basename(path)[:-len(".lock")])
+        if orphaned:
+            # Claimed under the journal lock, so no other starting process replays them too
+            with open(JOURNAL_PATH, "a") as f:
+                f.write(json.dumps({"claim": orphaned, "owner": BOOT_ID}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+    for ticket in orphaned:
+        mutation = _decode(entries[ticket])
+        with _lock:
+            _pending[ticket] = mutation
+        _queue.put(ticket)
+    thread.start()
@@ -0,0 +1,39 @@
+"""Sidebar status of this session's queued writes (see write_queue).
+
+Kept out of the page modules so main.py can show it on every run without loading them.
+write_queue, and pipeline's journal recovery with it, is only loaded by the pages that
+write; until one of them has been, there is nothing to report.
+"""
+import sys
+import streamlit as st
+
+def track_write(ticket):
+    """Report on the write_queue ticket in this session's write_status."""
+    st.session_state.setdefault("write_tickets", []).append(ticket)
+
+@st.fragment(run_every=2)
+def write_status():
+    """Show whether this session's queued writes are on disk yet, and any that did not fully apply."""
+    write_queue = sys.modules.get("write_queue")
+    if write_queue is None:
+        st.caption("All changes saved.")
+        return
+    # Starting the writer also picks up writes a stopped server left in the journal
+    write_queue.start()
+    waiting = []
+    for ticket in st.session_state.get("write_tickets", []):
+        outcome = write_queue.result(ticket)
+        if outcome is None:
+            waiting.append(ticket)
+        elif outcome.get("error"):
+            st.error(f"A change could not be saved: {outcome['error']}")
+        elif outcome.get("conflicts"):
+            st.warning(
+                f"{len(outcome['conflicts'])} edited cells were not saved because someone else changed "
+                "the same leads meanwhile. Please review and edit them again."
+            )
+    st.session_state["write_tickets"] = waiting
+    if waiting:
+        st.caption(f"Saving {len(waiting)} change(s)...")
+    else:
+        st.caption("All changes saved.")